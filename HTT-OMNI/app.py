@@ -50,18 +50,30 @@ class App(param.Parameterized):
                 height=15
             ), 
             pn.Param(self.data_filter, parameters = ['max_nodes', 'node_display_priority', ], height=80, **param_opts),
-            pn.Param(self.network, parameters =['min_node_size', 'max_node_size'], **param_opts)
+            pn.Param(self.network, parameters =['node_size_by', 'min_node_size', 'max_node_size'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['metrics_scope'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['communities', 'collapse_communities'], **param_opts),
         ]
 
         edge_properties = [
             pn.Param(self.data_filter, parameters = ['STRINGdb_score'], height=15, **param_opts), 
             pn.Param(self.network, parameters = ['layout'], height=30, **param_opts),
+            pn.Row(
+                pn.pane.Markdown('Layout updates', align='center'), 
+                pn.Param(self.network, parameters = ['layout_mode'], **param_opts),
+                height = 15
+            ),
             pn.Row(
                 pn.pane.Markdown('Bundle edges?', align='center'), 
                 pn.Param(self.network, parameters = ['bundle_graph_edges'], **param_opts),
                 height = 15
             ),
             pn.Param(self.network, parameters = ['min_edge_width', 'max_edge_width'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['expand_hops', 'expand_top_k'], **param_opts),
+            pn.Row(
+                pn.Param(self.network, parameters = ['expand_neighborhood'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['clear_expansion'], **param_opts),
+            ),
         ]
         
         data_filters = [
@@ -76,15 +88,41 @@ class App(param.Parameterized):
             pn.Param(self.data_filter, parameters = ['PPI_sum_cutoff'], **param_opts),
             pn.Card(
                 pn.Param(self.data_filter, parameters=['node_query'], show_labels=False, **param_opts), 
+                pn.Param(self.data_filter, parameters=['paths_to_HTT', 'path_min_score', 'path_k'], **param_opts),
                 collapsed=True, 
                 title='Search for Genes',
             ),
             *data_filters
         )
+
+        # built explicitly (not looked up by position in a Param pane) so that reset_filters can clear it
+        omics_active_opts = {k: v for k, v in widgets['omics_active'].items() if k!='type'}
+        self.omics_active = widgets['omics_active']['type'].from_param(self.data_filter.param.omics_active, **dict(omics_active_opts, name=''))
+
+        omics_filter_wids = pn.Card(
+            pn.Param(self.data_filter, parameters = ['omics_type', 'omics_tissue', 'omics_age', 'omics_Q_length', 'omics_comparison', 'omics_threshold'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['add_omics_filter'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['omics_AND_OR_NOT'], show_labels=False, **param_opts),
+            self.omics_active,
+            collapsed=True,
+            title='Omics thresholds',
+        )
+        node_filter_wids.append(omics_filter_wids)
+
         self.PPI_sum = node_filter_wids[0][0]
         self.query = node_filter_wids[1][0][0]
         self.data_filters = data_filters
         
+        comparison_properties = [
+            pn.Param(self.data_filter, parameters = ['diff_mode'], **param_opts),
+            pn.Row(
+                pn.Param(self.data_filter, parameters = ['capture_A'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['capture_B'], **param_opts),
+            ),
+            pn.Param(self.data_filter, parameters = ['release_B'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['diff_info'], **param_opts),
+        ]
+
         aesthetic_properties = [
             pn.Param(self.network, parameters = ['node_color', 'node_cmap', 'cmap_centered', 'clim_min', 'clim_max'], **param_opts),
             pn.Param(self.network, parameters = ['fontsize', 'label_color',], **param_opts),
@@ -100,6 +138,8 @@ class App(param.Parameterized):
                 '**Required column headers:** gene_id, study_id',
                 '**Optional column headers:** '+', '.join([i for i in self.data_filter.filters if not i in ['study_id', 'data_source']]),
                 self.download_template_button,
+                pn.Param(self.data_filter, parameters = ['stored_uploads'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['reattach_upload'], **param_opts),
                 '##### User uploaded data:',
                 pn.WidgetBox(
                     pn.Param(self.data_filter, parameters = ['display_user_data'], **param_opts), 
@@ -119,6 +159,7 @@ class App(param.Parameterized):
                 pn.Card(*node_properties, title = 'Node Properties'), 
                 pn.Card(*edge_properties, title = 'Edge Properties'),
                 pn.Card(*aesthetic_properties, title = 'Aesthetic Properties'),
+                pn.Card(*comparison_properties, title = 'Network Comparison', collapsed = True),
                 name = 'NETWORK PROPERTIES'
             ), 
             pn.Column(
@@ -152,6 +193,10 @@ class App(param.Parameterized):
                     self.network.export_show_edges_button,), 
                     pn.Row(self.network.export_sel_nodes_button, 
                     self.network.export_sel_edges_button,),
+                    pn.Row(self.network.export_show_graph_button, 
+                    self.network.export_sel_graph_button,),
+                    pn.Row(self.network.export_figure_button,),
+                    pn.Row(pn.Param(self.network, parameters = ['table_format', 'graph_format'], default_layout = pn.Row, **param_opts),),
                     margin=0,
                     justify_content = 'center'
                 ),
@@ -198,7 +243,22 @@ class App(param.Parameterized):
             ), 
             title = 'Omics data (filtered nodes)',
         )
-        react.main[12:18, :] = pn.Card(pn.Param(self.data_filter, parameters = ['display_nodes'], **param_opts), title = 'Network nodes table')
+        react.main[12:18, :] = pn.Card(
+            pn.Row(
+                pn.Param(self.data_filter, parameters = ['display_table'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['display_search'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['display_sort'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['display_ascending'], **param_opts),
+            ),
+            pn.Param(self.data_filter, parameters = ['display_hide_columns'], **param_opts),
+            pn.Param(self.data_filter, parameters = ['display_nodes'], **param_opts), 
+            pn.Row(
+                pn.Param(self.data_filter, parameters = ['display_page'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['display_page_size'], **param_opts),
+                pn.Param(self.data_filter, parameters = ['display_page_info'], **param_opts),
+            ),
+            title = 'Network nodes table'
+        )
 
         self.template = react
         self.template.servable()   
@@ -216,6 +276,8 @@ class App(param.Parameterized):
             for filter in self.data_filters:
                 filter[0][0].value = []
 
+            self.omics_active.value = []
+
     @param.depends('data_filter.remove_user_data', watch=True)
     def update_upload_user_data(self):
        pass 
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import pandas as pd
+
+# bump whenever the structure of the DataFilter products changes
+ARTIFACT_VERSION = 1
+ARTIFACT_FN = r'./assets/data/data_filter_artifacts.pkl'
+
+# DataFilter attributes produced by annotate() and update_options()
+ARTIFACT_KEYS = ['PPI_sum', 'sym_to_index', 'one_hot', 'annotations', 'options_', 'options_map', 'options_map_r']
+
+def nodes_fingerprint(nodes, filters, index_col, gene_symbol_col, groupby_PPI_cols):
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(nodes, index=True).values.tobytes())
+    h.update(repr((list(nodes.columns), filters, index_col, gene_symbol_col, groupby_PPI_cols)).encode('utf8'))
+
+    return h.hexdigest()
+
+def build_artifacts(data_filter, fn = ARTIFACT_FN):
+    '''
+    data_filter = DataFilter(**{k:pn.state.cache[k] for k in ['nodes', 'edges', 'filters', 'index_col', 'gene_symbol_col', 'filter_aliases', 'groupby_PPI_cols']})
+    build_artifacts(data_filter)
+
+    stores the annotate()/update_options() products of a DataFilter built on the shipped HINT data
+    '''
+
+    if data_filter.user_data is not None:
+        raise ValueError('Artifacts can only be built from the shipped HINT data (user data is loaded)')
+
+    bundle = {
+        'version': ARTIFACT_VERSION,
+        'fingerprint': nodes_fingerprint(data_filter.nodes, data_filter.filters, data_filter.index_col, data_filter.gene_symbol_col, data_filter.groupby_PPI_cols),
+        'products': {k: getattr(data_filter, k) for k in ARTIFACT_KEYS},
+    }
+
+    pd.to_pickle(bundle, fn)
+
+    return bundle
+
+def load_artifacts(nodes, filters, index_col, gene_symbol_col, groupby_PPI_cols, fn = ARTIFACT_FN):
+    # returns the stored products, or None if the artifact is missing or was built for a different nodes table
+    if not os.path.exists(fn):
+        return None
+
+    bundle = pd.read_pickle(fn)
+
+    if bundle.get('version') != ARTIFACT_VERSION:
+        print('Ignoring {} (artifact version {}, expected {}); run "python artifacts.py" to rebuild'.format(fn, bundle.get('version'), ARTIFACT_VERSION))
+        return None
+
+    if bundle.get('fingerprint') != nodes_fingerprint(nodes, filters, index_col, gene_symbol_col, groupby_PPI_cols):
+        print('Ignoring {} (built for a different nodes table); run "python artifacts.py" to rebuild'.format(fn))
+        return None
+
+    return bundle['products']
+
+if __name__ == '__main__':
+    import panel as pn
+    import config_setup # runs setup(), reading variables into pn.state.cache
+    from data_filter import DataFilter
+
+    data_filter = DataFilter(**{k:pn.state.cache[k] for k in ['nodes', 'edges', 'filters', 'index_col', 'gene_symbol_col', 'filter_aliases', 'groupby_PPI_cols']})
+    build_artifacts(data_filter)
+    print('Wrote {} (version {})'.format(ARTIFACT_FN, ARTIFACT_VERSION))
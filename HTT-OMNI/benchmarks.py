@@ -0,0 +1,125 @@
+import time
+import numpy as np
+import pandas as pd
+import holoviews as hv
+import networkx as nx
+
+from draggable_graph import DraggableGraph
+from force_layout import force_directed_layout
+
+# python benchmarks.py
+# timings for the network render path on synthetic networks shaped like DataFilter.show_nodes/show_edges
+
+def synthetic_network(n_nodes = 500, edge_density = 0.05, seed = 0, index_col = 'geneID', label_col = 'geneSymbol', source_col = 'GENE_ID_A', target_col = 'GENE_ID_B'):
+    rng = np.random.default_rng(seed)
+
+    ids = np.arange(1, n_nodes+1)*7
+    nodes = pd.DataFrame({
+        index_col: ids,
+        label_col: ['G{}'.format(i) for i in ids],
+        'PPI_SUM_TOTAL': rng.integers(1, 20, n_nodes),
+        'PPI_SUM_FILT': rng.integers(1, 20, n_nodes),
+        'connectivity': np.zeros(n_nodes),
+        'node_marker': 'circle',
+        'data_source': 'HINT',
+    })
+
+    a, b = np.triu_indices(n_nodes, k=1)
+    keep = rng.random(a.shape[0])<edge_density
+    edges = pd.DataFrame({
+        source_col: ids[a[keep]],
+        target_col: ids[b[keep]],
+        'combined_score': rng.uniform(0.4, 1, keep.sum()),
+    })
+    edges['edge_width'] = edges['combined_score']*5
+
+    return nodes, edges
+
+def timeit(f, repeat = 5):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        f()
+        times.append(time.perf_counter()-t0)
+
+    return np.median(times)
+
+def legacy_make_graph(graph, nodes, edges):
+    # per-row construction (iterrows + to_dict) that DraggableGraph.make_graph used to do
+    G = nx.Graph()
+    for idx, data in nodes.sort_index().iterrows():
+        G.add_node(data[graph.index_col], **data.to_dict())
+
+    for idx, data in edges.sort_index().iterrows():
+        G.add_edge(data[graph.source_col], data[graph.target_col], **data.to_dict())
+
+    return G
+
+def bench_graph_construction(n_nodes = 500, edge_densities = (0.01, 0.05, 0.2)):
+    graph = DraggableGraph()
+
+    for edge_density in edge_densities:
+        nodes, edges = synthetic_network(n_nodes, edge_density)
+        positions = nodes.copy()
+        positions['x'], positions['y'] = np.random.default_rng(0).uniform(-1, 1, (2, n_nodes))
+        pos_dict = dict(zip(positions[graph.index_col], positions[['x', 'y']].values))
+
+        graph.id_dtype = nodes.dtypes[graph.index_col]
+        graph.edge_frame = graph.make_edge_frame(edges)
+
+        def legacy():
+            G = legacy_make_graph(graph, nodes, edges)
+            hv.Graph.from_networkx(G, pos_dict).nodes
+            hv.Graph.from_networkx(G, pos_dict)
+
+        def vectorized():
+            graph.make_graph(nodes, edges)
+            graph.make_edge_frame(edges)
+            graph.make_nodes(positions)
+            graph.make_hv_graph(positions)
+
+        print('make_graph + hv.Graph ({} nodes, {} edges): legacy {:.3f} s, vectorized {:.3f} s'.format(n_nodes, edges.shape[0], timeit(legacy), timeit(vectorized)))
+
+def bench_force_layout(sizes = ((500, 3000), (5000, 20000))):
+    rng = np.random.default_rng(0)
+
+    for n_nodes, n_edges in sizes:
+        sources, targets = rng.integers(0, n_nodes, (2, n_edges))
+        keep = sources!=targets
+
+        t_nx = timeit(lambda: nx.kamada_kawai_layout(nx.Graph(list(zip(sources[keep], targets[keep])))), repeat=1) if n_nodes<=500 else np.nan
+        t_fd = timeit(lambda: force_directed_layout(n_nodes, sources[keep], targets[keep]), repeat=3)
+
+        print('layout ({} nodes, {} edges): kamada_kawai {:.3f} s, force_directed {:.3f} s'.format(n_nodes, keep.sum(), t_nx, t_fd))
+
+def bench_drag(n_nodes = 500, edge_density = 0.05, n_events = 20):
+    # latency of one PointDraw event (single node moved) through the rendered bokeh plot, with and without the patch fast path
+    hv.extension('bokeh')
+    nodes, edges = synthetic_network(n_nodes, edge_density)
+
+    for label, drag_patch_max in [('full re-render', 0), ('patched', 10)]:
+        graph = DraggableGraph(drag_patch_max = drag_patch_max)
+        overlay = graph.view([nodes, edges, 'circular', False, 'Full'])
+        hv.renderer('bokeh').get_plot(overlay) # renders and links the streams, capturing the edge/label sources
+
+        # count the events that actually took the fast path (a fallback would silently measure a full re-render)
+        patched = []
+        patch_drag = graph.patch_drag
+        graph.patch_drag = lambda data, moved: patched.append(patch_drag(data, moved)) or patched[-1]
+
+        latencies = []
+        for i in range(n_events):
+            data = dict(graph.stream.data)
+            data['x'] = np.array(data['x'], dtype=float)
+            data['x'][i%n_nodes] += 0.01
+
+            t0 = time.perf_counter()
+            graph.stream.event(data=data)
+            latencies.append(time.perf_counter()-t0)
+
+        print('drag event ({} nodes, {} edges), {}: median {:.1f} ms, max {:.1f} ms, {}/{} events patched'.format(n_nodes, edges.shape[0], label, 1000*np.median(latencies), 1000*np.max(latencies), sum(patched), n_events))
+
+if __name__ == '__main__':
+    bench_graph_construction()
+    bench_force_layout()
+    bench_drag()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from metrics import SubgraphCache
+
+def louvain(node_ids, sources, targets, weights, resolution = 1, seed = 0):
+    '''
+    membership = louvain(node_ids, edges['GENE_ID_A'], edges['GENE_ID_B'], edges['combined_score'])
+
+    Louvain modularity communities as a Series of community numbers indexed by node ID: 1 is the largest
+    community, 2 the next largest etc., and all unconnected nodes are put in community 0
+    '''
+    G = nx.Graph()
+    G.add_nodes_from(node_ids)
+    G.add_weighted_edges_from(zip(sources, targets, weights))
+    G.remove_edges_from(nx.selfloop_edges(G))
+
+    # (networkx<3 divides by the total edge weight, so an edgeless graph skips Louvain)
+    communities = nx.algorithms.community.louvain_communities(G, resolution=resolution, seed=seed) if G.number_of_edges()>0 else []
+    connected = [c for c in communities if len(c)>1 or G.degree(next(iter(c)))>0]
+    connected = sorted(connected, key=lambda c: (-len(c), min(c)))
+
+    membership = pd.Series(0, index=pd.Index(node_ids))
+    for i, c in enumerate(connected):
+        membership[list(c)] = i+1
+
+    return membership
+
+community_cache = SubgraphCache(louvain, max_size = 16)
+
+def community_labels(membership):
+    # display values of the 'community' color option
+    membership = np.asarray(membership)
+
+    return np.where(membership>0, np.char.add('C', membership.astype(str)), 'unconnected')
+
+def meta_ids(membership):
+    # node IDs of community meta-nodes (negative, so they never collide with gene IDs)
+    return -(np.asarray(membership)+1)
+
+def collapse(nodes, edges, membership, expanded = (), index_col = 'GeneID', label_col = 'geneSymbol', source_col = 'GENE_ID_A', target_col = 'GENE_ID_B', edge_score_col = 'combined_score', max_expanded = None, priority_col = 'PPI_SUM_TOTAL'):
+    '''
+    show_nodes, show_edges = collapse(sel_nodes.reset_index(), sel_edges, membership, expanded = [2], max_expanded = 50)
+
+    collapsed community view: every community that is not in expanded becomes one meta-node (n_members genes, PPI
+    counts summed), edges are re-pointed to the meta-nodes and aggregated (edge_score_col summed, n_edges counted),
+    and edges within a collapsed community are dropped. Genes of expanded communities are kept as they are, at most
+    max_expanded of them by priority_col; the remaining members of expanded communities stay in their meta-node.
+    '''
+    community = membership.reindex(nodes[index_col]).fillna(0).astype(int).values
+    is_expanded = np.isin(community, expanded)
+
+    if max_expanded is not None and is_expanded.sum()>max_expanded:
+        members = np.flatnonzero(is_expanded)
+        keep = members[np.argsort(-nodes[priority_col].values[members], kind='mergesort')[:max_expanded]]
+        is_expanded = np.zeros(community.shape[0], dtype=bool)
+        is_expanded[keep] = True
+
+    genes = nodes[is_expanded].copy()
+    genes['n_members'] = 1
+    genes['community'] = community_labels(community[is_expanded])
+
+    collapsed = pd.Series(community[~is_expanded])
+    ppi_cols = [c for c in ['PPI_SUM_TOTAL', 'PPI_SUM_FILT'] if c in nodes.columns]
+    meta = nodes.loc[~is_expanded, ppi_cols].reset_index(drop=True).groupby(collapsed).sum()
+    meta['n_members'] = collapsed.value_counts().reindex(meta.index).values
+    meta[index_col] = meta_ids(meta.index)
+    meta[label_col] = ['{} ({} genes)'.format(l, n) for l, n in zip(community_labels(meta.index), meta['n_members'])]
+    meta['community'] = community_labels(meta.index)
+    meta['data_source'] = 'community'
+
+    # node ID each gene is drawn as
+    display_id = pd.Series(np.where(is_expanded, nodes[index_col].values, meta_ids(community)), index=nodes[index_col].values)
+    a = display_id.reindex(edges[source_col].values).values
+    b = display_id.reindex(edges[target_col].values).values
+    keep = ~(np.isnan(a) | np.isnan(b)) & (a!=b)
+
+    agg = pd.DataFrame({
+        source_col: np.minimum(a, b)[keep].astype(np.int64),
+        target_col: np.maximum(a, b)[keep].astype(np.int64),
+        edge_score_col: edges[edge_score_col].values[keep],
+    })
+    agg = agg.groupby([source_col, target_col])[edge_score_col].agg(['sum', 'size']).reset_index()
+    agg.columns = [source_col, target_col, edge_score_col, 'n_edges']
+
+    show_nodes = pd.concat([genes, meta.reset_index(drop=True)], ignore_index=True)
+    show_nodes['node_marker'] = np.where(show_nodes[index_col]<0, 'hex', 'circle')
+
+    return show_nodes, agg
@@ -6,6 +6,14 @@ import panel as pn
 import os
 import dask.dataframe as dd
 
+from artifacts import load_artifacts
+from omics_index import OmicsIndex
+from upload_store import UploadStore
+from layout_cache import LayoutCache
+from global_layout import load_global_layout
+from string_graph import load_string_graph
+from utils import webgl_hook
+
 def setup():
     css = """
     .bk.card button.bk.card-header .bk.card-header-row .bk .bk.bk-clearfix {
@@ -55,9 +63,6 @@ def setup():
     if not os.path.exists(r'./assets/data/STRINGdb_edgefile.csv'):
         unpack_STRINGdb_edgefile()
 
-    def save_hook(plot, element):
-        plot.state.output_backend = 'svg'
-
     geneID_col = 'interactor_Human_Ortholog_EntrezGeneID'
     geneSymbol_col = 'interactor_Human_Ortholog_EntrezGeneSymbol'
     
@@ -176,7 +181,7 @@ def setup():
             yaxis=None,
             min_height=0,
             min_width=0,
-            hooks = [save_hook]
+            hooks = [webgl_hook]
         ),
         'Labels': dict(text_font_size = '10pt')
     }
@@ -218,7 +223,7 @@ def setup():
                 xlim = (45, 180)
             ),
             opts.Overlay(
-                hooks = [save_hook]
+                hooks = [webgl_hook]
             )
         ],
         'RNA': [
@@ -242,7 +247,7 @@ def setup():
                 xlim = (75, 180)
             ),
             opts.Overlay(
-                hooks = [save_hook]
+                hooks = [webgl_hook]
             )
         ],
         'SCRNA':[
@@ -253,7 +258,7 @@ def setup():
                 show_frame=False,
                 xrotation=90,
                 ylim = (0, 1.05),
-                hooks = [save_hook],            
+                hooks = [webgl_hook],            
             )
         ],
         'SNRNA':[
@@ -265,7 +270,7 @@ def setup():
                 framewise=True,
                 xrotation=90,
                 show_frame=False,
-                hooks = [save_hook]
+                hooks = [webgl_hook]
             ),
         ],
         'model_obs': [
@@ -275,7 +280,7 @@ def setup():
                 show_frame=False,
                 framewise=True,
                 xlabel = '',
-                hooks = [save_hook]
+                hooks = [webgl_hook]
             ),
         ]
     }
@@ -296,7 +301,7 @@ def setup():
                 legend_opts = {'title':'Tissue/Age (mo)'},
                 framewise=True,
                 show_frame = False,
-                hooks = [save_hook]
+                hooks = [webgl_hook]
             )
         ]
 
@@ -324,7 +329,7 @@ def setup():
             legend_opts = {'title':'Tissue/Age (mo)'},
             framewise=True,
             show_frame = False,
-            hooks = [save_hook]
+            hooks = [webgl_hook]
         )
     ]
 
@@ -333,12 +338,17 @@ def setup():
     # cache required data
     pn.state.cache['nodes'] = nodes
     pn.state.cache['edges'] = dd.read_csv(r'./assets/data/STRINGdb_edgefile.csv', usecols=[2, 3, 4])
+    pn.state.cache['string_graph'] = load_string_graph(pn.state.cache['edges'], edge_fn = r'./assets/data/STRINGdb_edgefile.csv') # CSR adjacency, rebuilt into ./assets/data/STRINGdb_csr.npz when the edge file changes
     pn.state.cache['filters'] = filters
     pn.state.cache['index_col'] = geneID_col
     pn.state.cache['gene_symbol_col'] = geneSymbol_col
     pn.state.cache['filter_aliases'] = filter_aliases
     pn.state.cache['groupby_PPI_cols'] = [geneID_col, 'source_identifier']
 
+    # prebuilt DataFilter products (build with "python artifacts.py"); None -> computed on DataFilter init
+    pn.state.cache['upload_store'] = UploadStore(r'./assets/data/user_uploads.sqlite', max_bytes = 500*1024**2)
+    pn.state.cache['artifacts'] = load_artifacts(nodes, filters, geneID_col, geneSymbol_col, [geneID_col, 'source_identifier'])
+
     pn.state.cache['graph_opts'] = graph_opts
     pn.state.cache['source_col'] = 'GENE_ID_A'
     pn.state.cache['target_col'] = 'GENE_ID_B'
@@ -346,10 +356,13 @@ def setup():
     pn.state.cache['fontsize'] = graph_opts['Labels']['text_font_size']
     pn.state.cache['node_cmap'] = node_cmap
     pn.state.cache['user_tooltips'] = tooltips
+    pn.state.cache['layout_cache'] = LayoutCache(max_size = 256, cache_dir = r'./assets/data/layout_cache')
+    pn.state.cache['global_layout'] = load_global_layout() # build with "python global_layout.py"; None -> no 'global' layout option
 
     pn.state.cache['annot_description_mapping'] = annot_desc
 
     pn.state.cache['omics_data'] = omics_data
+    pn.state.cache['omics_index'] = OmicsIndex(omics_data)
     pn.state.cache['dummy_leg'] = dummy_leg
     pn.state.cache['plot_opts'] = plot_opts
     pn.state.cache['background_geneIDs'] = background_geneIDs
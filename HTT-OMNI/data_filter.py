@@ -2,9 +2,17 @@ import param
 import panel as pn
 import pandas as pd
 import numpy as np
+import time
+import uuid
 from io import StringIO
 from bokeh.models import NumberFormatter
 
+from artifacts import ARTIFACT_KEYS, nodes_fingerprint
+from table_view import LazyTableView
+from metrics import METRICS, metrics_cache
+from communities import community_cache, community_labels, collapse, meta_ids
+from utils import edge_keys
+
 class DataFilter(param.Parameterized):
     filters = param.List(precedence=-1)
     
@@ -14,25 +22,73 @@ class DataFilter(param.Parameterized):
     sel_edges = param.DataFrame(precedence=-1)
     show_nodes = param.DataFrame(precedence=-1)
     show_edges = param.DataFrame(precedence=-1)
-    display_nodes = param.DataFrame()
+    display_nodes = param.DataFrame() # current page of the nodes table only
     display_user_data = param.DataFrame()
     
+    # nodes table (paginated, sorted and searched server-side)
+    display_table = param.Selector(objects = ['Displayed nodes', 'All filtered nodes'], default = 'Displayed nodes')
+    display_page = param.Integer(default = 1, bounds = (1, None))
+    display_page_size = param.Selector(objects = [10, 25, 50, 100], default = 25)
+    display_sort = param.Selector(objects = ['# PPI observations (all)'], default = '# PPI observations (all)')
+    display_ascending = param.Selector(objects = ['Descending', 'Ascending'], default = 'Descending')
+    display_search = param.String(default = '')
+    display_hide_columns = param.ListSelector(default = [])
+    display_page_info = param.String(default = '')
+    
     # node params
     node_query = param.String(default='')
-    max_nodes = param.Selector(objects = [10, 20, 50, 100, 200, 300, 400, 500], default=50)
+    max_nodes = param.Selector(objects = [10, 20, 50, 100, 200, 300, 400, 500, 1000, 2000, 5000, 10000], default=50) # above 500 the network is rasterized (see DraggableGraph.view_raster)
     node_display_priority = param.Selector(objects = ["# PPI observations (all)", "# PPI observations (filtered)"], default = '# PPI observations (all)')
     vis_unconnected = param.Selector(objects = ['Hide', 'Show'], default='Show')
     PPI_sum_cutoff = param.Integer(default=1, label = 'min. # PPI observations (filtered)')
-    color_opts = param.List(default = ['connectivity'])
+    metrics_scope = param.Selector(objects = ['Displayed network', 'All filtered nodes'], default = 'Displayed network', label = 'Compute node metrics on')
+    metrics_needed = param.Boolean(default = False, precedence=-1) # set by Network while a metric is the node color or size
+    color_opts = param.List(default = ['connectivity']+METRICS)
+
+    # omics threshold filters
+    omics_type = param.Selector(objects = [])
+    omics_tissue = param.Selector(objects = [])
+    omics_age = param.Selector(objects = [])
+    omics_Q_length = param.Selector(objects = [])
+    omics_comparison = param.Selector(objects = ['<', '<=', '>', '>='], default = '<')
+    omics_threshold = param.Number(default = 0)
+    omics_active = param.ListSelector(default = [])
+    omics_AND_OR_NOT = param.Selector(default = 'AND', objects = ['AND', 'OR', 'NOT'])
+    add_omics_filter = param.Action(lambda x: x.param.trigger('add_omics_filter'), label='ADD OMICS FILTER')
 
     # edge params
     STRINGdb_score = param.Number(0.4, bounds=(0, 1))
+
+    # STRING neighbors pulled into the view around selected nodes (see Network.expand_neighborhood)
+    expand_hops = param.Selector(objects = [1, 2], default = 1, label = 'Neighborhood hops')
+    expand_top_k = param.Integer(default = 25, bounds = (1, 200), label = 'max. neighbors added per expansion')
+    expanded_nodes = param.List(default = [], precedence=-1)
+    clear_expansion = param.Action(lambda x: x.param.trigger('clear_expansion'), label='REMOVE EXPANDED NEIGHBORS')
+
+    # most confident STRING paths from the queried genes (symbols or gene IDs) to HTT, shown instead of the filtered network
+    paths_to_HTT = param.Selector(objects = ['Off', 'On'], default = 'Off', label = 'Paths from query genes to HTT')
+    path_min_score = param.Number(0.7, bounds=(0, 1), label = 'min. STRINGdb score on paths')
+    path_k = param.Integer(default = 1, bounds = (1, 10), label = 'paths per query gene')
     
+    # network comparison (diff) mode: state A vs. state B (the current filters unless captured)
+    diff_mode = param.Selector(objects = ['Off', 'On'], default = 'Off')
+    capture_A = param.Action(lambda x: x.param.trigger('capture_A'), label='CAPTURE STATE A')
+    capture_B = param.Action(lambda x: x.param.trigger('capture_B'), label='CAPTURE STATE B')
+    release_B = param.Action(lambda x: x.param.trigger('release_B'), label='USE CURRENT FILTERS AS B')
+    diff_info = param.String(default = 'State A: not captured, state B: current filters')
+
+    # community detection over sel_nodes/sel_edges: color option ('On') or one meta-node per community ('Collapsed')
+    communities = param.Selector(objects = ['Off', 'On', 'Collapsed'], default = 'Off')
+    expanded_communities = param.List(default = [], precedence=-1)
+    collapse_communities = param.Action(lambda x: x.param.trigger('collapse_communities'), label='COLLAPSE ALL COMMUNITIES')
+
     # network plot title
     network_plot_title = param.String(default = '')
     
     # user upload of data
     user_upload_file = param.Parameter()
+    stored_uploads = param.Selector(objects = [], label = 'Previously uploaded data')
+    reattach_upload = param.Action(lambda x: x.param.trigger('reattach_upload'), label='ATTACH STORED UPLOAD')
     
     # for loading spinner control
     loading = param.Boolean(default=False)
@@ -50,6 +106,11 @@ class DataFilter(param.Parameterized):
                  edge_score_col = 'combined_score',
                  filter_aliases = None,
                  groupby_PPI_cols = ['geneID', 'studyID'],
+                 artifacts = None, # precomputed annotate()/update_options() products for the shipped nodes (see artifacts.py)
+                 omics_index = None, # OmicsIndex of the omics data, enables omics threshold filters
+                 upload_store = None, # UploadStore shared between sessions, enables reattaching previous uploads
+                 upload_owner = None, # owner of this session's uploads in upload_store (e.g. pn.state.user), defaults to this session only
+                 string_graph = None, # StringGraph of the full STRING edge file, enables neighborhood expansion
                  **params):
         
         super(DataFilter, self).__init__(**params)
@@ -66,6 +127,18 @@ class DataFilter(param.Parameterized):
         
         self.user_data = None
         self.user_quant = None
+        self.artifacts = artifacts
+        self._views = {}
+        self.omics_index = omics_index
+        self.omics_filters = {} # label -> (condition, comparison, threshold)
+        self.diff_states = {'A': None, 'B': None}
+        self.diff_live = None
+        self.membership = None
+        self.paths_found = (0, 0)
+        self.upload_store = upload_store
+        self.upload_owner = upload_owner if upload_owner is not None else uuid.uuid4().hex
+        self.string_graph = string_graph
+        self.stored_upload_keys = {}
         
         if filter_aliases is None:
             filter_aliases = {k: k for k in self.filters}
@@ -74,6 +147,11 @@ class DataFilter(param.Parameterized):
         self.filter_aliases_r = {filter_aliases[k]:k for k in filter_aliases}
         
         self.check_data()
+
+        if self.upload_store is not None:
+            self.base_fingerprint = nodes_fingerprint(self.nodes, self.filters, self.index_col, self.gene_symbol_col, self.groupby_PPI_cols)
+            self.update_stored_uploads()
+
         self.annotate()
                 
         self.update_options()
@@ -82,7 +160,10 @@ class DataFilter(param.Parameterized):
             self.param._add_parameter(opt, param.ListSelector(default = [], objects = self.options_map[opt].values.tolist()))
             self.param._add_parameter(opt+'_AND_OR_NOT', param.Selector(default = 'OR', objects = ['AND', 'OR', 'NOT']))
             
-        self.param.watch(self.filter_nodes, self.filters+[opt+'_AND_OR_NOT' for opt in self.options_])
+        self.param.watch(self.filter_nodes, self.filters+[opt+'_AND_OR_NOT' for opt in self.options_]+['omics_active', 'omics_AND_OR_NOT'])
+
+        if self.omics_index is not None:
+            self.update_omics_options()
         
         # widget mapping
         default = [(k, {'type': pn.widgets.MultiChoice, 'solid': False, 'placeholder': 'SHOW ALL', 'name': filter_aliases[k]}) if len(self.options_[k])<1000 else (k, {'type': pn.widgets.MultiSelect, 'size':10}) for k in self.options_]
@@ -106,6 +187,14 @@ class DataFilter(param.Parameterized):
             ),
             ('network_plot_title', {'type': pn.widgets.StaticText}
             ),
+            ('diff_mode', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('communities', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('paths_to_HTT', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('diff_info', {'type': pn.widgets.StaticText}
+            ),
             ('display_nodes', {'sizing_mode': 'stretch_both', 
                                'show_index': False, 
                                'autosize_mode':"fit_viewport", 
@@ -121,10 +210,42 @@ class DataFilter(param.Parameterized):
                                    'show_index': False, 
                                    'autosize_mode':"fit_viewport",}
             ),
+            ('display_table', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('display_page', {'type': pn.widgets.IntInput, 'name': 'Page', 'start': 1}
+            ),
+            ('display_page_size', {'name': 'Rows per page'}
+            ),
+            ('display_sort', {'name': 'Sort by'}
+            ),
+            ('display_ascending', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('display_search', {'type': pn.widgets.TextInput, 'placeholder': 'Search gene IDs or gene symbols', 'name': 'Search'}
+            ),
+            ('display_hide_columns', {'type': pn.widgets.MultiChoice, 'name': 'Hide columns'}
+            ),
+            ('display_page_info', {'type': pn.widgets.StaticText}
+            ),
+            ('omics_type', {'name': 'Data type'}
+            ),
+            ('omics_tissue', {'name': 'Tissue'}
+            ),
+            ('omics_age', {'name': 'Age (months)'}
+            ),
+            ('omics_Q_length', {'name': 'Q-length'}
+            ),
+            ('omics_comparison', {'type': pn.widgets.RadioButtonGroup}
+            ),
+            ('omics_threshold', {'type': pn.widgets.FloatInput, 'name': 'Threshold', 'step': 0.1}
+            ),
+            ('omics_active', {'type': pn.widgets.MultiChoice, 'solid': False, 'placeholder': 'NO OMICS FILTERS', 'name': 'Active omics filters'}
+            ),
+            ('omics_AND_OR_NOT', {'type': pn.widgets.RadioButtonGroup}
+            ),
         ]
         
         self.mapping = dict(other+default+default_AND_OR_NOT)
-        self.color_opts = ['connectivity']+[self.filter_aliases[k] for k in self.filter_aliases]
+        self.color_opts = ['connectivity']+METRICS+[self.filter_aliases[k] for k in self.filter_aliases]
 
         self.filter_nodes(1)# triggers self.apply_query, self.update_sel_nodes
 
@@ -141,7 +262,15 @@ class DataFilter(param.Parameterized):
         if not self.index_col in self.groupby_PPI_cols:
             raise KeyError('"index_col" ({}) must be present in "groupby_PPI_cols" ({})'.format(self.index_col, self.groupby_PPI_cols))
     
+    def use_artifacts(self):
+        # prebuilt products are only valid for the shipped nodes, user-upload overlays are always recomputed
+        return (self.artifacts is not None) and (self.user_data is None)
+
     def update_options(self):
+        if self.use_artifacts():
+            self.options_, self.options_map, self.options_map_r = [self.artifacts[k] for k in ['options_', 'options_map', 'options_map_r']]
+            return
+
         options_ = self.nodes[self.filters].apply(lambda x: np.unique(x.dropna()).tolist()).to_dict()
         self.options_ = options_
         self.options_map = pd.concat({f: self.nodes.groupby([self.index_col, f]).size().unstack().notnull().apply(lambda x: '{} ({})'.format(x.name, x.sum())) for f in self.filters})
@@ -158,6 +287,11 @@ class DataFilter(param.Parameterized):
         return pd.Series(arr_str.sum(axis=1), index = df.index).str.replace('EMPTY, ', '').str.strip(', ')
     
     def annotate(self):
+        if self.use_artifacts():
+            self.PPI_sum, self.sym_to_index, self.one_hot, self.annotations = [self.artifacts[k] for k in ['PPI_sum', 'sym_to_index', 'one_hot', 'annotations']]
+            self.param.PPI_sum_cutoff.bounds = (int(self.PPI_sum.min()), int(self.PPI_sum.max()))
+            return
+
         self.PPI_sum = self.compute_PPI_sum(self.nodes)
         
         self.param.PPI_sum_cutoff.bounds = (int(self.PPI_sum.min()), int(self.PPI_sum.max()))
@@ -214,8 +348,59 @@ class DataFilter(param.Parameterized):
         
         else:
             filtered_nodes = self.nodes
+
+        if len(self.omics_active)>0:
+            filtered_nodes = filtered_nodes[self.omics_mask(filtered_nodes[self.index_col].values)]
         
         self.filtered_nodes = filtered_nodes # triggers self.apply_query
+
+    def omics_mask(self, gene_ids):
+        # combine the active omics threshold filters with the omics AND/OR/NOT toggle
+        masks = np.vstack([self.omics_index.mask(gene_ids, *self.omics_filters[label]) for label in self.omics_active])
+
+        if self.omics_AND_OR_NOT=='AND':
+            return masks.all(axis=0)
+        elif self.omics_AND_OR_NOT=='OR':
+            return masks.any(axis=0)
+        else:
+            return ~masks.any(axis=0)
+
+    @param.depends('omics_type', 'omics_tissue', 'omics_age', watch=True)
+    def update_omics_options(self):
+        # cascade type -> tissue -> age -> Q-length so that only existing omics conditions can be selected
+        # (a level without options, e.g. in a sparse upload, empties itself and the levels below it)
+        selected = {}
+        empty = False
+        for level, p in [('type', 'omics_type'), ('tissue', 'omics_tissue'), ('age', 'omics_age'), ('Q-length', 'omics_Q_length')]:
+            objects = [] if empty else self.omics_index.options(level, selected)
+
+            if len(objects)==0:
+                empty = True
+                setattr(self, p, None)
+                getattr(self.param, p).objects = [] # set after the value, a None value would otherwise be appended to the objects
+                continue
+
+            getattr(self.param, p).objects = objects
+
+            if not getattr(self, p) in objects:
+                setattr(self, p, objects[0])
+
+            selected[level] = getattr(self, p)
+
+    @param.depends('add_omics_filter', watch=True)
+    def add_omics_threshold(self):
+        if None in [self.omics_type, self.omics_tissue, self.omics_age, self.omics_Q_length]:
+            pn.state.notifications.warning('WARNING: no omics data for the selected condition', duration=5000)
+            return
+
+        condition = self.omics_index.condition({'type': self.omics_type, 'tissue': self.omics_tissue, 'age': self.omics_age, 'Q-length': self.omics_Q_length})
+        label = '{} {} ({}mo, Q{}) {} {}'.format(self.omics_type, self.omics_tissue, self.omics_age, self.omics_Q_length, self.omics_comparison, self.omics_threshold)
+
+        self.omics_filters[label] = (condition, self.omics_comparison, self.omics_threshold)
+        self.param.omics_active.objects = list(self.omics_filters)
+
+        if not label in self.omics_active:
+            self.omics_active = self.omics_active+[label] # triggers self.filter_nodes
     
     @param.depends('node_query', 'filtered_nodes', watch=True)
     def apply_query(self):
@@ -224,9 +409,7 @@ class DataFilter(param.Parameterized):
         
         if not self.node_query=='':
             query_nodes = pd.Series(self.node_query.strip().split('\n'))
-            str_matches = self.sym_to_index[self.index_col][self.sym_to_index[self.gene_symbol_col].isin(query_nodes[~query_nodes.str.isnumeric()])].unique().tolist()
-            int_matches = query_nodes[query_nodes.str.isnumeric()].astype(int).unique().tolist()
-            filtered_nodes = self.filtered_nodes[self.filtered_nodes[self.index_col].isin(str_matches+int_matches)]
+            filtered_nodes = self.filtered_nodes[self.filtered_nodes[self.index_col].isin(self.query_ids())]
             
             self.query_found = (filtered_nodes[self.index_col].unique().shape[0], len(np.unique(query_nodes)))
             self.queried_nodes = filtered_nodes # triggers self.update_sel_nodes
@@ -235,6 +418,14 @@ class DataFilter(param.Parameterized):
             self.query_found = None
             self.queried_nodes = self.filtered_nodes # triggers self.update_sel_nodes
         
+    def query_ids(self):
+        # gene IDs in node_query (one gene symbol or gene ID per line)
+        query_nodes = pd.Series(self.node_query.strip().split('\n'))
+        str_matches = self.sym_to_index[self.index_col][self.sym_to_index[self.gene_symbol_col].isin(query_nodes[~query_nodes.str.isnumeric()])].unique().tolist()
+        int_matches = query_nodes[query_nodes.str.isnumeric()].astype(int).unique().tolist()
+
+        return str_matches+int_matches
+
     @param.depends('queried_nodes', 'PPI_sum_cutoff', watch=True)
     def update_sel_nodes(self):
 
@@ -273,31 +464,107 @@ class DataFilter(param.Parameterized):
         
         self.sel_edges = sel_edges # triggers self.update_show_data
         
-    @param.depends('max_nodes', 'sel_edges', 'node_display_priority', 'vis_unconnected', watch=True) 
+    def diff_state(self, show_nodes, show_edges):
+        return {
+            'nodes': show_nodes, 
+            'edges': show_edges, 
+            'node_ids': show_nodes[self.index_col].values, 
+            'edge_keys': edge_keys(show_edges[self.source_col], show_edges[self.target_col]),
+        }
+
+    def diff_union(self, A, B):
+        # union of the two states, classified as A only / B only / shared using ID arrays (shared rows are taken from B)
+        a_only_nodes = ~np.isin(A['node_ids'], B['node_ids'])
+        a_only_edges = ~np.isin(A['edge_keys'], B['edge_keys'])
+
+        show_nodes = pd.concat([B['nodes'], A['nodes'][a_only_nodes]], ignore_index=True)
+        show_edges = pd.concat([B['edges'], A['edges'][a_only_edges]], ignore_index=True)
+
+        node_ids = np.concatenate([B['node_ids'], A['node_ids'][a_only_nodes]])
+        keys = np.concatenate([B['edge_keys'], A['edge_keys'][a_only_edges]])
+
+        in_A = np.isin(node_ids, A['node_ids'])
+        show_nodes['diff_class'] = np.where(in_A & (np.arange(node_ids.shape[0])<B['node_ids'].shape[0]), 'shared', np.where(in_A, 'A only', 'B only'))
+
+        in_A = np.isin(keys, A['edge_keys'])
+        show_edges['diff_class'] = np.where(in_A & (np.arange(keys.shape[0])<B['edge_keys'].shape[0]), 'shared', np.where(in_A, 'A only', 'B only'))
+
+        return show_nodes, show_edges
+
+    @param.depends('capture_A', watch=True)
+    def capture_state_A(self):
+        self.diff_states['A'] = self.diff_live
+        self.update_diff_info()
+
+    @param.depends('capture_B', watch=True)
+    def capture_state_B(self):
+        self.diff_states['B'] = self.diff_live
+        self.update_diff_info()
+
+    @param.depends('release_B', watch=True)
+    def release_state_B(self):
+        self.diff_states['B'] = None
+        self.update_diff_info()
+
+    def update_diff_info(self):
+        A, B = [self.diff_states[k] for k in ['A', 'B']]
+        self.diff_info = 'State A: {}, state B: {}'.format(
+            'not captured' if A is None else '{} nodes, {} edges'.format(A['node_ids'].shape[0], A['edge_keys'].shape[0]),
+            'current filters' if B is None else '{} nodes, {} edges'.format(B['node_ids'].shape[0], B['edge_keys'].shape[0]),
+        )
+
+        if self.diff_mode=='On':
+            self.update_show_data()
+
+    @param.depends('max_nodes', 'sel_edges', 'node_display_priority', 'vis_unconnected', 'diff_mode', 'metrics_scope', 'communities', 'expanded_communities', 'expanded_nodes', 'paths_to_HTT', 'path_min_score', 'path_k', watch=True) 
     def update_show_data(self):
 
         self.loading = True
         
         node_display_priority = dict(zip(["# PPI observations (all)", "# PPI observations (filtered)"], ['PPI_SUM_TOTAL', 'PPI_SUM_FILT']))[self.node_display_priority]
 
-        if self.vis_unconnected=='Hide':
-            temp = []
-            for i, x in self.sel_edges.sort_values('min_'+node_display_priority, ascending=False).iterrows():
-                temp.extend(x[[self.source_col, self.target_col]].values.tolist())
-
-                if len(np.unique(temp).tolist())>=self.max_nodes:
-                    break
-
-            show_nodes = self.sel_nodes[self.sel_nodes.index.isin(np.unique(temp))].reset_index()
+        if self.paths_to_HTT=='On' and self.string_graph is not None:
+            show_nodes, show_edges = self.path_view()
+        elif self.communities=='Collapsed':
+            show_nodes, show_edges = self.collapsed_view(node_display_priority)
         else:
-            show_nodes = self.sel_nodes.sort_values(node_display_priority, ascending=False).iloc[:self.max_nodes, :].reset_index()
+            if self.vis_unconnected=='Hide':
+                # endpoints of the highest priority edges, up to the edge that brings in the max_nodes-th node
+                temp = self.sel_edges.sort_values('min_'+node_display_priority, ascending=False)[[self.source_col, self.target_col]].values.ravel()
+                first = np.sort(np.unique(temp, return_index=True)[1])
+                if first.shape[0]>=self.max_nodes:
+                    temp = temp[:2*(first[self.max_nodes-1]//2+1)]
+
+                show_nodes = self.sel_nodes[self.sel_nodes.index.isin(np.unique(temp))].reset_index()
+            else:
+                show_nodes = self.sel_nodes.sort_values(node_display_priority, ascending=False).iloc[:self.max_nodes, :].reset_index()
         
-        in_source = self.sel_edges[self.source_col].isin(show_nodes[self.index_col])
-        in_target = self.sel_edges[self.target_col].isin(show_nodes[self.index_col])
-        show_edges = self.sel_edges[in_source & in_target].copy()
+            in_source = self.sel_edges[self.source_col].isin(show_nodes[self.index_col])
+            in_target = self.sel_edges[self.target_col].isin(show_nodes[self.index_col])
+            show_edges = self.sel_edges[in_source & in_target].copy()
+
+            self.diff_live = self.diff_state(show_nodes, show_edges)
+
+            if self.diff_mode=='On' and self.diff_states['A'] is not None:
+                show_nodes, show_edges = self.diff_union(self.diff_states['A'], self.diff_states['B'] if self.diff_states['B'] is not None else self.diff_live)
+
+            if len(self.expanded_nodes)>0:
+                show_nodes, show_edges = self.merge_expanded(show_nodes, show_edges)
         
         show_nodes['connectivity'] = pd.concat([show_edges.groupby(self.source_col).size(), show_edges.groupby(self.target_col).size()], axis=1).sum(axis=1).reindex(show_nodes[self.index_col]).fillna(0).values
-        show_nodes['node_marker'] = np.where(show_nodes[self.index_col]==3064, 'square', 'circle')
+        marker = show_nodes['node_marker'] if 'n_members' in show_nodes.columns else 'circle' # community meta-nodes are hexagons
+        show_nodes['node_marker'] = np.where(show_nodes[self.index_col]==3064, 'square', marker)
+
+        if self.communities=='On':
+            show_nodes['community'] = community_labels(self.node_communities().reindex(show_nodes[self.index_col]).fillna(0).astype(int))
+
+        # centrality metrics on the displayed or the filtered subgraph (cached per node/edge set), only while they are shown
+        if self.metrics_needed:
+            if self.metrics_scope=='Displayed network':
+                metrics = metrics_cache.get(show_nodes[self.index_col].values, show_edges[self.source_col].values, show_edges[self.target_col].values)
+            else:
+                metrics = metrics_cache.get(self.sel_nodes.index.values, self.sel_edges[self.source_col].values, self.sel_edges[self.target_col].values)
+            show_nodes[METRICS] = metrics.reindex(show_nodes[self.index_col]).fillna(0).values
         
         # configure network plot title
         if self.query_found is None:
@@ -311,10 +578,123 @@ class DataFilter(param.Parameterized):
             else:
                 self.network_plot_title = 'Displaying {} of {} nodes passing the filter criteria ({} of {} queried nodes found in PPI network; {} nodes unconnected)'.format(show_nodes.shape[0], self.sel_nodes.shape[0], *self.query_found, (show_nodes['connectivity']==0).sum())
 
+        if self.paths_to_HTT=='On' and self.string_graph is not None:
+            self.network_plot_title = 'Displaying {} paths from {} query genes to HTT over STRING edges with score >= {}'.format(*self.paths_found, self.path_min_score)
+        elif self.communities=='Collapsed':
+            self.network_plot_title = 'Displaying {} communities ({} expanded) of {} nodes passing the filter criteria'.format(self.membership.max(), len(self.expanded_communities), self.sel_nodes.shape[0])
+
+        if 'diff_class' in show_nodes.columns:
+            n = show_nodes['diff_class'].value_counts().reindex(['A only', 'B only', 'shared']).fillna(0).astype(int)
+            self.network_plot_title = 'Comparing state A and state B: {} A only, {} B only and {} shared nodes'.format(*n.values)
+
+        # node color options must be updated before show_nodes (Network reads show_nodes[node_color])
+        color_opts = [c for c in self.color_opts if c not in ['diff_class', 'community']]+[c for c in ['diff_class', 'community'] if c in show_nodes.columns]
+        if color_opts!=self.color_opts:
+            self.color_opts = color_opts
+
         self.loading = False
         
         self.param.set_param(show_nodes = show_nodes, show_edges = show_edges) # triggers Network.update_data
         
+    @param.depends('metrics_needed', watch=True)
+    def update_metrics(self):
+        # the displayed nodes get their metric columns when a metric option is chosen (they are kept until the next update)
+        if self.metrics_needed and self.show_nodes is not None and not set(METRICS)<=set(self.show_nodes.columns):
+            self.update_show_data()
+
+    def node_communities(self):
+        # Louvain communities of the filtered network (cached per subgraph); expansions are reset when they change
+        membership = community_cache.get(self.sel_nodes.index.values, self.sel_edges[self.source_col].values, self.sel_edges[self.target_col].values, self.sel_edges[self.edge_score_col].values)
+
+        if membership is not self.membership:
+            self.membership = membership
+            with param.discard_events(self):
+                self.expanded_communities = []
+
+        return membership
+
+    def collapsed_view(self, priority_col):
+        # expanded communities show at most max_nodes genes (highest priority_col first), the rest stay collapsed
+        show_nodes, show_edges = collapse(self.sel_nodes.reset_index(), self.sel_edges, self.node_communities(), self.expanded_communities, self.index_col, self.gene_symbol_col, self.source_col, self.target_col, self.edge_score_col, max_expanded = self.max_nodes, priority_col = priority_col)
+        if show_nodes[self.index_col].isin(meta_ids(self.expanded_communities)).any():
+            pn.state.notifications.info('Expanded communities are limited to {} genes (max nodes); the remaining members stay collapsed'.format(self.max_nodes), duration=5000)
+
+        if self.vis_unconnected=='Hide':
+            show_nodes = show_nodes[show_nodes['community']!='unconnected']
+
+        return show_nodes, show_edges
+
+    def expand_community(self, meta_id):
+        # meta_id as drawn by collapse(), e.g. the clicked node
+        community = -int(meta_id)-1
+        if community not in self.expanded_communities:
+            self.expanded_communities = self.expanded_communities+[community] # triggers self.update_show_data
+
+    @param.depends('collapse_communities', watch=True)
+    def collapse_all_communities(self):
+        self.expanded_communities = []
+
+    def expand_neighborhood(self, gene_id):
+        # adds the top expand_top_k STRING neighbors (within expand_hops, above STRINGdb_score) of gene_id to the view
+        if self.string_graph is None:
+            pn.state.notifications.warning('WARNING: neighborhood expansion is not available (no STRING adjacency loaded)', duration=5000)
+            return
+
+        shown = self.show_nodes[self.index_col].values if self.show_nodes is not None else []
+        new_ids = self.string_graph.k_hop([gene_id], self.expand_hops, self.STRINGdb_score, self.expand_top_k, exclude = shown)
+
+        if new_ids.shape[0]==0:
+            pn.state.notifications.info('No further STRING neighbors with score >= {}'.format(self.STRINGdb_score), duration=3000)
+            return
+
+        self.expanded_nodes = self.expanded_nodes+new_ids.tolist() # triggers self.update_show_data
+
+    def string_nodes(self, gene_ids, data_source):
+        # node rows for genes pulled in from STRING (outside the current filter), labelled by gene ID if not in HINT
+        gene_ids = np.asarray(gene_ids, dtype=np.int64)
+        symbols = self.sym_to_index.drop_duplicates(self.index_col).set_index(self.index_col)[self.gene_symbol_col].reindex(gene_ids)
+
+        return pd.DataFrame({
+            self.index_col: gene_ids,
+            self.gene_symbol_col: np.where(symbols.isnull(), gene_ids.astype(str), symbols.values),
+            'PPI_SUM_TOTAL': self.PPI_sum.reindex(gene_ids).fillna(0).values,
+            'PPI_SUM_FILT': 0,
+            'data_source': data_source,
+        })
+
+    def merge_expanded(self, show_nodes, show_edges):
+        # expanded genes and their STRING edges to the displayed nodes
+        new_ids = np.setdiff1d(self.expanded_nodes, show_nodes[self.index_col].values)
+        new_nodes = self.string_nodes(new_ids, 'STRING neighbor')
+
+        ids = np.concatenate([show_nodes[self.index_col].values, new_ids])
+        new_edges = self.string_graph.edges_within(ids, self.STRINGdb_score, self.source_col, self.target_col, self.edge_score_col)
+        new_edges = new_edges[new_edges[self.source_col].isin(new_ids) | new_edges[self.target_col].isin(new_ids)]
+
+        return pd.concat([show_nodes, new_nodes], ignore_index=True), pd.concat([show_edges, new_edges], ignore_index=True)
+
+    def path_view(self):
+        # union of the top path_k paths from each queried gene to HTT (filtered annotations for genes passing the filters)
+        paths = self.string_graph.top_paths(self.query_ids(), 3064, self.path_min_score, self.path_k)
+        self.paths_found = (len(paths), len(np.unique([p[0] for p, c in paths])))
+
+        ids = np.unique(np.concatenate([[3064]]+[p for p, c in paths]))
+        in_sel = np.isin(ids, self.sel_nodes.index)
+        show_nodes = pd.concat([self.sel_nodes.loc[ids[in_sel]].reset_index(), self.string_nodes(ids[~in_sel], 'STRING path')], ignore_index=True)
+
+        on_path = pd.DataFrame({
+            self.source_col: np.concatenate([p[:-1] for p, c in paths]+[[]]).astype(np.int64),
+            self.target_col: np.concatenate([p[1:] for p, c in paths]+[[]]).astype(np.int64),
+        })
+        edges = self.string_graph.edges_within(ids, self.path_min_score, self.source_col, self.target_col, self.edge_score_col)
+        show_edges = edges[np.isin(edge_keys(edges[self.source_col], edges[self.target_col]), edge_keys(on_path[self.source_col], on_path[self.target_col]))]
+
+        return show_nodes, show_edges
+
+    @param.depends('clear_expansion', watch=True)
+    def remove_expanded_nodes(self):
+        self.expanded_nodes = []
+
     @param.depends('reset_filters', watch=True)
     def clear_filters(self):
         self.loading = True
@@ -322,107 +702,242 @@ class DataFilter(param.Parameterized):
         with param.discard_events(self): # don't trigger any param update events
             for f in self.filters:
                 setattr(self, f, [])
+            self.omics_active = []
             self.PPI_sum_cutoff = 1
+            self.expanded_nodes = []
 
         self.filter_nodes()
         
-    @param.depends('show_nodes', watch = True)
-    def update_display_nodes(self):
+    def display_builders(self, frame):
+        # column builders for the wide nodes table (all annotations vs. after filtering); frame is indexed by index_col
+        builders = {
+            'GeneID': lambda ids: ids,
+            'Gene Symbol': lambda ids: frame[self.gene_symbol_col].reindex(ids).values,
+            '# PPI observations (all)': lambda ids: frame['PPI_SUM_TOTAL'].reindex(ids).values,
+            '# PPI observations (filtered)': lambda ids: frame['PPI_SUM_FILT'].reindex(ids).values,
+        }
 
-        filt = self.show_nodes.set_index([self.index_col, self.gene_symbol_col])
-        filt.index.names = ['GeneID', 'Gene Symbol']
+        if 'connectivity' in frame.columns:
+            builders['connectivity'] = lambda ids: frame['connectivity'].reindex(ids).values
 
-        all_annot = self.annotations.reset_index().set_index([self.index_col, self.gene_symbol_col]).loc[filt.index, :]
-        all_annot.index.names = ['GeneID', 'Gene Symbol']
+        for col in METRICS:
+            if col in frame.columns:
+                builders[col] = lambda ids, col=col: frame[col].reindex(ids).values
 
         if self.user_quant is not None:
-            temp = pd.concat([pd.concat([all_annot[f], filt[[f]]], axis=1, keys = ['all annotations', 'after filtering']) for f in self.filters], axis=1)
-            temp.columns = [self.filter_aliases[j]+f' ({i})'for i, j in temp.columns.values]
-            temp['# PPI observations (all)'] = filt.loc[temp.index, 'PPI_SUM_TOTAL']
-            temp['# PPI observations (filtered)'] = filt.loc[temp.index, 'PPI_SUM_FILT']
-            temp['connectivity'] = filt.loc[temp.index, 'connectivity']
-            temp = pd.concat([temp, self.user_quant.reindex(temp.index, level='GeneID')], axis=1)
+            for col in self.user_quant.columns:
+                builders[col] = lambda ids, col=col: self.user_quant[col].reindex(ids).values
+
+        for f in self.filters:
+            builders[self.filter_aliases[f]+' (all annotations)'] = lambda ids, f=f: self.annotations[f].reindex(ids).values
+            builders[self.filter_aliases[f]+' (after filtering)'] = lambda ids, f=f: frame[f].reindex(ids).values
+
+        return builders
+
+    def nodes_view(self, which = 'show'):
+        # lazily built nodes table for show_nodes ('show') or sel_nodes ('sel'), cached until the underlying frame changes
+        frame = {'show': self.show_nodes, 'sel': self.sel_nodes}[which]
+
+        if which in self._views and self._views[which][0] is frame:
+            return self._views[which][1]
+
+        frame_ = frame.set_index(self.index_col) if which=='show' else frame
+        view = LazyTableView(frame_.index.values, self.display_builders(frame_))
+        self._views[which] = (frame, view)
+
+        return view
+
+    @param.depends('show_nodes', 'display_table', watch = True)
+    def update_display_view(self):
+
+        view = self.nodes_view({'Displayed nodes': 'show', 'All filtered nodes': 'sel'}[self.display_table])
+
+        self.param.display_sort.objects = view.columns
+        self.param.display_hide_columns.objects = [c for c in view.columns if not c in ['GeneID', 'Gene Symbol']]
 
-            self.display_nodes = temp[['# PPI observations (all)', '# PPI observations (filtered)', 'connectivity']+self.user_quant.columns.values.tolist()+[i for i in temp.columns if not i in ['# PPI observations (all)', '# PPI observations (filtered)', 'connectivity']+self.user_quant.columns.values.tolist()]].reset_index()
+        with param.discard_events(self):
+            if not self.display_sort in view.columns:
+                self.display_sort = '# PPI observations (all)'
+            self.display_hide_columns = [c for c in self.display_hide_columns if c in view.columns]
 
+        if self.display_page != 1:
+            self.display_page = 1 # triggers self.update_display_nodes
         else:
-            temp = pd.concat([pd.concat([all_annot[f], filt[[f]]], axis=1, keys = ['all annotations', 'after filtering']) for f in self.filters], axis=1)
-            temp.columns = [self.filter_aliases[j]+f' ({i})'for i, j in temp.columns.values]
-            temp['# PPI observations (all)'] = filt.loc[temp.index, 'PPI_SUM_TOTAL']
-            temp['# PPI observations (filtered)'] = filt.loc[temp.index, 'PPI_SUM_FILT']
-            temp['connectivity'] = filt.loc[temp.index, 'connectivity']
+            self.update_display_nodes()
 
-            self.display_nodes = temp[['# PPI observations (all)', '# PPI observations (filtered)', 'connectivity']+[i for i in temp.columns if not i in ['# PPI observations (all)', '# PPI observations (filtered)', 'connectivity']]].reset_index()
+    @param.depends('display_page', 'display_page_size', 'display_sort', 'display_ascending', 'display_search', 'display_hide_columns', watch = True)
+    def update_display_nodes(self):
 
-    @param.depends('user_upload_file', watch=True)
-    def add_user_data(self):
-        self.loading = True
-        
-        user_data = pd.read_csv(StringIO(self.user_upload_file.decode("utf8")), sep='\t').fillna('Not reported')
+        view = self.nodes_view({'Displayed nodes': 'show', 'All filtered nodes': 'sel'}[self.display_table])
+
+        page, page_num, n_pages, n_rows = view.page(
+            self.display_page, 
+            self.display_page_size, 
+            columns = [c for c in view.columns if not c in self.display_hide_columns],
+            sort_by = self.display_sort, 
+            ascending = self.display_ascending=='Ascending',
+            search = self.display_search.strip(),
+            search_cols = ['GeneID', 'Gene Symbol'],
+        )
+
+        if page_num != self.display_page:
+            self.display_page = page_num # triggers self.update_display_nodes with the page clamped to the available range
+            return
+
+        self.display_page_info = 'Page {} of {} ({} nodes)'.format(page_num, n_pages, n_rows)
+        self.display_nodes = page
+
+    def parse_user_data(self, raw):
+        # returns (user_data, user_quant, display_user_data) for a valid upload, otherwise None
+        user_data = pd.read_csv(StringIO(raw.decode("utf8")), sep='\t').fillna('Not reported')
         
         reqd_cols = ['gene_id', 'gene_symbol', 'study_id']
         
         if not np.isin(reqd_cols, user_data.columns).all():
             pn.state.notifications.error('ERROR: user upload must contain the following columns: {}'.format(', '.join(reqd_cols)), duration=0)
-            self.update_show_data()
-        
-        else:
-            self.user_data = user_data
+            return None
             
-            if user_data[['gene_id', 'study_id']].duplicated().any():
-                pn.state.notifications.warning('WARNING: duplicate gene IDs found, dropping duplicate entries', duration=0)
-                user_data = user_data[~user_data[['gene_id', 'study_id']].duplicated()].copy()
+        if user_data[['gene_id', 'study_id']].duplicated().any():
+            pn.state.notifications.warning('WARNING: duplicate gene IDs found, dropping duplicate entries', duration=0)
+            user_data = user_data[~user_data[['gene_id', 'study_id']].duplicated()].copy()
 
-            if user_data['gene_id'].isnull().any():
-                pn.state.notifications.warning('WARNING: found blank gene ID values, dropping missing gene ID rows', duration=0)
-                user_data = user_data[user_data['gene_id'].notnull()]
+        if user_data['gene_id'].isnull().any():
+            pn.state.notifications.warning('WARNING: found blank gene ID values, dropping missing gene ID rows', duration=0)
+            user_data = user_data[user_data['gene_id'].notnull()]
 
-            if user_data['study_id'].isnull().any():
-                pn.state.notifications.warning('WARNING: found blank study ID values, dropping missing study ID rows', duration=0)
-                user_data = user_data[user_data['study_id'].notnull()]
+        if user_data['study_id'].isnull().any():
+            pn.state.notifications.warning('WARNING: found blank study ID values, dropping missing study ID rows', duration=0)
+            user_data = user_data[user_data['study_id'].notnull()]
 
-            user_data['data_source'] = 'user - '+user_data['study_id']
-            self.display_user_data = user_data.copy()
+        user_data['data_source'] = 'user - '+user_data['study_id']
+        display_user_data = user_data.copy()
 
-            if 'model_species' in user_data.columns:
-                user_data['model'] = user_data['model_species'].str.split(r" (", expand=True, regex=False)[0]
-            
-            cols = user_data.columns
-            user_data.columns = cols.where(cols!='gene_id', self.index_col).where(cols!='gene_symbol', self.gene_symbol_col)
-            user_data[self.groupby_PPI_cols[-1]] = user_data['study_id'].copy()
+        if 'model_species' in user_data.columns:
+            user_data['model'] = user_data['model_species'].str.split(r" (", expand=True, regex=False)[0]
+        
+        cols = user_data.columns
+        user_data.columns = cols.where(cols!='gene_id', self.index_col).where(cols!='gene_symbol', self.gene_symbol_col)
+        user_data[self.groupby_PPI_cols[-1]] = user_data['study_id'].copy()
 
-            self.user_quant = user_data.set_index(self.index_col)[user_data.columns[user_data.columns.str.contains('QUANT_')]]
-            self.user_quant.columns = self.user_quant.columns.str.replace('QUANT_', '')
+        user_quant = user_data.set_index(self.index_col)[user_data.columns[user_data.columns.str.contains('QUANT_')]]
+        user_quant.columns = user_quant.columns.str.replace('QUANT_', '')
 
-            # make sure that if "QUANT" columns are included, there aren't multiple duplicate nodes with different quant values
-            if (self.user_quant.groupby(self.index_col).size()>1).any():
-                pn.state.notifications.warning('WARNING: different QUANT_ values cannot be associated with the same node, dropping duplicate quantitative values for {} nodes'.format((self.user_quant.groupby(self.index_col).size()>1).sum()), duration=0)
-                self.user_quant = self.user_quant[~self.user_quant.index.duplicated()]
+        # make sure that if "QUANT" columns are included, there aren't multiple duplicate nodes with different quant values
+        if (user_quant.groupby(self.index_col).size()>1).any():
+            pn.state.notifications.warning('WARNING: different QUANT_ values cannot be associated with the same node, dropping duplicate quantitative values for {} nodes'.format((user_quant.groupby(self.index_col).size()>1).sum()), duration=0)
+            user_quant = user_quant[~user_quant.index.duplicated()]
 
-            self.color_opts = ['connectivity']+[self.filter_aliases[k] for k in self.filter_aliases]+self.user_quant.columns.values.tolist()
+        return user_data, user_quant, display_user_data
 
-            self.user_data = self.user_data.reindex([self.index_col, self.gene_symbol_col, self.groupby_PPI_cols[-1], 'model']+self.filters, axis=1).fillna('Not reported')
-            
-            # combine with existing nodes, dropping any existing "user added" rows
-            new_nodes = pd.concat([self.nodes[self.nodes['data_source']=='HINT'], user_data])
-            new_nodes.index = range(new_nodes.shape[0])
+    def apply_user_data(self, user_data, user_quant, display_user_data, products = None):
+        # overlay user data on the HINT nodes; products are stored annotate()/update_options() results for this overlay
+        self.user_data = user_data.reindex([self.index_col, self.gene_symbol_col, self.groupby_PPI_cols[-1], 'model']+self.filters, axis=1).fillna('Not reported')
+        self.user_quant = user_quant
+        self.display_user_data = display_user_data.copy()
 
-            self.nodes = new_nodes
+        self.color_opts = ['connectivity']+METRICS+[self.filter_aliases[k] for k in self.filter_aliases]+self.user_quant.columns.values.tolist()
+        
+        # combine with existing nodes, dropping any existing "user added" rows
+        new_nodes = pd.concat([self.nodes[self.nodes['data_source']=='HINT'], user_data])
+        new_nodes.index = range(new_nodes.shape[0])
+
+        self.nodes = new_nodes
+
+        if products is None:
             self.annotate()
-                        
-            is_new = (~self.annotations['data_source'].str.contains('HINT')).sum()
-            existing = (self.annotations['data_source'].str.contains('HINT')&(self.annotations['data_source']!='HINT')).sum()
-            
-            # notify user
-            pn.state.notifications.send('{} new nodes added to the network. {} existing nodes found in user uploaded data'.format(is_new, existing), background='#4489ab', icon="<i class='fa fa-info-circle' style='color: white'></i> ", duration=0)
-            
-            # reset filters & trigger network update
-            self.param.trigger('reset_filters')
-            
+        else:
+            self.load_products(products)
+                    
+        is_new = (~self.annotations['data_source'].str.contains('HINT')).sum()
+        existing = (self.annotations['data_source'].str.contains('HINT')&(self.annotations['data_source']!='HINT')).sum()
+        
+        # notify user
+        pn.state.notifications.send('{} new nodes added to the network. {} existing nodes found in user uploaded data'.format(is_new, existing), background='#4489ab', icon="<i class='fa fa-info-circle' style='color: white'></i> ", duration=0)
+        
+        # reset filters & trigger network update
+        self.param.trigger('reset_filters')
+        
+        if products is None:
             self.update_options()
+        
+        for opt in self.options_:
+            setattr(getattr(self.param, opt), 'objects', self.options_map[opt].values.tolist())
+
+    def load_products(self, products):
+        for k in ARTIFACT_KEYS:
+            setattr(self, k, products[k])
+        
+        self.param.PPI_sum_cutoff.bounds = (int(self.PPI_sum.min()), int(self.PPI_sum.max()))
+
+    def update_stored_uploads(self):
+        if self.upload_store is None:
+            return
+
+        self.stored_upload_keys = {}
+        for key, label, size, created, last_access in self.upload_store.list(self.upload_owner):
+            self.stored_upload_keys['{} [{:.1f} MB, uploaded {}]'.format(label, size/1024**2, time.strftime('%Y-%m-%d %H:%M', time.localtime(created)))] = key
+
+        self.param.stored_uploads.objects = list(self.stored_upload_keys)
+
+        if len(self.stored_upload_keys)>0 and not self.stored_uploads in self.stored_upload_keys:
+            self.stored_uploads = list(self.stored_upload_keys)[0]
+
+    @param.depends('user_upload_file', watch=True)
+    def add_user_data(self):
+        if self.user_upload_file is None:
+            return
+
+        self.loading = True
+
+        if self.upload_store is not None:
+            key = self.upload_store.key(self.user_upload_file)
             
-            for opt in self.options_:
-                setattr(getattr(self.param, opt), 'objects', self.options_map[opt].values.tolist())
+            if self.attach_stored_upload(key):
+                return
+        
+        parsed = self.parse_user_data(self.user_upload_file)
+        
+        if parsed is None:
+            self.update_show_data()
+            return
+
+        self.apply_user_data(*parsed)
+
+        if self.upload_store is not None:
+            label = '{} ({} rows)'.format(', '.join(np.unique(parsed[2]['study_id'].astype(str))), parsed[0].shape[0])
+            payload = dict(zip(['user_data', 'user_quant', 'display_user_data'], parsed))
+            payload.update({'base_fingerprint': self.base_fingerprint, 'products': {k: getattr(self, k) for k in ARTIFACT_KEYS}})
+
+            if not self.upload_store.put(key, label, payload, owner = self.upload_owner):
+                pn.state.notifications.warning('WARNING: upload is larger than the upload store quota and will not be saved for later sessions', duration=0)
+
+            self.update_stored_uploads()
+
+    def attach_stored_upload(self, key):
+        # returns False if the upload is not stored
+        payload = self.upload_store.get(key, owner = self.upload_owner)
+
+        if payload is None:
+            return False
+
+        # stored overlay structures are only valid for the HINT nodes they were computed with
+        products = payload['products'] if payload['base_fingerprint']==self.base_fingerprint else None
+        self.apply_user_data(payload['user_data'], payload['user_quant'], payload['display_user_data'], products = products)
+        self.update_stored_uploads()
+
+        return True
+
+    @param.depends('reattach_upload', watch=True)
+    def reattach_stored_upload(self):
+        if self.stored_uploads is None:
+            return
+
+        self.loading = True
+
+        if not self.attach_stored_upload(self.stored_upload_keys[self.stored_uploads]):
+            pn.state.notifications.error('ERROR: stored upload was evicted, please upload the file again', duration=0)
+            self.update_stored_uploads()
+            self.update_show_data()
 
     @param.depends('remove_user_data', watch=True)
     def rem_user_data(self):
@@ -436,7 +951,7 @@ class DataFilter(param.Parameterized):
             new_nodes = self.nodes[self.nodes['data_source']=='HINT'].copy()
             new_nodes.index = range(new_nodes.shape[0])
 
-            self.color_opts = ['connectivity']+[self.filter_aliases[k] for k in self.filter_aliases]
+            self.color_opts = ['connectivity']+METRICS+[self.filter_aliases[k] for k in self.filter_aliases]
             
             self.nodes = new_nodes
             
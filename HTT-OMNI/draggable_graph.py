@@ -1,10 +1,32 @@
 import pandas as pd
 import numpy as np
 import holoviews as hv
+from holoviews import dim
+from holoviews.plotting.util import process_cmap
+from bokeh.models import ColorMapper, LinearColorMapper
 import networkx as nx
 import param
+import panel as pn
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from holoviews.operation.datashader import bundle_graph
 
+from force_layout import force_directed_layout
+from spatial_index import SpatialIndex
+from raster_graph import raster_edges, raster_nodes, neighborhood, interactive_subset
+from utils import edge_keys
+
+logger = logging.getLogger(__name__)
+
+# background workers for layout refinement, shared by all sessions
+layout_executor = ThreadPoolExecutor(max_workers=2)
+
 class DraggableGraph(param.Parameterized):
     
     # keeps track of previous nodes, edges, and layout to maintain node positions when changing aesthetic properties
@@ -13,6 +35,48 @@ class DraggableGraph(param.Parameterized):
     current_layout = param.String(precedence=-1)
     current_stream_data = param.Parameter(precedence=-1)
     
+    # iteration/time budget and seed for the vectorized force-directed layout (see force_layout.py)
+    force_layout_params = param.Dict({'iterations': 50, 'time_budget': 2.0, 'seed': 0}, precedence=-1)
+    
+    # short local optimization used to place new nodes in incremental mode (surviving nodes are pinned unless pin_existing is False)
+    incremental_params = param.Dict({'iterations': 30, 'time_budget': 0.5, 'seed': 0, 'pin_existing': True}, precedence=-1)
+    
+    # incremental placement needs at least this fraction of the new nodes to be already displayed (else full layout)
+    incremental_min_overlap = param.Number(0.5, bounds=(0, 1), precedence=-1)
+    
+    # iterations of local refinement after reading the global coordinates (0 -> exact global positions)
+    global_refine_iterations = param.Integer(0, bounds=(0, None), precedence=-1)
+    
+    # layouts that are first drawn provisionally (short force-directed run or cached layout) and refined in the background
+    progressive_layouts = param.List(['kamada_kawai', 'spring', 'force_directed'], precedence=-1)
+    progressive_min_nodes = param.Integer(100, bounds=(0, None), precedence=-1)
+    provisional_params = param.Dict({'iterations': 15, 'time_budget': 0.2, 'seed': 0}, precedence=-1)
+    
+    # edge bundling runs in the background once positions have been still for bundle_delay seconds (straight edges are shown meanwhile)
+    bundle_delay = param.Number(0.75, bounds=(0, None), precedence=-1)
+    bundle_cache_size = param.Integer(8, bounds=(1, None), precedence=-1)
+    bundle_token = param.Integer(0, precedence=-1)
+    
+    # level-of-detail labels: at most label_budget labels in the current viewport, highest label_priority first
+    # (the selected node's neighbourhood always comes first), so zooming in reveals more labels
+    lod_labels = param.Boolean(True, precedence=-1)
+    label_budget = param.Integer(40, bounds=(0, None), precedence=-1)
+    label_priority = param.List(['PPI_SUM_TOTAL', 'connectivity'], precedence=-1)
+    
+    # drags moving at most this many nodes patch the edge and label sources in place instead of re-rendering them
+    drag_patch_max = param.Integer(10, bounds=(0, None), precedence=-1)
+    
+    # networks with more nodes are rasterized server-side (datashader), with glyphs, labels and hover only for the top
+    # raster_top_n nodes by raster_priority and the selected neighbourhood
+    raster_threshold = param.Integer(500, bounds=(0, None), precedence=-1)
+    raster_top_n = param.Integer(100, bounds=(0, None), precedence=-1)
+    raster_priority = param.String('PPI_SUM_TOTAL', precedence=-1)
+    raster = param.Boolean(False, precedence=-1)
+    
+    # incremented for every new layout, refinements computed for an older token are discarded
+    layout_token = param.Integer(0, precedence=-1)
+    refining = param.Boolean(False, precedence=-1)
+    
     stream = param.ClassSelector(default=hv.streams.PointDraw(add=False), class_=(hv.streams.PointDraw,), precedence=-1)
     
     def __init__(self, 
@@ -20,6 +84,9 @@ class DraggableGraph(param.Parameterized):
                  source_col = 'GENE_ID_A', 
                  target_col = 'GENE_ID_B', 
                  label_col = 'geneSymbol',
+                 edge_score_col = 'combined_score',
+                 layout_cache = None, # LayoutCache shared between sessions
+                 global_layout = None, # precomputed x, y for the whole HINT node universe (see global_layout.py)
                  **params
                 ):
         
@@ -36,47 +103,728 @@ class DraggableGraph(param.Parameterized):
         self.source_col = source_col
         self.target_col = target_col
         self.label_col = label_col
+        self.edge_score_col = edge_score_col
+        self.layout_cache = layout_cache
+        self.global_layout = global_layout
+        
+        # bokeh data sources of the rendered edges and labels (captured by plot hooks, used by the drag fast path)
+        self.handles = {}
+        
+        # bundled graphs keyed by node positions and edges (see bundle_key)
+        self.bundle_cache = OrderedDict()
+        self.bundle_lock = threading.Lock()
+        self.edges_bundled = False
+        
+        # element options by type ('Nodes', 'Graph', 'Labels'), applied inside the DynamicMap callbacks (shared with Network.graph_opts)
+        self.style_opts = {}
+        self.applied_style = {}
+        self.shipped_columns = set()
+        
+        # node rows drawn as labels (in label source order) and the ids labelled regardless of priority
+        self.label_rows = np.array([], dtype=np.int64)
+        self.label_focus = np.array([])
+        
+        # nearest-node lookup over the current positions (click hit-testing)
+        self.spatial_index = SpatialIndex(np.empty((0, 2)))
             
     def make_graph(self, nodes, edges):
-        
+        # topology only (used for the networkx layouts), node and edge attributes stay in the frames
         G = nx.Graph()
-        for idx, data in nodes.sort_index().iterrows():
-            G.add_node(data[self.index_col], **data.to_dict())
+        G.add_nodes_from(nodes.sort_index()[self.index_col].values.tolist())
         
-        for idx, data in edges.sort_index().iterrows():
-            G.add_edge(data[self.source_col], data[self.target_col], **data.to_dict())
+        edges_ = edges.sort_index()
+        G.add_edges_from(zip(edges_[self.source_col].values.tolist(), edges_[self.target_col].values.tolist()))
          
         return G
+
+    def force_directed(self, nodes, edges, init_positions = None, **layout_params):
+        # vectorized force-directed layout over edge index arrays, warm-started from init_positions (x, y indexed by node ID) where available
+        ids = pd.Index(nodes[self.index_col].values)
+        pos = None if init_positions is None else init_positions.reindex(ids)[['x', 'y']].values
+
+        xy = force_directed_layout(
+            ids.shape[0], 
+            ids.get_indexer(edges[self.source_col].values), 
+            ids.get_indexer(edges[self.target_col].values), 
+            weights = edges[self.edge_score_col].values, 
+            pos = pos,
+            **layout_params
+        )
+
+        return pd.DataFrame(xy, index=ids, columns=['x', 'y'])
+
+    def cached_layout(self, nodes, edges, layout_algorithm, layout_params, init_positions = None):
+        # (key, layout or None), key is None without a layout cache; only the force-directed layout uses the warm start
+        if self.layout_cache is None:
+            return None, None
+
+        init_positions = init_positions if layout_algorithm=='force_directed' else None
+        key = self.layout_cache.key(nodes[self.index_col], edges[self.source_col], edges[self.target_col], edges[self.edge_score_col], layout_algorithm, layout_params, init_positions = init_positions)
+
+        return key, self.layout_cache.get(key)
+
+    def compute_layout(self, nodes, edges, layout_algorithm, init_positions = None, G = None, **layout_params):
+        # DataFrame of x, y indexed by node ID, served from the layout cache when the same network was laid out before
+        # (G defaults to self.G, background refinements pass the graph they were started for)
+        if layout_algorithm=='force_directed':
+            layout_params = dict(self.force_layout_params, **layout_params)
+
+        key, layout = self.cached_layout(nodes, edges, layout_algorithm, layout_params, init_positions = init_positions)
+        if layout is not None:
+            return layout
+
+        if layout_algorithm=='force_directed':
+            layout = self.force_directed(nodes, edges, init_positions = init_positions, **layout_params)
+        else:
+            layout = pd.DataFrame(getattr(nx, '{}_layout'.format(layout_algorithm))(self.G if G is None else G, **layout_params), index=['x', 'y']).T
+
+        if key is not None:
+            self.layout_cache.put(key, layout)
+
+        return layout
+
+    def progressive(self, nodes, edges, layout_algorithm, init_positions = None):
+        # draw provisionally and refine in the background only if the layout is expensive and not cached
+        if (layout_algorithm not in self.progressive_layouts) or (nodes.shape[0]<self.progressive_min_nodes):
+            return False
+
+        layout_params = dict(self.force_layout_params) if layout_algorithm=='force_directed' else {}
+
+        return self.cached_layout(nodes, edges, layout_algorithm, layout_params, init_positions = init_positions)[1] is None
+
+    @staticmethod
+    def on_next_tick(doc, callback):
+        # run callback on the session's next tick (bokeh models may only be changed there), or right away outside a server
+        if doc is not None and doc.session_context is not None:
+            doc.add_next_tick_callback(callback)
+        else:
+            callback()
+
+    def refine_layout(self, nodes, edges, layout_algorithm, positions, init_positions = None):
+        '''
+        future = self.refine_layout(nodes, edges, 'kamada_kawai', positions)
+
+        computes the full layout on a background worker and swaps it in on the session's next tick, unless
+        another layout was started (layout_token changed) in the meantime; nodes dragged away from positions
+        while it ran keep their dragged position
+        '''
+        token = self.layout_token
+        doc = pn.state.curdoc
+        G = self.G
+        self.refining = True
+
+        def done(future):
+            if future.exception() is not None:
+                logger.error('Layout refinement failed', exc_info=future.exception())
+                self.refining = False
+                return
+
+            self.on_next_tick(doc, partial(self.apply_refined_layout, token, positions, future.result()))
+
+        future = layout_executor.submit(self.compute_layout, nodes, edges, layout_algorithm, init_positions = init_positions, G = G)
+        future.add_done_callback(done)
+
+        return future
+
+    def apply_refined_layout(self, token, positions, layout):
+        if token != self.layout_token:
+            return # node set changed since the refinement started
+
+        # nodes dragged since positions was captured stay where the user put them
+        current = self.current_positions()
+        ids = current[self.index_col].values
+        current_xy = current[['x', 'y']].values.astype(float)
+        provisional = positions.set_index(self.index_col).reindex(ids)[['x', 'y']].values.astype(float)
+        dragged = (current_xy!=provisional).any(axis=1)
+
+        positions = current
+        positions[['x', 'y']] = np.where(dragged[:, None], current_xy, layout.reindex(ids)[['x', 'y']].values)
+
+        # redraw nodes through their pipe, the stream update redraws edges and labels (see _update)
+        self.positions = positions
+        self.node_pipe.send(positions)
+        self.stream.update(data=self.make_nodes(positions).columns())
+
+        self.refining = False
+
+    def seed_positions(self, ids, edges, placed_xy, spread, rng):
+        # new nodes start at the mean position of their already placed neighbours (a few passes, so chains of new nodes are
+        # seeded outwards), nodes without placed neighbours start at random around the centre of the placed nodes
+        xy = placed_xy.copy()
+        placed = ~np.isnan(xy).any(axis=1)
+        a = ids.get_indexer(edges[self.source_col].values)
+        b = ids.get_indexer(edges[self.target_col].values)
+        src, dst = np.concatenate([a, b]), np.concatenate([b, a])
+        jitter = 0.05*spread
+
+        for i in range(3):
+            todo = ~placed
+            if not todo.any():
+                break
+
+            use = placed[src]&todo[dst]
+            counts = np.bincount(dst[use], minlength=ids.shape[0])
+            seeded = counts>0
+            if not seeded.any():
+                break
+
+            for axis in [0, 1]:
+                xy[seeded, axis] = np.bincount(dst[use], weights=xy[src[use], axis], minlength=ids.shape[0])[seeded]/counts[seeded]
+            xy[seeded] += rng.normal(0, jitter, (seeded.sum(), 2))
+            placed |= seeded
+
+        center = np.nanmean(placed_xy, axis=0)
+        xy[~placed] = center+rng.uniform(-spread/2, spread/2, ((~placed).sum(), 2))
+
+        return xy
+
+    def incremental_layout(self, nodes, edges, previous, **overrides):
+        '''
+        layout = self.incremental_layout(nodes, edges, self.previous_positions())
+
+        positions for a changed node set that keep the surviving nodes where they were (including dragged positions);
+        only the new nodes are placed, seeded next to their neighbours and relaxed with a short force-directed run,
+        so the work and the visual change scale with the number of added nodes
+        '''
+        params = dict(self.incremental_params, **overrides)
+        pin_existing = params.pop('pin_existing', True)
+        rng = np.random.default_rng(params.get('seed', 0))
+
+        ids = pd.Index(nodes[self.index_col].values)
+        xy = previous.reindex(ids)[['x', 'y']].values.astype(float)
+        new = np.isnan(xy).any(axis=1)
+
+        if new.any() or not pin_existing:
+            # work in the [-1, 1] frame force_directed_layout expects
+            lo, hi = np.nanmin(xy, axis=0), np.nanmax(xy, axis=0)
+            center = (lo+hi)/2
+            scale = max((hi-lo).max()/2, 1e-9)
+
+            xy = self.seed_positions(ids, edges, (xy-center)/scale, 2, rng)
+            xy = force_directed_layout(
+                ids.shape[0],
+                ids.get_indexer(edges[self.source_col].values),
+                ids.get_indexer(edges[self.target_col].values),
+                weights = edges[self.edge_score_col].values,
+                pos = xy,
+                fixed = ~new if pin_existing else None,
+                rescale = False,
+                **params
+            )
+            xy = xy*scale+center
+
+        return pd.DataFrame(xy, index=ids, columns=['x', 'y'])
+
+    def global_positions(self, nodes, edges, previous = None):
+        # coordinates from the global layout, overridden by previous (e.g. dragged) positions where given;
+        # genes missing from the global layout (user data) are placed next to their neighbours
+        ids = pd.Index(nodes[self.index_col].values)
+        known = self.global_layout.reindex(ids)[['x', 'y']]
+
+        if previous is not None:
+            known.update(previous.reindex(ids)[['x', 'y']])
+
+        if known.isnull().values.any() or self.global_refine_iterations>0:
+            if known.notnull().all(axis=1).any():
+                refine = {'pin_existing': False, 'iterations': self.global_refine_iterations, 'temperature': 0.01} if self.global_refine_iterations>0 else {}
+                known = self.incremental_layout(nodes, edges, known, **refine)
+            else:
+                known = self.compute_layout(nodes, edges, 'force_directed')
+
+        return known
+
+    def previous_positions(self):
+        # x, y of the currently displayed nodes indexed by node ID (None before the first render)
+        if self.current_stream_data is None:
+            return None
+
+        previous = pd.DataFrame(self.current_stream_data)
+
+        return previous.set_index(previous[self.index_col].values.astype(self.id_dtype))[['x', 'y']]
+
+    def make_edge_frame(self, edges):
+        # edge table in the layout expected by hv.Graph (start, end, *vdims)
+        edge_frame = edges.sort_index().reset_index(drop=True)
+        edge_frame.insert(0, 'end', edge_frame[self.target_col].values)
+        edge_frame.insert(0, 'start', edge_frame[self.source_col].values)
+
+        return edge_frame
+
+    def style_columns(self):
+        # columns named by a style option (a column name or a dim expression): HoloViews maps them in Python and ships the
+        # result under the style key (color, edge_line_width, ...) with its color mapper, so their values cannot be patched
+        names = set()
+        for group_opts in self.style_opts.values():
+            for key, item in group_opts.items():
+                if isinstance(item, dim):
+                    names.add(item.dimension.name)
+                elif isinstance(item, str) and key!='tools':
+                    names.add(item)
+
+        return names
+
+    def referenced_columns(self):
+        # names used by the element options: plain strings, dim expressions and hover tooltip fields (@col / @{col})
+        names = set()
+        for group_opts in self.style_opts.values():
+            for value in group_opts.values():
+                for item in (value if isinstance(value, list) else [value]):
+                    if isinstance(item, str):
+                        names.add(item)
+                    elif isinstance(item, dim):
+                        names.add(item.dimension.name)
+                    elif getattr(item, 'tooltips', None):
+                        names.update(re.findall(r'@\{?(\w+)\}?', ' '.join(str(t[1]) for t in item.tooltips)))
+
+        return names
+
+    def plot_columns(self, columns, required = ()):
+        # only the columns the plot uses are sent to the browser (plus the ones needed here: ids, labels and label/raster priorities)
+        keep = {self.index_col, self.label_col, self.raster_priority, *self.label_priority, *required}|self.referenced_columns()
+
+        return [c for c in columns if c in keep]
+
+    def current_positions(self):
+        # all node columns with the current (possibly dragged) x, y
+        positions = self.positions.copy()
+        positions[['x', 'y']] = self.previous_positions().reindex(positions[self.index_col].values.astype(self.id_dtype))[['x', 'y']].values
+
+        return positions
+
+    def make_nodes(self, positions):
+        # hv.Nodes straight from the node columns and position arrays (x, y, index, *vdims)
+        nodes = positions[self.plot_columns(positions.columns.drop(['x', 'y', 'index'], errors='ignore'))].copy()
+        nodes[self.index_col] = nodes[self.index_col].values.astype(self.id_dtype)
+        nodes.insert(0, 'index', nodes[self.index_col].values)
+        nodes.insert(0, 'y', np.asarray(positions['y'], dtype=float))
+        nodes.insert(0, 'x', np.asarray(positions['x'], dtype=float))
+
+        return hv.Nodes(nodes, kdims=['x', 'y', 'index'], vdims=nodes.columns[3:].tolist())
+
+    def make_hv_graph(self, positions):
+        edge_frame = self.edge_frame[['start', 'end']+self.plot_columns(self.edge_frame.columns[2:], required = [self.source_col, self.target_col])]
+
+        # explicit straight edge paths (in edge_frame order): GraphPlot only ships xs/ys with the edges when the graph
+        # has edgepaths, and patch_drag needs them to move single segments
+        rows = pd.Index(np.asarray(positions[self.index_col]).astype(self.id_dtype))
+        xy = np.column_stack([np.asarray(positions['x'], dtype=float), np.asarray(positions['y'], dtype=float)])
+        segments = np.stack([xy[rows.get_indexer(edge_frame['start'].values)], xy[rows.get_indexer(edge_frame['end'].values)]], axis=1)
+
+        return hv.Graph((edge_frame, self.make_nodes(positions), list(segments) if segments.shape[0]>0 else None), kdims=['start', 'end'], vdims=edge_frame.columns[2:].tolist())
         
-    def view_nodes(self, positions):
-        g = hv.Graph.from_networkx(self.G, dict(zip(positions[self.index_col], positions[['x', 'y']].values))).nodes
+    def view_nodes(self, data):
+        g = self.make_nodes(data)
         self.stream.update(data=g.columns())
 
-        return g
+        return self.styled(g, 'Nodes', self.capture_node_handles)
         
+    def bundle_key(self, data):
+        h = hashlib.sha1()
+        h.update(np.round(np.asarray(data['x'], dtype=float), 6).tobytes())
+        h.update(np.round(np.asarray(data['y'], dtype=float), 6).tobytes())
+        h.update(self.edge_start.tobytes())
+        h.update(self.edge_end.tobytes())
+
+        return h.hexdigest()
+
+    def schedule_bundle(self, data):
+        '''
+        debounced background bundling: every call supersedes the previous one (bundle_token), the bundle is only
+        computed once positions have not changed for bundle_delay seconds and is shown by re-rendering the edges
+        '''
+        self.bundle_token += 1
+        token = self.bundle_token
+        key = self.bundle_key(data)
+        doc = pn.state.curdoc
+
+        if key in self.bundle_cache:
+            return
+
+        graph = self.make_hv_graph(pd.DataFrame(data))
+
+        def bundle():
+            if token != self.bundle_token:
+                return # positions changed again before they settled
+
+            bundled = bundle_graph(graph)
+            with self.bundle_lock:
+                self.bundle_cache[key] = bundled
+                while len(self.bundle_cache)>self.bundle_cache_size:
+                    self.bundle_cache.popitem(last=False)
+
+            self.on_next_tick(doc, partial(self.apply_bundle, token))
+
+        def done(future):
+            if future.exception() is not None:
+                logger.error('Edge bundling failed', exc_info=future.exception())
+
+        def submit():
+            if token == self.bundle_token:
+                layout_executor.submit(bundle).add_done_callback(done)
+
+        if doc is not None and doc.session_context is not None:
+            doc.add_timeout_callback(submit, int(1000*self.bundle_delay))
+        else:
+            submit()
+
+    def apply_bundle(self, token):
+        if token == self.bundle_token and self.bundle_graph_edges:
+            self.edge_stream.event(data=self.current_stream_data)
+
     def view_edges(self, data):
+        # bundled edges come from the bundle cache only, straight edges are shown until schedule_bundle has filled it
+        self.edges_bundled = False
 
-        data_ = pd.DataFrame(data)
-        
-        g = hv.Graph.from_networkx(self.G, dict(zip(data_[self.index_col], data_[['x', 'y']].values)))
-        
         if self.bundle_graph_edges == True:
-            g = bundle_graph(g)
-        
-        return g
+            with self.bundle_lock:
+                bundled = self.bundle_cache.get(self.bundle_key(data))
+
+            if bundled is not None:
+                self.edges_bundled = True
+                return self.styled(bundled, 'Graph', self.capture_edge_source)
+
+        return self.styled(self.make_hv_graph(pd.DataFrame(data)), 'Graph', self.capture_edge_source)
     
-    def view_labels(self, data):
+    def node_at(self, x, y, radius):
+        # (index_col, label_col) values of the node nearest to (x, y), or None if no node lies within radius
+        row = self.spatial_index.nearest(x, y, radius)
+        if row is None:
+            return None
+
+        return (self.current_stream_data[self.index_col][row], self.current_stream_data[self.label_col][row])
+
+    def styled(self, element, group, hook):
+        # current options for this element type, plus the hook capturing its bokeh models
+        return element.opts(clone=True, **dict(self.style_opts.get(group, {}), hooks=[hook]))
+
+    def capture_node_handles(self, plot, element):
+        self.handles['nodes'] = plot.handles.get('source')
+        self.handles['hover'] = plot.handles.get('hover')
+        self.handles['node_mappers'] = [m for m in plot.handles.values() if isinstance(m, ColorMapper)]
+
+    def capture_edge_source(self, plot, element):
+        self.handles['edges'] = plot.handles.get('multi_line_1_source')
+        self.handles['graph_nodes'] = plot.handles.get('scatter_1_source')
+        self.handles['graph_mappers'] = [m for m in plot.handles.values() if isinstance(m, ColorMapper)]
+
+    def capture_label_source(self, plot, element):
+        self.handles['labels'] = plot.handles.get('source')
+        self.handles['label_glyph'] = plot.handles.get('glyph')
+
+    def style_changes(self, style_opts):
+        # [(group, key)] of options that differ from the ones last rendered
+        changes = []
+        for group in set(style_opts)|set(self.applied_style):
+            new, old = style_opts.get(group, {}), self.applied_style.get(group, {})
+            for key in set(new)|set(old):
+                if key in new and key in old and (new[key] is old[key] or (isinstance(new[key], (str, int, float, tuple)) and new[key]==old[key])):
+                    continue
+                changes.append((group, key))
+
+        return changes
+
+    def patch_style(self, group, key, value):
+        '''
+        applies one aesthetic option directly to the rendered bokeh models (labels glyph, color mappers, hover tool);
+        returns False if the option needs the elements to be re-rendered
+        '''
+        if group=='Labels' and key in ['text_font_size', 'text_color'] and self.handles.get('label_glyph') is not None:
+            setattr(self.handles['label_glyph'], key, value)
+            return True
+
+        if group=='Nodes' and key=='tools' and self.handles.get('hover') is not None:
+            hover = [t for t in value if hasattr(t, 'tooltips')]
+            if len(hover)==1:
+                self.handles['hover'].tooltips = hover[0].tooltips
+                return True
+            return False
+
+        if group in ['Nodes', 'Graph'] and key in ['clim', 'cmap']:
+            mappers = self.handles.get({'Nodes': 'node_mappers', 'Graph': 'graph_mappers'}[group])
+            if mappers is None:
+                return False
+
+            for mapper in mappers:
+                if key=='clim' and isinstance(mapper, LinearColorMapper):
+                    if None in value:
+                        return False
+                    mapper.update(low=value[0], high=value[1])
+                elif key=='cmap':
+                    if isinstance(mapper, LinearColorMapper):
+                        mapper.palette = process_cmap(value, ncolors=256)
+                    else:
+                        mapper.palette = process_cmap(value, ncolors=len(mapper.factors), categorical=True)
+            return True
+
+        return False
+
+    def restyle(self, style_opts):
+        '''
+        graph.restyle(network.graph_opts)
+
+        style-only update: patches the rendered bokeh models where possible and otherwise re-renders the node, edge
+        and label elements with the current options, without rebuilding the graph or recomputing the layout.
+        Returns False if the change needs a full view (e.g. overlay options).
+        '''
+        self.style_opts = style_opts
+        changes = self.style_changes(style_opts)
+
+        # a newly referenced column (tooltip, color option) has to be shipped first
+        new_columns = not (self.referenced_columns()<=self.shipped_columns)
+
+        if any(group not in ['Nodes', 'Graph', 'Labels'] for group, key in changes) or (self.current_stream_data is None):
+            return False
+
+        patched = [self.patch_style(group, key, style_opts[group][key]) for group, key in changes if key in style_opts.get(group, {})]
+
+        if new_columns or (len(patched)<len(changes)) or not all(patched):
+            if self.raster:
+                self.subset_pipe.event(data=self.subset_pipe.data)
+            else:
+                positions = self.current_positions()
+                self.node_pipe.event(data=positions)
+                self.stream.update(data=self.make_nodes(positions).columns())
+                self.edge_stream.event(data=self.current_stream_data)
+
+        self.applied_style = {k: dict(v) for k, v in style_opts.items()}
+        self.shipped_columns = self.referenced_columns()
+
+        return True
+
+    def moved_nodes(self, data):
+        # row indices of nodes whose position changed since the last stream update (None if the node set/order changed)
+        previous = self.current_stream_data
+        if previous is None or len(previous[self.index_col])!=len(data[self.index_col]):
+            return None
+
+        if not np.array_equal(np.asarray(previous[self.index_col]), np.asarray(data[self.index_col])):
+            return None
+
+        changed = (np.asarray(previous['x'], dtype=float)!=np.asarray(data['x'], dtype=float))|(np.asarray(previous['y'], dtype=float)!=np.asarray(data['y'], dtype=float))
+
+        return np.flatnonzero(changed)
+
+    def patch_drag(self, data, moved):
+        '''
+        drag fast path: moves the incident edge segments and the labels of the moved nodes by patching the rendered
+        bokeh sources, instead of rebuilding every edge and label. Returns False if the full re-render is needed.
+        '''
+        edge_source, label_source = self.handles.get('edges'), self.handles.get('labels')
+
+        if self.edges_bundled or (edge_source is None) or (label_source is None) or (moved.shape[0]>self.drag_patch_max):
+            return False
+
+        # only straight edges in edge_frame order can be patched
+        if len(edge_source.data.get('xs', []))!=self.edge_start.shape[0] or len(label_source.data.get('x', []))!=self.label_rows.shape[0]:
+            return False
+
+        x = np.asarray(data['x'], dtype=float)
+        y = np.asarray(data['y'], dtype=float)
+        moved_rows = np.zeros(x.shape[0], dtype=bool)
+        moved_rows[moved] = True
+
+        edges = np.flatnonzero(moved_rows[self.edge_start]|moved_rows[self.edge_end])
+        a, b = self.edge_start[edges], self.edge_end[edges]
+
+        edge_source.patch({
+            'xs': [(int(i), np.array([x[j], x[k]])) for i, j, k in zip(edges, a, b)],
+            'ys': [(int(i), np.array([y[j], y[k]])) for i, j, k in zip(edges, a, b)],
+        })
+        # only the moved nodes that are labelled (label source rows follow self.label_rows)
+        labelled = np.flatnonzero(np.isin(self.label_rows, moved))
+        if labelled.shape[0]>0:
+            label_source.patch({
+                'x': [(int(i), x[self.label_rows[i]]) for i in labelled],
+                'y': [(int(i), y[self.label_rows[i]]) for i in labelled],
+            })
+
+        return True
+
+    def lod_label_rows(self, data_, x_range = None, y_range = None):
+        # rows to label: nodes inside the viewport, focus nodes first, then by label_priority, at most label_budget
+        n = data_.shape[0]
+        if not self.lod_labels or n<=self.label_budget:
+            return np.arange(n)
+
+        x, y = data_['x'].values.astype(float), data_['y'].values.astype(float)
+        in_view = np.ones(n, dtype=bool)
+        if x_range is not None and None not in x_range:
+            in_view &= (x>=min(x_range))&(x<=max(x_range))
+        if y_range is not None and None not in y_range:
+            in_view &= (y>=min(y_range))&(y<=max(y_range))
+
+        rows = np.flatnonzero(in_view)
+        keys = [-data_[c].values[rows].astype(float) for c in reversed(self.label_priority) if c in data_.columns]
+        keys.append(~data_[self.index_col].isin(self.label_focus).values[rows])
+        order = np.lexsort(keys)
+
+        return np.sort(rows[order[:self.label_budget]])
+
+    def set_label_focus(self, node_id):
+        # the selected node and its neighbours are always labelled
+        if not hasattr(self, 'edge_frame'):
+            return
+
+        self.label_focus = neighborhood(node_id, self.edge_frame['start'].values, self.edge_frame['end'].values)
+        if not self.raster:
+            self.label_range.event()
+
+    def view_labels(self, data, x_range = None, y_range = None):
         
         data_ = pd.DataFrame(data)
+        self.label_rows = self.lod_label_rows(data_, x_range, y_range) if data_.shape[0]>0 else np.array([], dtype=np.int64)
         
-        return hv.Labels(data_, ['x', 'y'], self.label_col)
+        return self.styled(hv.Labels(data_.iloc[self.label_rows], ['x', 'y'], self.label_col), 'Labels', self.capture_label_source)
     
+    @staticmethod
+    def column_patch(old, new):
+        # [(row, value)] where new differs from old (NaN == NaN)
+        old, new = np.asarray(old), np.asarray(new)
+        changed = ~((old==new)|(pd.isnull(old)&pd.isnull(new)))
+
+        return [(int(i), new[i].item() if hasattr(new[i], 'item') else new[i]) for i in np.flatnonzero(changed)]
+
+    def update_attributes(self, data):
+        '''
+        same-topology fast path: when only node/edge attribute values changed (same node set, same edges, same layout and
+        bundling), patches the changed rows of the shipped columns into the rendered bokeh sources instead of rebuilding
+        the plot. Returns False if the full view is needed.
+        '''
+        nodes, edges, layout_algorithm, bundle_graph_edges, layout_mode = data
+
+        if self.raster or self.current_nodes is None or nodes.shape[0]==0 or self.edges_bundled:
+            return False
+        if layout_algorithm!=self.current_layout or bundle_graph_edges!=self.bundle_graph_edges:
+            return False
+
+        node_sources = [self.handles.get(k) for k in ['nodes', 'graph_nodes'] if self.handles.get(k) is not None]
+        edge_source = self.handles.get('edges')
+        if len(node_sources)==0 or edge_source is None:
+            return False
+
+        ids = self.positions[self.index_col].values
+        if nodes.shape[0]!=ids.shape[0] or not nodes[self.index_col].isin(ids).all():
+            return False
+
+        edge_frame = self.make_edge_frame(edges)
+        old_keys = edge_keys(self.edge_frame['start'].values, self.edge_frame['end'].values)
+        new_keys = edge_keys(edge_frame['start'].values, edge_frame['end'].values)
+        if old_keys.shape[0]!=new_keys.shape[0] or not np.array_equal(np.sort(old_keys), np.sort(new_keys)):
+            return False
+
+        # new attributes in the rendered row order, current (possibly dragged) positions
+        positions = nodes.set_index(self.index_col).reindex(ids).reset_index()
+        positions[['x', 'y']] = self.previous_positions().reindex(ids.astype(self.id_dtype))[['x', 'y']].values
+        edge_frame = edge_frame.iloc[pd.Index(new_keys).get_indexer(old_keys)].reset_index(drop=True)
+
+        # style-mapped columns are not in the sources under their own name, so they are compared with the rendered frames
+        style_columns = self.style_columns()
+        for old, new in [(self.positions, positions), (self.edge_frame, edge_frame)]:
+            for c in style_columns & set(new.columns):
+                if c not in old.columns or len(self.column_patch(old[c].values, new[c].values))>0:
+                    return False
+
+        patches = []
+        for source, frame in [(s, positions) for s in node_sources]+[(edge_source, edge_frame)]:
+            patch = {c: self.column_patch(source.data[c], frame[c].values) for c in self.plot_columns(frame.columns) if c in source.data}
+            patches.append((source, {c: v for c, v in patch.items() if len(v)>0}))
+
+        changed = {c for source, patch in patches for c in patch}
+        if changed & style_columns:
+            return False
+
+        for source, patch in patches:
+            if len(patch)>0:
+                source.patch(patch)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            n_bytes = sum(len(json.dumps(patch, default=str)) for source, patch in patches)
+            logger.debug('attribute patch: %d columns (%s), ~%d bytes sent', len(changed), ', '.join(sorted(changed)), n_bytes)
+
+        self.edge_frame = edge_frame
+        self.positions = positions
+        self.current_nodes = nodes
+        self.current_edges = edges
+        self.node_pipe.update(data=positions)
+        self.stream.update(data=self.make_nodes(positions).columns())
+
+        # label priorities may have changed
+        if changed & set(self.label_priority):
+            self.label_range.event()
+
+        return True
+
+    def view_subset(self, data):
+        # glyphs, labels and hover for the interactive subset of a rasterized network
+        nodes = self.styled(self.make_nodes(data), 'Nodes', self.capture_node_handles)
+        labels = self.styled(hv.Labels(data, ['x', 'y'], self.label_col), 'Labels', self.capture_label_source)
+
+        return nodes*labels
+
+    def static_view(self):
+        '''
+        overlay = graph.static_view()
+
+        static copy of the displayed network for exports: current (possibly dragged) positions, the bundled edges if
+        they are shown and the current labels, with the element options but without streams or the hooks that capture
+        bokeh models (rendering the live DynamicMaps again would point self.handles at the exported plot)
+        '''
+        if self.raster:
+            subset = pd.DataFrame(self.subset_pipe.data)
+            nodes = self.make_nodes(subset).opts(clone=True, **self.style_opts.get('Nodes', {}))
+            labels = hv.Labels(subset, ['x', 'y'], self.label_col).opts(clone=True, **self.style_opts.get('Labels', {}))
+
+            return self.edge_graph*self.node_graph*nodes*labels
+
+        positions = self.current_positions()
+
+        edges = None
+        if self.edges_bundled:
+            with self.bundle_lock:
+                edges = self.bundle_cache.get(self.bundle_key(self.current_stream_data))
+        if edges is None:
+            edges = self.make_hv_graph(positions)
+
+        edges = edges.opts(clone=True, **self.style_opts.get('Graph', {}))
+        nodes = self.make_nodes(positions).opts(clone=True, **self.style_opts.get('Nodes', {}))
+        labels = hv.Labels(positions.iloc[self.label_rows], ['x', 'y'], self.label_col).opts(clone=True, **self.style_opts.get('Labels', {}))
+
+        return edges*nodes*labels
+
+    def highlight(self, node_id):
+        # adds node_id and its neighbours to the interactive subset of a rasterized network
+        if not self.raster:
+            return
+
+        extra = neighborhood(node_id, self.edge_frame['start'].values, self.edge_frame['end'].values)
+        self.subset_pipe.send(interactive_subset(self.positions, self.index_col, self.raster_priority, self.raster_top_n, extra))
+
+    def view_raster(self, positions):
+        '''
+        large-network mode: edges and nodes are rasterized by datashader for the current viewport (re-rendered on zoom/pan),
+        only the interactive subset is drawn as glyphs. Nodes cannot be dragged in this mode.
+        '''
+        self.positions = positions
+        self.current_stream_data = {c: positions[c].values for c in positions.columns}
+        xy = positions[['x', 'y']].values.astype(float)
+        self.spatial_index.rebuild(xy)
+
+        self.edge_graph = raster_edges(xy, self.edge_start, self.edge_end)
+        self.node_graph = raster_nodes(positions)
+
+        self.subset_pipe = hv.streams.Pipe(data=interactive_subset(positions, self.index_col, self.raster_priority, self.raster_top_n))
+        self.labels = hv.DynamicMap(self.view_subset, streams = [self.subset_pipe])
+        self.applied_style = {k: dict(v) for k, v in self.style_opts.items()}
+        self.shipped_columns = self.referenced_columns()
+
+        return (self.edge_graph*self.node_graph*self.labels)
+
     def view(self, data):
-        if len(data)!=4:
-            raise ValueError('Data does not have the right number of items (nodes, edges, layout_algorithm, bundle_graph_edges)')
+        if len(data)!=5:
+            raise ValueError('Data does not have the right number of items (nodes, edges, layout_algorithm, bundle_graph_edges, layout_mode)')
         
-        # unpack data = [nodes, edges, graph_opts, layout_algorithm, bundle_graph]
-        nodes, edges, layout_algorithm, bundle_graph_edges = data
+        # unpack data = [nodes, edges, layout_algorithm, bundle_graph, layout_mode]
+        nodes, edges, layout_algorithm, bundle_graph_edges, layout_mode = data
         
         if nodes.shape[0]>0:
             # make sure that index, source, and target are the same dtype
@@ -90,8 +838,11 @@ class DraggableGraph(param.Parameterized):
         
         
             self.G = self.make_graph(nodes, edges)
+            self.edge_frame = self.make_edge_frame(edges)
+            self.id_dtype = nodes.dtypes[self.index_col]
             self.bundle_graph_edges = bundle_graph_edges
 
+            incremental = False
             if (self.current_nodes is None) and (self.current_edges is None):
                 new_layout = True
             elif self.current_layout!=layout_algorithm:
@@ -100,26 +851,77 @@ class DraggableGraph(param.Parameterized):
                 new_layout = False
             else:
                 new_layout = True
+                # place only the added nodes if most of the new nodes are already displayed; pinning a few survivors
+                # and placing everything else around them gives a worse layout than computing it from scratch
+                incremental = (layout_mode=='Incremental') and (self.current_stream_data is not None) and nodes[self.index_col].isin(self.current_nodes[self.index_col]).mean()>=self.incremental_min_overlap
 
             self.new_layout = new_layout
+            refine = False
+            self.raster = nodes.shape[0]>self.raster_threshold
+
+            # the networkx layouts do not scale to rasterized networks
+            layout_algorithm_ = 'force_directed' if self.raster and layout_algorithm in ['kamada_kawai', 'spring'] else layout_algorithm
 
             if new_layout == True:
-                init_layout = pd.DataFrame(getattr(nx, '{}_layout'.format(layout_algorithm))(self.G), index=['x', 'y']).T
+                self.layout_token += 1
+                previous = self.previous_positions()
+
+                if layout_algorithm=='global':
+                    init_layout = self.global_positions(nodes, edges, previous = previous if incremental else None)
+                elif incremental:
+                    init_layout = self.incremental_layout(nodes, edges, previous)
+                elif self.progressive(nodes, edges, layout_algorithm_, init_positions = previous) and not self.raster:
+                    # first paint from a short force-directed run, the full layout follows from refine_layout
+                    init_layout = self.force_directed(nodes, edges, init_positions = previous, **self.provisional_params)
+                    refine = True
+                else:
+                    init_layout = self.compute_layout(nodes, edges, layout_algorithm_, init_positions = previous)
                 init_layout.index.name = self.index_col
                 positions = pd.concat([nodes.set_index(self.index_col), init_layout], axis=1).reset_index()
             else:
-                positions = pd.DataFrame(self.current_stream_data)
+                # keep the (possibly dragged) positions, but take node attributes from the new nodes
+                positions = nodes.reset_index(drop=True)
+                positions[['x', 'y']] = self.previous_positions().reindex(positions[self.index_col].values).values
+
+            # node rows of the edge endpoints, for patching dragged edges
+            node_rows = pd.Index(positions[self.index_col].values)
+            self.edge_start = node_rows.get_indexer(self.edge_frame['start'].values)
+            self.edge_end = node_rows.get_indexer(self.edge_frame['end'].values)
+            self.handles = {}
+
+            if self.raster:
+                self.current_nodes = nodes
+                self.current_edges = edges
+                self.current_layout = layout_algorithm
 
-            self.node_graph = self.view_nodes(positions)
+                return self.view_raster(positions)
+
+            # edges and labels are driven by their own pipe (see _update), nodes by a pipe so that refined positions can be pushed without rebuilding the plot
+            self.positions = positions
+            self.edge_stream = hv.streams.Pipe(data=[])
+            self.node_pipe = hv.streams.Pipe(data=positions)
+            self.node_graph = hv.DynamicMap(self.view_nodes, streams = [self.node_pipe])
+            self.view_nodes(positions) # sets the stream data for the edges and labels
             self.stream.source = self.node_graph
 
-            self.edge_graph = hv.DynamicMap(self.view_edges, streams = [self.stream])
-            self.labels = hv.DynamicMap(self.view_labels, streams = [self.stream])
+            self.edge_graph = hv.DynamicMap(self.view_edges, streams = [self.edge_stream])
+            self.label_range = hv.streams.RangeXY() # viewport of this plot, drives the level-of-detail labels
+            self.labels = hv.DynamicMap(self.view_labels, streams = [self.edge_stream, self.label_range])
+            self.applied_style = {k: dict(v) for k, v in self.style_opts.items()}
+            self.shipped_columns = self.referenced_columns()
+
+            if logger.isEnabledFor(logging.DEBUG):
+                shipped = self.make_hv_graph(positions)
+                n_bytes = len(shipped.nodes.dframe().to_json())+len(shipped.dframe().to_json())
+                logger.debug('full render: %d nodes, %d edges, ~%d bytes of node and edge data', nodes.shape[0], edges.shape[0], n_bytes)
 
             self.current_nodes = nodes
             self.current_edges = edges
             self.current_layout = layout_algorithm
 
+            if refine:
+                self.refine_layout(nodes, edges, layout_algorithm, positions, init_positions = previous)
+
             return (self.edge_graph*self.node_graph*self.labels)
         
         else:
@@ -127,5 +929,22 @@ class DraggableGraph(param.Parameterized):
     
     @param.depends('stream.data', watch=True)
     def _update(self):
-        self.node_data = pd.DataFrame(self.stream.data)
-        self.current_stream_data = self.stream.data
\ No newline at end of file
+        data = self.stream.data
+        moved = self.moved_nodes(data)
+
+        if moved is not None and (moved.shape[0]==0 or self.patch_drag(data, moved)):
+            self.edge_stream.update(data=data) # keep in sync for the next full render, without re-rendering
+        else:
+            self.edge_stream.event(data=data)
+
+        self.current_stream_data = data
+
+        xy = np.column_stack([np.asarray(data['x'], dtype=float), np.asarray(data['y'], dtype=float)])
+        if moved is None:
+            self.spatial_index.rebuild(xy)
+        elif moved.shape[0]>0:
+            self.spatial_index.move(moved, xy[moved])
+
+        # (re-)bundle after the positions settle (no-op if this arrangement is already cached)
+        if self.bundle_graph_edges:
+            self.schedule_bundle(data)
\ No newline at end of file
@@ -9,7 +9,7 @@ from bokeh.models import HoverTool
 from holoviews import opts, dim
 import os
 
-from utils import save_hook
+from utils import webgl_hook
 
 class Enrichment(param.Parameterized):
     
@@ -171,7 +171,7 @@ class Enrichment(param.Parameterized):
         )
         
         
-        return (spikes*scatter).opts(spike_opts, scatter_opts, opts.Overlay(hooks = [save_hook]))
+        return (spikes*scatter).opts(spike_opts, scatter_opts, opts.Overlay(hooks = [webgl_hook]))
 
         
     @param.depends('results', 'GO_show', 'GO_min_enrichment', 'GO_max_FDR', watch=True)
@@ -0,0 +1,162 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from itertools import chain
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+import pandas as pd
+
+# parquet export is offered only when pyarrow is installed (it is not part of environment.yml)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+TABLE_FORMATS = {'tab': '.tab', 'tab (gzip)': '.tab.gz'}
+if pq is not None:
+    TABLE_FORMATS['parquet'] = '.parquet'
+GRAPH_FORMATS = {'GraphML': '.graphml', 'GraphML (gzip)': '.graphml.gz', 'Cytoscape JSON': '.cyjs', 'Cytoscape JSON (gzip)': '.cyjs.gz'}
+
+def frame_chunks(frame, chunk_size = 5000):
+    # row chunks of a DataFrame (views, nothing is copied up front); an empty frame still yields one empty chunk
+    # so that writers get its columns
+    for start in range(0, max(frame.shape[0], 1), chunk_size):
+        yield frame.iloc[start:start+chunk_size]
+
+def text_writer(f, compress = False):
+    # text stream onto the binary file f, optionally gzipped
+    if compress:
+        f = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6)
+
+    return io.TextIOWrapper(f, encoding='utf-8', newline='')
+
+def write_table(chunks, f, compress = False):
+    out = text_writer(f, compress)
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(out, sep='\t', index=False, header=(i==0))
+    out.close()
+
+def write_parquet(chunks, f):
+    # one row group per chunk; object columns are written as strings
+    writer = None
+    for chunk in chunks:
+        chunk = chunk.copy()
+        for col in chunk.columns[chunk.dtypes==object]:
+            chunk[col] = chunk[col].where(chunk[col].isnull(), chunk[col].astype(str))
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(f, table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    if writer is not None:
+        writer.close()
+
+def records(chunk):
+    # JSON-ready row dicts (missing values -> None, numpy scalars -> python)
+    return chunk.astype(object).where(chunk.notnull(), None).to_dict('records')
+
+def json_default(o):
+    return o.item() if isinstance(o, np.generic) else str(o)
+
+def write_cytoscape(node_chunks, edge_chunks, f, index_col, label_col, source_col, target_col, compress = False):
+    '''
+    Cytoscape.js / Cytoscape desktop JSON ({"elements": {"nodes": [...], "edges": [...]}}), written element by element
+    '''
+    out = text_writer(f, compress)
+    out.write('{"elements": {"nodes": [')
+
+    sep = ''
+    for chunk in node_chunks:
+        for rec in records(chunk):
+            rec.update({'id': str(rec[index_col]), 'name': rec[label_col]})
+            out.write(sep+json.dumps({'data': rec}, default=json_default))
+            sep = ',\n'
+
+    out.write('],\n"edges": [')
+
+    sep = ''
+    for chunk in edge_chunks:
+        for rec in records(chunk):
+            rec.update({'id': '{}-{}'.format(rec[source_col], rec[target_col]), 'source': str(rec[source_col]), 'target': str(rec[target_col])})
+            out.write(sep+json.dumps({'data': rec}, default=json_default))
+            sep = ',\n'
+
+    out.write(']}}\n')
+    out.close()
+
+def graphml_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'long'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'double'
+
+    return 'string'
+
+def graphml_rows(chunk, keys, element, id_cols):
+    # GraphML element lines for the rows of chunk; id_cols are written as element attributes
+    cols = [c for c in chunk.columns if c in keys]
+    values = chunk[cols].astype(object).where(chunk[cols].notnull(), None).values
+    ids = chunk[id_cols].values
+
+    for ids_, row in zip(ids, values):
+        attrs = ' '.join('{}={}'.format(a, quoteattr(str(v))) for a, v in zip(element[1:], ids_))
+        data = ''.join('<data key="{}">{}</data>'.format(keys[c], escape(str(v))) for c, v in zip(cols, row) if v is not None)
+        yield '<{} {}>{}</{}>\n'.format(element[0], attrs, data, element[0])
+
+def write_graphml(node_chunks, edge_chunks, f, index_col, source_col, target_col, compress = False):
+    '''
+    undirected GraphML, written element by element; attribute keys (and their types) come from the first chunk
+    of nodes and of edges
+    '''
+    out = text_writer(f, compress)
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+
+    header = {}
+    def declare(chunk, domain, prefix):
+        keys = {}
+        for i, (col, dtype) in enumerate(chunk.dtypes.items()):
+            keys[col] = '{}{}'.format(prefix, i)
+            out.write('<key id="{}" for="{}" attr.name={} attr.type="{}"/>\n'.format(keys[col], domain, quoteattr(str(col)), graphml_type(dtype)))
+        header[domain] = keys
+
+    node_chunks, edge_chunks = iter(node_chunks), iter(edge_chunks)
+    first_nodes, first_edges = next(node_chunks, None), next(edge_chunks, None)
+    if first_nodes is not None:
+        declare(first_nodes, 'node', 'n')
+    if first_edges is not None:
+        declare(first_edges, 'edge', 'e')
+
+    out.write('<graph edgedefault="undirected">\n')
+    if first_nodes is not None:
+        for chunk in chain([first_nodes], node_chunks):
+            out.writelines(graphml_rows(chunk, header['node'], ('node', 'id'), [index_col]))
+    if first_edges is not None:
+        for chunk in chain([first_edges], edge_chunks):
+            out.writelines(graphml_rows(chunk, header['edge'], ('edge', 'source', 'target'), [source_col, target_col]))
+    out.write('</graph>\n</graphml>\n')
+    out.close()
+
+def export_file(write, suffix, previous = None):
+    '''
+    fn = export_file(lambda f: write_table(frame_chunks(edges), f, compress = True), '.tab.gz')
+
+    runs write(f) on a new binary temporary file and returns its path for FileDownload, so exports are written
+    chunk by chunk instead of being built in memory; previous (the last export of the session) is removed first
+    '''
+    remove_export(previous)
+
+    fd, fn = tempfile.mkstemp(prefix='htt_omni_export_', suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        write(f)
+
+    return fn
+
+def remove_export(fn):
+    if fn is not None and os.path.exists(fn):
+        os.remove(fn)
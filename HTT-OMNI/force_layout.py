@@ -0,0 +1,190 @@
+import time
+import numpy as np
+
+def cell_mass(cell, pos, n_cells):
+    mass = np.bincount(cell, minlength=n_cells).astype(float)
+    centroids = np.vstack([np.bincount(cell, weights=pos[:, 0], minlength=n_cells), np.bincount(cell, weights=pos[:, 1], minlength=n_cells)]).T
+    centroids[mass>0] /= mass[mass>0, None]
+
+    return mass, centroids
+
+def grid_repulsion(pos, k2, grid_size, fine = 4, max_pairs = 32, rng = None):
+    '''
+    approximate Fruchterman-Reingold repulsion (k^2/d) on a two-level grid: each node is repelled by the
+    mass-weighted centroids of the other coarse cells, by the centroids of the other fine cells inside its
+    own coarse cell, and exactly by the nodes sharing its fine cell. In fine cells with more than max_pairs
+    nodes (clumped positions), each node is repelled by max_pairs random cell members instead, scaled up to
+    the cell size, so the near field stays O(n*max_pairs).
+    '''
+    n = pos.shape[0]
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0)-lo, 1e-9)
+    fine_size = grid_size*fine
+
+    fxy = np.minimum((fine_size*(pos-lo)/span).astype(np.int64), fine_size-1)
+    fine_cell = fxy[:, 0]*fine_size+fxy[:, 1]
+    cxy = fxy//fine
+    coarse_cell = cxy[:, 0]*grid_size+cxy[:, 1]
+
+    # far field: other coarse cells
+    mass, centroids = cell_mass(coarse_cell, pos, grid_size**2)
+    occupied = np.flatnonzero(mass)
+    dx = pos[:, 0:1]-centroids[None, occupied, 0]
+    dy = pos[:, 1:2]-centroids[None, occupied, 1]
+    w = dx*dx+dy*dy+1e-9
+    np.divide(mass[occupied], w, out=w)
+    w[np.arange(n), np.searchsorted(occupied, coarse_cell)] = 0
+    disp = np.vstack([np.einsum('ij,ij->i', dx, w), np.einsum('ij,ij->i', dy, w)]).T
+
+    # mid field: the other fine cells of the node's own coarse cell
+    mass, centroids = cell_mass(fine_cell, pos, fine_size**2)
+    a, b = [x.ravel() for x in np.meshgrid(np.arange(fine), np.arange(fine), indexing='ij')]
+    cells = (cxy[:, 0:1]*fine+a[None, :])*fine_size+(cxy[:, 1:2]*fine+b[None, :])
+    dx = pos[:, 0:1]-centroids[cells, 0]
+    dy = pos[:, 1:2]-centroids[cells, 1]
+    w = dx*dx+dy*dy+1e-9
+    np.divide(mass[cells], w, out=w)
+    w[cells==fine_cell[:, None]] = 0
+    disp[:, 0] += np.einsum('ij,ij->i', dx, w)
+    disp[:, 1] += np.einsum('ij,ij->i', dy, w)
+
+    # near field: pairs within each fine cell (all of them, or max_pairs sampled members in crowded cells)
+    counts = np.bincount(fine_cell, minlength=fine_size**2)
+    order = np.argsort(fine_cell, kind='stable')
+    starts = np.cumsum(counts)-counts
+    c = counts[fine_cell[order]]
+    p = np.minimum(c, max_pairs)
+    i = np.repeat(np.arange(n), p)
+    c_i = c[i]
+    offsets = np.arange(i.shape[0])-np.repeat(np.cumsum(p)-p, p)
+    sampled = c_i>max_pairs
+    if sampled.any():
+        rng = np.random.default_rng(0) if rng is None else rng
+        offsets[sampled] = rng.integers(0, c_i[sampled])
+    j = starts[fine_cell[order]][i]+offsets
+    scale = np.where(sampled, c_i/max_pairs, 1.0)
+    i, j = order[i], order[j]
+    keep = i!=j
+    i, j, scale = i[keep], j[keep], scale[keep]
+
+    delta = pos[i]-pos[j]
+    w = scale/((delta**2).sum(axis=1)+1e-9)
+    disp[:, 0] += np.bincount(i, weights=delta[:, 0]*w, minlength=n)
+    disp[:, 1] += np.bincount(i, weights=delta[:, 1]*w, minlength=n)
+
+    return k2*disp
+
+def exact_repulsion(pos, k2, rows = None):
+    # repulsion on pos[rows] (all nodes if rows is None) from every node
+    rows = np.arange(pos.shape[0]) if rows is None else rows
+    dx = pos[rows, 0:1]-pos[None, :, 0]
+    dy = pos[rows, 1:2]-pos[None, :, 1]
+    w = dx*dx+dy*dy+1e-9
+    np.divide(k2, w, out=w)
+    w[np.arange(rows.shape[0]), rows] = 0
+
+    return np.vstack([np.einsum('ij,ij->i', dx, w), np.einsum('ij,ij->i', dy, w)]).T
+
+def force_directed_layout(n,
+                          sources,
+                          targets,
+                          weights = None,
+                          pos = None,
+                          iterations = 50,
+                          time_budget = None,
+                          seed = 0,
+                          temperature = None,
+                          gravity = 0.1,
+                          exact_max_nodes = 500,
+                          rescale = True,
+                          fixed = None,
+                         ):
+    '''
+    xy = force_directed_layout(3, np.array([0, 1]), np.array([1, 2]))
+
+    vectorized Fruchterman-Reingold layout over edge index arrays (sources/targets index into 0..n-1).
+    Repulsion is exact up to exact_max_nodes and grid-approximated above that. pos warm-starts the
+    layout (rows with NaN are placed randomly); iterations stop early once time_budget (s) is spent.
+    fixed is an optional boolean mask of nodes that keep their pos; forces are then only evaluated for
+    the free nodes, so the cost scales with the number of free nodes rather than the whole graph.
+    Returns an (n, 2) array, scaled to [-1, 1] if rescale is True (never rescaled when nodes are fixed).
+    '''
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    warm = pos is not None
+    if pos is None:
+        pos = rng.uniform(-1, 1, (n, 2))
+    else:
+        pos = np.array(pos, dtype=float)
+        missing = np.isnan(pos).any(axis=1)
+        pos[missing] = rng.uniform(-1, 1, (missing.sum(), 2))
+
+    if n<2:
+        return np.zeros((n, 2))
+
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = np.ones(sources.shape[0]) if weights is None else np.asarray(weights, dtype=float)
+
+    if fixed is None:
+        free = np.arange(n)
+    else:
+        fixed = np.asarray(fixed, dtype=bool)
+        free = np.flatnonzero(~fixed)
+        rescale = False
+
+        # only edges with a free end pull on anything
+        keep = ~(fixed[sources]&fixed[targets])
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+
+    if free.shape[0]==0:
+        return pos
+
+    # coincident (free) warm-start positions get no repulsion from each other (zero distance vector); jitter them apart
+    if warm:
+        _, first = np.unique(pos, axis=0, return_index=True)
+        duplicate = np.ones(n, dtype=bool)
+        duplicate[first] = False
+        if fixed is not None:
+            duplicate &= ~fixed
+        if duplicate.any():
+            pos[duplicate] += rng.normal(0, 1e-3*max(np.ptp(pos, axis=0).max(), 1), (duplicate.sum(), 2))
+
+    # layout area is [-1, 1]^2
+    k = 2/np.sqrt(n)
+    k2 = k**2
+    grid_size = int(np.clip(np.sqrt(n)/8, 2, 10))
+
+    if temperature is None:
+        temperature = 0.05 if warm else 0.2
+    cooling = temperature/(iterations+1)
+
+    for it in range(iterations):
+        if n<=exact_max_nodes or free.shape[0]*n<=exact_max_nodes**2:
+            disp = exact_repulsion(pos, k2, rows = free)
+        else:
+            disp = grid_repulsion(pos, k2, grid_size, rng = rng)[free]
+
+        # attraction (d^2/k) along edges, weighted by edge score
+        delta = pos[sources]-pos[targets]
+        f = weights*np.sqrt((delta**2).sum(axis=1))/k
+        for dim in [0, 1]:
+            disp[:, dim] -= np.bincount(sources, weights=delta[:, dim]*f, minlength=n)[free]
+            disp[:, dim] += np.bincount(targets, weights=delta[:, dim]*f, minlength=n)[free]
+
+        disp -= gravity*pos[free]/k
+
+        length = np.sqrt((disp**2).sum(axis=1))+1e-9
+        pos[free] += disp*(np.minimum(length, temperature)/length)[:, None]
+        temperature -= cooling
+
+        if (time_budget is not None) and (time.perf_counter()-t0>time_budget):
+            break
+
+    if rescale:
+        pos -= pos.mean(axis=0)
+        pos /= max(np.abs(pos).max(), 1e-9)
+
+    return pos
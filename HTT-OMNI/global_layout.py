@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pandas as pd
+
+from force_layout import force_directed_layout
+
+GLOBAL_LAYOUT_FN = r'./assets/data/global_layout.csv'
+
+def build_global_layout(node_ids, edges, source_col = 'GENE_ID_A', target_col = 'GENE_ID_B', edge_score_col = 'combined_score', fn = GLOBAL_LAYOUT_FN, iterations = 500, seed = 0):
+    '''
+    build_global_layout(pn.state.cache['nodes'][pn.state.cache['index_col']], pn.state.cache['edges'])
+
+    lays out the whole HINT node universe with the STRING edges between its genes (no score cutoff) and
+    stores one x, y per gene ID, so that any filtered subset can be drawn from the same coordinates
+    '''
+
+    ids = pd.Index(np.unique(np.asarray(node_ids, dtype=np.int64)))
+
+    in_universe = edges[source_col].isin(ids) & edges[target_col].isin(ids)
+    edges = edges[in_universe]
+    if hasattr(edges, 'compute'): # dask
+        edges = edges.compute()
+
+    xy = force_directed_layout(
+        ids.shape[0],
+        ids.get_indexer(edges[source_col].values),
+        ids.get_indexer(edges[target_col].values),
+        weights = edges[edge_score_col].values,
+        iterations = iterations,
+        seed = seed,
+    )
+
+    layout = pd.DataFrame(xy, index=ids, columns=['x', 'y'])
+    layout.index.name = 'geneID'
+    layout.to_csv(fn)
+
+    return layout
+
+def load_global_layout(fn = GLOBAL_LAYOUT_FN):
+    # DataFrame of x, y indexed by gene ID, or None if the layout has not been built
+    if not os.path.exists(fn):
+        return None
+
+    return pd.read_csv(fn, index_col=0)
+
+if __name__ == '__main__':
+    import panel as pn
+    import config_setup # runs setup(), reading variables into pn.state.cache
+
+    layout = build_global_layout(pn.state.cache['nodes'][pn.state.cache['index_col']], pn.state.cache['edges'], pn.state.cache['source_col'], pn.state.cache['target_col'])
+    print('Wrote {} ({} genes)'.format(GLOBAL_LAYOUT_FN, layout.shape[0]))
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+class LayoutCache(object):
+    '''
+    layout_cache = LayoutCache(max_size = 256, cache_dir = r'./assets/data/layout_cache')
+    key = layout_cache.key(node_ids, sources, targets, scores, 'kamada_kawai')
+    layout = layout_cache.get(key) # DataFrame of x, y indexed by node ID, or None
+    layout_cache.put(key, layout)
+
+    LRU cache of computed layouts shared between sessions. Keys hash the sorted node IDs, the edge list
+    with scores, the layout algorithm/parameters and, for warm-started layouts, the initial positions. With
+    cache_dir set, layouts are also persisted to disk (bounded to max_disk_size files, least recently used
+    removed first).
+    '''
+
+    def __init__(self, max_size = 256, cache_dir = None, max_disk_size = 4096):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.max_disk_size = max_disk_size
+        self.layouts = OrderedDict()
+        self.lock = threading.RLock()
+
+        if self.cache_dir is not None and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def key(node_ids, sources, targets, scores, algorithm, params = {}, init_positions = None):
+        node_ids = np.sort(np.asarray(node_ids, dtype=np.int64))
+
+        # undirected edges, sorted so that the key does not depend on row order
+        a = np.asarray(sources, dtype=np.int64)
+        b = np.asarray(targets, dtype=np.int64)
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        order = np.lexsort((hi, lo))
+
+        h = hashlib.sha1()
+        h.update(node_ids.tobytes())
+        h.update(lo[order].tobytes())
+        h.update(hi[order].tobytes())
+        h.update(np.round(np.asarray(scores, dtype=float)[order], 6).tobytes())
+        h.update(repr((algorithm, sorted(params.items()))).encode('utf8'))
+
+        # warm start (x, y indexed by node ID): the result depends on it, nodes without one are NaN
+        if init_positions is not None:
+            h.update(np.round(init_positions.reindex(node_ids)[['x', 'y']].values.astype(float), 6).tobytes())
+
+        return h.hexdigest()
+
+    def fn(self, key):
+        return os.path.join(self.cache_dir, key+'.npz')
+
+    def get(self, key):
+        with self.lock:
+            if key in self.layouts:
+                self.layouts.move_to_end(key)
+                ids, xy = self.layouts[key]
+                return pd.DataFrame(xy, index=pd.Index(ids), columns=['x', 'y'])
+
+            if self.cache_dir is None or not os.path.exists(self.fn(key)):
+                return None
+
+            with np.load(self.fn(key)) as f:
+                ids, xy = f['ids'], f['xy']
+            os.utime(self.fn(key)) # mark as recently used
+
+            self.put(key, pd.DataFrame(xy, index=pd.Index(ids), columns=['x', 'y']), persist=False)
+
+            return pd.DataFrame(xy, index=pd.Index(ids), columns=['x', 'y'])
+
+    def put(self, key, layout, persist = True):
+        # layout: DataFrame of x, y indexed by node ID
+        ids, xy = layout.index.values, layout[['x', 'y']].values.astype(float)
+
+        with self.lock:
+            self.layouts[key] = (ids, xy)
+            self.layouts.move_to_end(key)
+
+            while len(self.layouts)>self.max_size:
+                self.layouts.popitem(last=False)
+
+            if persist and self.cache_dir is not None:
+                np.savez(self.fn(key), ids=ids, xy=xy)
+                self.prune_disk()
+
+    def prune_disk(self):
+        fns = [os.path.join(self.cache_dir, fn) for fn in os.listdir(self.cache_dir) if fn.endswith('.npz')]
+
+        if len(fns)>self.max_disk_size:
+            for fn in sorted(fns, key=os.path.getmtime)[:len(fns)-self.max_disk_size]:
+                os.remove(fn)
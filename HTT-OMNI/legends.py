@@ -2,6 +2,8 @@ import holoviews as hv
 import pandas as pd
 import numpy as np
 
+from utils import webgl_hook
+
 # legends needed by the app:
 ### colorbar for the network
 ### node sizes for the network
@@ -52,7 +54,7 @@ def tissue_age_leg(all_tissues, all_ages, x, graph_opts = []):
             legend_opts = {'title':'Tissue/Age (mo)'},
             framewise=True,
             show_frame = False,
-            hooks = [save_hook]
+            hooks = [webgl_hook]
         )
     ]
 
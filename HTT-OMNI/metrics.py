@@ -0,0 +1,175 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# node metric columns (available as node color/size options)
+METRICS = ['pagerank', 'betweenness', 'clustering', 'k_core']
+
+def adjacency(ids, sources, targets):
+    # symmetric, unweighted CSR adjacency over ids (self loops and duplicate edges dropped)
+    ids = pd.Index(ids)
+    a = ids.get_indexer(sources)
+    b = ids.get_indexer(targets)
+    keep = (a>=0)&(b>=0)&(a!=b)
+    a, b = a[keep], b[keep]
+
+    A = sp.coo_matrix((np.ones(2*a.shape[0]), (np.concatenate([a, b]), np.concatenate([b, a]))), shape=(ids.shape[0], ids.shape[0])).tocsr()
+    A.data[:] = 1
+
+    return A
+
+def pagerank(A, alpha = 0.85, tol = 1e-10, max_iter = 200):
+    n = A.shape[0]
+    deg = np.asarray(A.sum(axis=1)).ravel()
+    dangling = deg==0
+    P = sp.diags(np.where(dangling, 0, 1/np.maximum(deg, 1)))@A # row-stochastic (except dangling rows)
+
+    r = np.full(n, 1/n)
+    for i in range(max_iter):
+        r_ = alpha*(P.T@r+r[dangling].sum()/n)+(1-alpha)/n
+        if np.abs(r_-r).sum()<n*tol:
+            return r_
+        r = r_
+
+    return r
+
+def neighbours(A, frontier):
+    # (row, neighbour) pairs for all nodes in frontier, straight from the CSR arrays
+    starts = A.indptr[frontier]
+    counts = A.indptr[frontier+1]-starts
+    rows = np.repeat(frontier, counts)
+    offsets = np.arange(counts.sum())-np.repeat(np.cumsum(counts)-counts, counts)
+
+    return rows, A.indices[np.repeat(starts, counts)+offsets]
+
+def betweenness(A, exact_max_nodes = 500, n_samples = 200, seed = 0):
+    '''
+    Brandes betweenness centrality (unweighted, normalized as networkx does for undirected graphs); BFS levels are
+    processed as arrays. Graphs above exact_max_nodes are estimated from n_samples random source nodes.
+    '''
+    n = A.shape[0]
+    bc = np.zeros(n)
+    if n<3:
+        return bc
+
+    sources = np.arange(n)
+    if n>exact_max_nodes:
+        sources = np.random.default_rng(seed).choice(n, n_samples, replace=False)
+
+    for s in sources:
+        dist = np.full(n, -1)
+        sigma = np.zeros(n)
+        dist[s], sigma[s] = 0, 1
+        frontier = np.array([s])
+        levels = []
+
+        while frontier.shape[0]>0:
+            v, w = neighbours(A, frontier)
+            new = w[dist[w]==-1]
+            dist[new] = dist[frontier[0]]+1
+
+            # shortest path edges to the next level
+            down = dist[w]==dist[v]+1
+            v, w = v[down], w[down]
+            sigma += np.bincount(w, weights=sigma[v], minlength=n)
+            levels.append((v, w))
+            frontier = np.unique(new)
+
+        delta = np.zeros(n)
+        for v, w in reversed(levels):
+            delta += np.bincount(v, weights=sigma[v]/sigma[w]*(1+delta[w]), minlength=n)
+        delta[s] = 0
+        bc += delta
+
+    bc *= n/sources.shape[0]
+
+    return bc/((n-1)*(n-2))
+
+def clustering(A):
+    deg = np.asarray(A.sum(axis=1)).ravel()
+    triangles = np.asarray((A@A).multiply(A).sum(axis=1)).ravel()/2
+
+    return np.where(deg>1, 2*triangles/np.maximum(deg*(deg-1), 1), 0)
+
+def k_core(A):
+    # core number by batch peeling: all nodes with degree <= k are removed together before k increases
+    n = A.shape[0]
+    deg = np.asarray(A.sum(axis=1)).ravel()
+    core = np.zeros(n, dtype=np.int64)
+    alive = np.ones(n, dtype=bool)
+    k = 0
+
+    while alive.any():
+        peel = np.flatnonzero(alive&(deg<=k))
+        if peel.shape[0]==0:
+            k = deg[alive].min()
+            continue
+
+        core[peel] = k
+        alive[peel] = False
+        deg -= np.asarray(A[peel].sum(axis=0)).ravel()
+
+    return core
+
+def graph_key(ids, sources, targets):
+    ids = np.sort(np.asarray(ids, dtype=np.int64))
+    a = np.asarray(sources, dtype=np.int64)
+    b = np.asarray(targets, dtype=np.int64)
+    pairs = np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1)
+
+    h = hashlib.sha1()
+    h.update(ids.tobytes())
+    h.update(pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))].tobytes())
+
+    return h.hexdigest()
+
+def compute_metrics(node_ids, sources, targets):
+    if len(node_ids)==0: # everything filtered out
+        return pd.DataFrame({m: np.array([], dtype=float) for m in METRICS}, index=pd.Index(node_ids))
+
+    A = adjacency(node_ids, sources, targets)
+
+    return pd.DataFrame({
+        'pagerank': pagerank(A),
+        'betweenness': betweenness(A),
+        'clustering': clustering(A),
+        'k_core': k_core(A),
+    }, index=pd.Index(node_ids))
+
+class SubgraphCache(object):
+    '''
+    metrics = metrics_cache.get(node_ids, sources, targets) # DataFrame of METRICS indexed by node ID
+
+    results of compute(node_ids, sources, targets, *args) per (node set, edge set), computed once and shared between
+    sessions (least recently used dropped beyond max_size), so that switching between metric color/size options is
+    instant. Extra args (e.g. edge weights) are passed to compute but are not part of the key.
+    '''
+
+    def __init__(self, compute, max_size = 64):
+        self.compute = compute
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, node_ids, sources, targets, *args):
+        node_ids = np.unique(node_ids)
+        key = graph_key(node_ids, sources, targets)
+
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                return self.results[key]
+
+        result = self.compute(node_ids, sources, targets, *args)
+
+        with self.lock:
+            self.results[key] = result
+            while len(self.results)>self.max_size:
+                self.results.popitem(last=False)
+
+        return result
+
+metrics_cache = SubgraphCache(compute_metrics)
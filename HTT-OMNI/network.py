@@ -12,7 +12,9 @@ from bokeh.models import HoverTool
 from draggable_graph import DraggableGraph
 from data_filter import DataFilter
 from legends import nodes_colorbar
-from utils import scale
+from utils import scale, export_svg, SVG_EXPORT_ERRORS
+from metrics import METRICS
+from exports import TABLE_FORMATS, GRAPH_FORMATS, frame_chunks, write_table, write_parquet, write_graphml, write_cytoscape, export_file, remove_export
 
 class Network(param.Parameterized):
     
@@ -23,11 +25,22 @@ class Network(param.Parameterized):
     sel_nodes = param.DataFrame(precedence=-1)
     
     # data streams push data to DynamicMaps
-    network_data = param.ClassSelector(default=hv.streams.Pipe(), class_=(hv.streams.Pipe,), precedence=-1) #ultimately this will be a list of node_data, edge_data, layout, bundle_edge_graphs
+    network_data = param.ClassSelector(default=hv.streams.Pipe(), class_=(hv.streams.Pipe,), precedence=-1) #ultimately this will be a list of node_data, edge_data, layout, bundle_edge_graphs, layout_mode
     click_stream = param.ClassSelector(default=hv.streams.Tap(), class_=(hv.streams.Tap,), precedence=-1)
+    click_radius = param.Number(0.03, bounds=(0, None), precedence=-1) # max click distance to a node, as a fraction of the visible plot extent
+
+    # file formats of the node/edge table and network exports
+    table_format = param.Selector(objects = list(TABLE_FORMATS), default = 'tab', label = 'Table export format')
+    graph_format = param.Selector(objects = list(GRAPH_FORMATS), default = 'GraphML', label = 'Network export format')
+
+    # pulls the STRING neighbors of selected_node into the view (see DataFilter.expand_neighborhood)
+    expand_neighborhood = param.Action(lambda x: x.param.trigger('expand_neighborhood'), label='EXPAND SELECTED NODE')
     
     # graph layout algorithm
-    layout = param.Selector(objects = ['kamada_kawai', 'circular', 'spring'], default='kamada_kawai')
+    layout = param.Selector(objects = ['kamada_kawai', 'circular', 'spring', 'force_directed'], default='kamada_kawai')
+    
+    # 'Incremental' keeps the positions of nodes that survive a filter change and only places the new ones
+    layout_mode = param.Selector(objects = ['Incremental', 'Full'], default='Incremental')
     
     # edge bundling
     bundle_graph_edges = param.Selector(objects = ['Yes', 'No'], default='No')
@@ -61,11 +74,15 @@ class Network(param.Parameterized):
     node_clim = param.Tuple(default  = (None, None), precedence=-1)
     clim_min = param.Number()
     clim_max = param.Number()
+    node_size_by = param.Selector(default = '# PPI observations (all)', objects = ['# PPI observations (all)']+METRICS)
     min_node_size = param.Number(default=25, bounds = (0, 150))
     max_node_size = param.Number(default=60, bounds = (0, 150))
     min_edge_width = param.Number(default=0.25, bounds = (0, 15))
     max_edge_width = param.Number(default=5, bounds = (0, 15))
 
+    # edge colors for network comparison mode
+    diff_colors = param.Dict({'A only': '#4489ab', 'B only': '#ab4444', 'shared': 'grey'}, precedence=-1)
+
     # parent DataFiter
     parent = param.ClassSelector(DataFilter, precedence=-1)
     
@@ -80,6 +97,8 @@ class Network(param.Parameterized):
                  target_col = 'GENE_ID_B',
                  label_col = 'geneSymbol',
                  user_tooltips = [], # list of tuples (label, @column)
+                 layout_cache = None, # LayoutCache shared between sessions
+                 global_layout = None, # precomputed coordinates for the HINT node universe (enables layout = 'global')
                  **params
                 ):
         super(Network, self).__init__(**params)
@@ -98,6 +117,8 @@ class Network(param.Parameterized):
         self.mapping = dict([
             ('bundle_graph_edges', {'type': pn.widgets.RadioButtonGroup}
             ),
+            ('layout_mode', {'type': pn.widgets.RadioButtonGroup}
+            ),
             ('fontsize', {'type': pn.widgets.DiscreteSlider, 'throttled': True}
             ),
             ('tooltips', {'type': pn.widgets.CheckBoxGroup}
@@ -127,6 +148,15 @@ class Network(param.Parameterized):
         self.export_show_edges_button = pn.widgets.FileDownload(callback = self.export_show_edges, filename = 'current_network_edges.tab', label= 'Export current network edges', button_type = 'primary', **fd_params)
         self.export_sel_nodes_button = pn.widgets.FileDownload(callback = self.export_sel_nodes, filename = 'all_filtered_nodes.tab', label= 'Export all filtered nodes', button_type = 'default', **fd_params)
         self.export_sel_edges_button = pn.widgets.FileDownload(callback = self.export_sel_edges, filename = 'all_filtered_edges.tab', label= 'Export all filtered edges', button_type = 'default', **fd_params)
+        self.export_show_graph_button = pn.widgets.FileDownload(callback = self.export_show_graph, filename = 'current_network.graphml', label= 'Export current network', button_type = 'primary', **fd_params)
+        self.export_sel_graph_button = pn.widgets.FileDownload(callback = self.export_sel_graph, filename = 'all_filtered_network.graphml', label= 'Export filtered network', button_type = 'default', **fd_params)
+        self.export_fn = None # last export file of this session (removed by the next export and when the session ends)
+        if pn.state.curdoc is not None:
+            pn.state.on_session_destroyed(self.remove_export)
+        self.export_figure_button = pn.widgets.FileDownload(callback = self.export_figure, filename = 'current_network.svg', label= 'Export figure (SVG)', button_type = 'primary', **fd_params)
+        
+        # current viewport of the network plot (SVG export renders the same view)
+        self.range_stream = None
 
         self.network_pane = pn.pane.HoloViews(sizing_mode = 'stretch_both', linked_axes=False, min_height=0, min_width=0)
         self.cbar_pane = pn.pane.HoloViews(sizing_mode='stretch_width', linked_axes=False, min_height=0, min_width=0)
@@ -141,8 +171,14 @@ class Network(param.Parameterized):
             source_col = self.source_col,
             target_col = self.target_col,
             label_col = self.label_col,
+            edge_score_col = self.parent.edge_score_col,
+            layout_cache = layout_cache,
+            global_layout = global_layout,
         )
         
+        if global_layout is not None:
+            self.param.layout.objects = self.param.layout.objects+['global']
+        
         ### configure cmap & node size ###
         if self.node_cmap == 'HTT_OMNI':
             node_cmap = sns.blend_palette(['white', '#4489ab'], as_cmap=True)
@@ -192,14 +228,31 @@ class Network(param.Parameterized):
         # set tooltips to user provided tooltips
         self.tooltips = [i[0] for i in user_tooltips] # triggers self.update_tooltips
                  
-    @param.depends('network_data.data', 'graph_opts', watch=True) # this method is the money maker!
+    def overlay_opts(self, overlay):
+        # graph_opts other than the element options applied by the DraggableGraph callbacks
+        return overlay.opts(*[getattr(opts, k)(**self.graph_opts[k]) for k in self.graph_opts if k not in ['Nodes', 'Graph', 'Labels']])
+
+    @param.depends('network_data.data', watch=True) # this method is the money maker!
     def view(self):
         self.loading=True
+        self.graph.style_opts = self.graph_opts # element options are applied by the DraggableGraph callbacks
+
+        # same nodes and edges with new attribute values: patch the rendered sources
+        if self.graph.update_attributes(self.network_data.data):
+            self.loading = False
+            return
+
         network_graph = self.graph.view(self.network_data.data)
         
         if network_graph is not None:
             self.click_stream.source = self.graph.edge_graph
-            network_graph = network_graph.opts(*[getattr(opts, k)(**self.graph_opts[k]) for k in self.graph_opts]).opts(active_tools=['point_draw', 'wheel_zoom'])
+            network_graph = self.overlay_opts(network_graph).opts(active_tools=['wheel_zoom'] if self.graph.raster else ['point_draw', 'wheel_zoom'])
+
+            # global coordinates are absolute, so zoom to the displayed subset
+            if self.layout == 'global':
+                network_graph = network_graph.opts(opts.Overlay(**self.subset_limits()))
+
+            self.range_stream = hv.streams.RangeXY(source = network_graph)
 
             if self.selected_node == (None, None): # only on initialization
                 self.selected_node = tuple(self.node_data.iloc[0,:][[self.index_col, self.label_col]])
@@ -208,6 +261,32 @@ class Network(param.Parameterized):
 
         self.loading = False
         
+    @param.depends('selected_node', watch=True)
+    def highlight_selected_node(self):
+        # rasterized networks draw the selected node and its neighbours as interactive glyphs, both modes label them
+        self.graph.highlight(self.selected_node[0])
+        self.graph.set_label_focus(self.selected_node[0])
+
+    @param.depends('expand_neighborhood', watch=True)
+    def expand_selected_node(self):
+        if self.selected_node[0] is not None:
+            self.parent.expand_neighborhood(self.selected_node[0])
+
+    @param.depends('graph_opts', watch=True)
+    def restyle(self):
+        # aesthetic-only changes go to the rendered plot, data and layout stay untouched (see DraggableGraph.restyle)
+        if not self.graph.restyle(self.graph_opts):
+            self.view()
+
+        self.loading = False
+
+    def subset_limits(self, pad = 0.15):
+        x0, x1 = self.graph.positions['x'].min(), self.graph.positions['x'].max()
+        y0, y1 = self.graph.positions['y'].min(), self.graph.positions['y'].max()
+        span = max(x1-x0, y1-y0, 1e-3)
+
+        return {'xlim': (x0-pad*span, x1+pad*span), 'ylim': (y0-pad*span, y1+pad*span)}
+        
     @param.depends('node_data', 'edge_data', 'layout', 'bundle_graph_edges', watch=True)
     def update_data(self):
         
@@ -218,7 +297,8 @@ class Network(param.Parameterized):
             self.node_data, # nodes
             self.edge_data, # edges
             self.layout,
-            {'Yes': True, 'No': False}[self.bundle_graph_edges]            
+            {'Yes': True, 'No': False}[self.bundle_graph_edges],
+            self.layout_mode,
         ]
         
         self.network_data.update(data=new_data) # triggers self.view
@@ -228,14 +308,21 @@ class Network(param.Parameterized):
         
         self.click_loading = True
         
-        x, y = (self.click_stream.x, self.click_stream.y)
-        graph_data = pd.DataFrame(self.graph.stream.data)
-        
-        sel = graph_data.loc[((graph_data.x-x).abs()+(graph_data.y-y).abs()).idxmin(), :]
-        idx = sel[self.index_col]
-        label = sel[self.label_col]
-        self.delta = (graph_data.x-x).abs()+(graph_data.y-y).abs().min()
-        self.selected_node = (idx, label)
+        # nearest node within click_radius (fraction of the current viewport, so it stays the same on screen when zoomed;
+        # the network extent before the first range update), clicks on empty canvas select nothing
+        xy = self.graph.spatial_index.xy
+        ranges = (self.range_stream.x_range, self.range_stream.y_range) if self.range_stream is not None else (None, None)
+        if all(r is not None and None not in r for r in ranges):
+            extent = max(abs(r[1]-r[0]) for r in ranges)
+        else:
+            extent = np.ptp(xy, axis=0).max() if xy.shape[0]>0 else 0
+        radius = self.click_radius*max(extent, 1e-3) if xy.shape[0]>0 else 0
+        sel = self.graph.node_at(self.click_stream.x, self.click_stream.y, radius)
+
+        if sel is not None and sel[0]<0: # community meta-node
+            self.parent.expand_community(sel[0])
+        elif sel is not None:
+            self.selected_node = sel
         
         self.click_loading = False
         
@@ -245,6 +332,18 @@ class Network(param.Parameterized):
         new_edges = self.parent.show_edges.copy()
         
         new_edges['edge_width'] = scale(new_edges[self.parent.edge_score_col], self.min_edge_width, self.max_edge_width)
+
+        # color edges by A only / B only / shared in network comparison mode
+        if not 'Graph' in self.graph_opts:
+            self.graph_opts['Graph'] = {}
+        if 'diff_class' in new_edges.columns:
+            self.graph_opts['Graph'].update({'edge_color': dim('diff_class').categorize(self.diff_colors, default='grey')})
+        else:
+            self.graph_opts['Graph'].update({'edge_color': 'grey'})
+
+        # size switches to member counts with the collapsed community view (and back)
+        if any('n_members' in nodes.columns for nodes in [new_nodes, self.node_data] if nodes is not None):
+            self.set_node_size(new_nodes)
                 
         self.param.set_param(node_data = new_nodes, edge_data = new_edges) # triggers self.update_data
         
@@ -285,6 +384,11 @@ class Network(param.Parameterized):
         
         self.param.set_param(graph_opts = self.graph_opts)
         
+    # defined before the other node_color/node_size_by watchers (they run in definition order), which read the metric column
+    @param.depends('node_color', 'node_size_by', watch=True)
+    def request_metrics(self):
+        self.parent.metrics_needed = (self.node_color in METRICS) or (self.node_size_by in METRICS)
+
     @param.depends('node_color', watch=True)
     def update_node_color(self): 
         
@@ -398,57 +502,103 @@ class Network(param.Parameterized):
             self.node_color = 'connectivity'
         self.param.node_color.objects = self.parent.color_opts
         
-    @param.depends('min_node_size', 'max_node_size', watch = True)
-    def update_node_size(self):
+    def node_size(self, nodes):
+        if 'n_members' in nodes.columns:
+            # collapsed community view: meta-nodes by member count, expanded genes at min_node_size
+            return (dim('n_members')**0.5).norm()*(self.max_node_size-self.min_node_size)+self.min_node_size
+
+        if self.node_size_by in METRICS:
+            # metric columns are continuous; scale linearly over the displayed range
+            return dim(self.node_size_by).norm()*(self.max_node_size-self.min_node_size)+self.min_node_size
+
         max_PPI = 20
         size_dict = dict(zip(range(1, max_PPI+1), np.linspace(self.min_node_size, self.max_node_size, max_PPI)))
         size_dict.update(dict(zip(range(max_PPI+1, 101), [self.max_node_size]*len(list(range(max_PPI+1, 101))))))
 
+        return dim('PPI_SUM_TOTAL').categorize(size_dict)
+
+    def set_node_size(self, nodes):
+        size = self.node_size(nodes)
+
         if not 'Nodes' in self.graph_opts:
             self.graph_opts['Nodes'] = {}
-        self.graph_opts['Nodes'].update({'size': dim('PPI_SUM_TOTAL').categorize(size_dict)})
+        self.graph_opts['Nodes'].update({'size': size})
         if not 'Graph' in self.graph_opts:
             self.graph_opts['Graph'] = {}
-        self.graph_opts['Graph'].update({'node_size': dim('PPI_SUM_TOTAL').categorize(size_dict)})
+        self.graph_opts['Graph'].update({'node_size': size})
 
+    @param.depends('min_node_size', 'max_node_size', 'node_size_by', watch = True)
+    def update_node_size(self):
+        self.set_node_size(self.parent.show_nodes)
         self.param.set_param(graph_opts = self.graph_opts)
 
+    @param.depends('table_format', 'graph_format', watch=True)
+    def update_export_filenames(self):
+        for button in [self.export_show_nodes_button, self.export_show_edges_button, self.export_sel_nodes_button, self.export_sel_edges_button]:
+            button.filename = button.filename.split('.')[0]+TABLE_FORMATS[self.table_format]
+        for button in [self.export_show_graph_button, self.export_sel_graph_button]:
+            button.filename = button.filename.split('.')[0]+GRAPH_FORMATS[self.graph_format]
+
+    def export_table(self, chunks):
+        # chunked export in table_format (see exports.py)
+        suffix = TABLE_FORMATS[self.table_format]
+        if self.table_format=='parquet':
+            write = lambda f: write_parquet(chunks, f)
+        else:
+            write = lambda f: write_table(chunks, f, compress = suffix.endswith('.gz'))
+
+        self.export_fn = export_file(write, suffix, self.export_fn)
+
+        return self.export_fn
+
+    def export_graph(self, which):
+        # nodes (as in the nodes table) and edges of the current ('show') or filtered ('sel') network in graph_format
+        nodes = self.parent.nodes_view(which)
+        edges = {'show': self.parent.show_edges, 'sel': self.parent.sel_edges}[which]
+
+        suffix = GRAPH_FORMATS[self.graph_format]
+        if self.graph_format.startswith('GraphML'):
+            write = lambda f: write_graphml(nodes.chunks(), frame_chunks(edges), f, 'GeneID', self.source_col, self.target_col, compress = suffix.endswith('.gz'))
+        else:
+            write = lambda f: write_cytoscape(nodes.chunks(), frame_chunks(edges), f, 'GeneID', 'Gene Symbol', self.source_col, self.target_col, compress = suffix.endswith('.gz'))
+
+        self.export_fn = export_file(write, suffix, self.export_fn)
+
+        return self.export_fn
+
+    def remove_export(self, session_context = None):
+        remove_export(self.export_fn)
+        self.export_fn = None
+
     def export_show_nodes(self):
-        sio = StringIO()
-        self.parent.display_nodes.to_csv(sio, sep='\t')
-        sio.seek(0)
-        
-        return sio
+        return self.export_table(self.parent.nodes_view('show').chunks())
     
     def export_show_edges(self):
-        sio = StringIO()
-        self.parent.show_edges.to_csv(sio, sep='\t')
-        sio.seek(0)
-        
-        return sio
+        return self.export_table(frame_chunks(self.parent.show_edges))
     
     def export_sel_nodes(self):
-        sio = StringIO()
-
-        filt = self.parent.sel_nodes.reset_index().set_index([self.parent.index_col, self.parent.gene_symbol_col])
-        filt.index.names = ['GeneID', 'Gene Symbol']
+        # the wide (all annotations / after filtering) table is the one cached behind the nodes table
+        return self.export_table(self.parent.nodes_view('sel').chunks())
+    
+    def export_show_graph(self):
+        return self.export_graph('show')
 
-        all_annot = self.parent.annotations.reset_index().set_index([self.parent.index_col, self.parent.gene_symbol_col]).loc[filt.index, :]
-        all_annot.index.names = ['GeneID', 'Gene Symbol']
+    def export_sel_graph(self):
+        return self.export_graph('sel')
 
-        temp = pd.concat([pd.concat([all_annot[f], filt[[f]]], axis=1, keys = ['all annotations', 'after filtering']) for f in self.parent.filters], axis=1)
-        temp.columns = [self.parent.filter_aliases[j]+f' ({i})'for i, j in temp.columns.values]
-        temp['# PPI observations (all)'] = filt.loc[temp.index, 'PPI_SUM_TOTAL']
-        temp['# PPI observations (filtered)'] = filt.loc[temp.index, 'PPI_SUM_FILT']
-        
-        temp.to_csv(sio, sep='\t')
+    def export_figure(self):
+        # plots render with webgl interactively, the SVG copy of the current view is rendered on demand from a static
+        # copy of the graph (rendering the displayed DynamicMaps again would re-capture the drag/patch handles)
+        x_range, y_range = (self.range_stream.x_range, self.range_stream.y_range) if self.range_stream is not None else (None, None)
+        try:
+            svg = export_svg(self.overlay_opts(self.graph.static_view()), xlim = x_range, ylim = y_range)
+        except SVG_EXPORT_ERRORS as e:
+            pn.state.notifications.error('ERROR: SVG export failed, the server needs firefox and geckodriver ({})'.format(e), duration=0)
+            svg = '' # FileDownload needs a file object
+        sio = StringIO(svg)
         sio.seek(0)
         
         return sio
     
     def export_sel_edges(self):
-        sio = StringIO()
-        self.parent.sel_edges.to_csv(sio, sep='\t')
-        sio.seek(0)
-        
-        return sio
\ No newline at end of file
+        return self.export_table(frame_chunks(self.parent.sel_edges))
\ No newline at end of file
@@ -0,0 +1,61 @@
+import numpy as np
+
+class OmicsIndex(object):
+    '''
+    omics_index = OmicsIndex(omics_data)
+    condition = omics_index.condition({'type': 'RNA', 'tissue': 'striatum', 'age': 10, 'Q-length': 175})
+    gene_ids = omics_index.query(condition, '<', -0.5)
+
+    keeps, for every omics condition (column), the non-missing values in sorted order alongside their gene IDs,
+    so a threshold query is a binary search rather than a scan of the omics frame
+    '''
+
+    comparisons = ['<', '<=', '>', '>=']
+
+    def __init__(self, omics_data, gene_id_level = 'geneID'):
+        self.levels = list(omics_data.columns.names)
+        self.conditions = list(omics_data.columns)
+
+        gene_ids = omics_data.index.get_level_values(gene_id_level).values
+        values = omics_data.values.astype(float)
+
+        self.sorted_values = {}
+        self.sorted_ids = {}
+        for i, condition in enumerate(self.conditions):
+            keep = ~np.isnan(values[:, i])
+            order = np.argsort(values[keep, i], kind='mergesort')
+            self.sorted_values[condition] = values[keep, i][order]
+            self.sorted_ids[condition] = gene_ids[keep][order]
+
+    def options(self, level, selected = {}):
+        # values of "level" among the conditions matching the selected {level: value} pairs
+        i = self.levels.index(level)
+        matches = [c for c in self.conditions if all(c[self.levels.index(l)]==v for l, v in selected.items())]
+
+        return sorted(set(c[i] for c in matches))
+
+    def condition(self, selected):
+        matches = [c for c in self.conditions if all(c[self.levels.index(l)]==v for l, v in selected.items())]
+
+        if len(matches)!=1:
+            raise KeyError('Omics selection {} matches {} conditions (expected 1)'.format(selected, len(matches)))
+
+        return matches[0]
+
+    def query(self, condition, comparison, threshold):
+        values = self.sorted_values[condition]
+        ids = self.sorted_ids[condition]
+
+        if comparison=='<':
+            return ids[:np.searchsorted(values, threshold, side='left')]
+        elif comparison=='<=':
+            return ids[:np.searchsorted(values, threshold, side='right')]
+        elif comparison=='>':
+            return ids[np.searchsorted(values, threshold, side='right'):]
+        elif comparison=='>=':
+            return ids[np.searchsorted(values, threshold, side='left'):]
+        else:
+            raise ValueError('comparison must be one of {} (passed "{}")'.format(self.comparisons, comparison))
+
+    def mask(self, gene_ids, condition, comparison, threshold):
+        return np.isin(gene_ids, self.query(condition, comparison, threshold))
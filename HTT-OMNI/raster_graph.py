@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import holoviews as hv
+import datashader as ds
+from holoviews.operation.datashader import datashade, dynspread
+
+def edge_paths(xy, start, end):
+    # one NaN-separated path through all edge segments (datashader draws it as separate lines)
+    paths = np.full((3*start.shape[0], 2), np.nan)
+    paths[0::3] = xy[start]
+    paths[1::3] = xy[end]
+
+    return pd.DataFrame(paths, columns=['x', 'y'])
+
+def raster_edges(xy, start, end, edge_color = '#9e9e9e'):
+    '''
+    edges = raster_edges(positions[['x', 'y']].values, edge_start, edge_end)
+
+    datashaded edges, re-aggregated server-side for the current viewport on every zoom/pan (RangeXY)
+    '''
+    return datashade(hv.Path(edge_paths(xy, start, end), ['x', 'y']), aggregator=ds.count(), cmap=['#e0e0e0', edge_color], min_alpha=60)
+
+def raster_nodes(positions, node_color = '#4489ab'):
+    # datashaded node positions, spread so that isolated nodes stay visible when zoomed out
+    return dynspread(datashade(hv.Points(positions[['x', 'y']], ['x', 'y']), aggregator=ds.count(), cmap=[node_color], min_alpha=200), threshold=0.8, max_px=3)
+
+def neighborhood(node_id, start_ids, end_ids):
+    # node_id and its direct neighbours
+    if node_id is None:
+        return np.array([])
+
+    return np.unique(np.concatenate([[node_id], end_ids[start_ids==node_id], start_ids[end_ids==node_id]]))
+
+def interactive_subset(positions, index_col, priority_col, top_n, extra_ids = ()):
+    # rows drawn as glyphs on top of the raster: the top_n nodes by priority_col plus extra_ids (e.g. a selected neighbourhood)
+    top = positions[priority_col].rank(method='first', ascending=False)<=top_n
+    extra = positions[index_col].isin(extra_ids)
+
+    return positions[top|extra]
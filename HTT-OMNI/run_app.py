@@ -15,11 +15,12 @@ hv.extension('bokeh')
 
 # @profile
 def user_instance():
-    data_filter = DataFilter(**{k:pn.state.cache[k] for k in ['nodes', 'edges', 'filters', 'index_col', 'gene_symbol_col', 'filter_aliases', 'groupby_PPI_cols']})
+    # stored uploads are listed per logged-in user (per session without authentication)
+    data_filter = DataFilter(upload_owner = pn.state.user, **{k:pn.state.cache[k] for k in ['nodes', 'edges', 'filters', 'index_col', 'gene_symbol_col', 'filter_aliases', 'groupby_PPI_cols', 'artifacts', 'omics_index', 'upload_store', 'string_graph']})
 
     network = Network(parent = data_filter, 
                       graph_opts = pn.state.cache['graph_opts'].copy(), 
-                      **{k:pn.state.cache[k] for k in ['nodes', 'edges', 'index_col', 'source_col', 'target_col', 'label_col', 'fontsize', 'node_cmap', 'user_tooltips']})
+                      **{k:pn.state.cache[k] for k in ['nodes', 'edges', 'index_col', 'source_col', 'target_col', 'label_col', 'fontsize', 'node_cmap', 'user_tooltips', 'layout_cache', 'global_layout']})
 
     enrichment = Enrichment(parent = network, **{k:pn.state.cache[k] for k in ['annot_description_mapping', 'index_col', 'background_geneIDs']})  
 
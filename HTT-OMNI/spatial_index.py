@@ -0,0 +1,59 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+class SpatialIndex(object):
+    '''
+    index = SpatialIndex(xy) # (n, 2) array of node positions
+    index.move([3], [[0.1, 0.2]]) # node 3 was dragged
+    row = index.nearest(x, y, radius = 0.05) # None if no node lies within radius
+
+    nearest-neighbour lookup over node positions. A KD-tree holds the positions it was built with; moved nodes
+    are kept in a small dirty set that is searched exhaustively and masked out of tree results, and the tree is
+    only rebuilt once the dirty set grows past max_dirty, so a drag updates the index in O(1).
+    '''
+
+    def __init__(self, xy, max_dirty = 64):
+        self.max_dirty = max_dirty
+        self.rebuild(xy)
+
+    def rebuild(self, xy):
+        self.xy = np.array(xy, dtype=float).reshape(-1, 2)
+        self.tree = cKDTree(self.xy) if self.xy.shape[0]>0 else None
+        self.dirty = np.zeros(self.xy.shape[0], dtype=bool)
+        self.n_dirty = 0
+
+    def move(self, rows, xy):
+        rows = np.asarray(rows, dtype=np.int64)
+        self.xy[rows] = np.asarray(xy, dtype=float).reshape(-1, 2)
+
+        self.n_dirty += (~self.dirty[rows]).sum()
+        self.dirty[rows] = True
+
+        if self.n_dirty>self.max_dirty:
+            self.rebuild(self.xy)
+
+    def nearest(self, x, y, radius = np.inf):
+        # row of the node closest to (x, y), or None if there is none within radius
+        if self.tree is None:
+            return None
+
+        point = np.array([x, y], dtype=float)
+        best, best_d = None, radius
+
+        # tree positions are stale for dirty rows, so ask for enough neighbours to skip all of them
+        k = min(self.n_dirty+1, self.xy.shape[0])
+        d, i = self.tree.query(point, k=k, distance_upper_bound=radius)
+        for d_, i_ in zip(np.atleast_1d(d), np.atleast_1d(i)):
+            if i_<self.xy.shape[0] and not self.dirty[i_]:
+                if d_<=best_d:
+                    best, best_d = int(i_), d_
+                break
+
+        if self.n_dirty>0:
+            dirty = np.flatnonzero(self.dirty)
+            d = np.sqrt(((self.xy[dirty]-point)**2).sum(axis=1))
+            j = d.argmin()
+            if d[j]<=best_d:
+                best, best_d = int(dirty[j]), d[j]
+
+        return best
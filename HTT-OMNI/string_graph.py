@@ -0,0 +1,221 @@
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+
+STRING_GRAPH_FN = r'./assets/data/STRINGdb_csr.npz'
+STRING_EDGE_FN = r'./assets/data/STRINGdb_edgefile.csv'
+
+def file_fingerprint(fn):
+    # size and modification time of the file a graph was built from (None if it does not exist)
+    if fn is None or not os.path.exists(fn):
+        return None
+
+    st = os.stat(fn)
+
+    return '{}:{}'.format(st.st_size, st.st_mtime_ns)
+
+class StringGraph(object):
+    '''
+    string_graph = StringGraph.from_edges(pn.state.cache['edges'])
+    new_ids = string_graph.k_hop([3064], hops = 2, min_score = 0.7, top_k = 25)
+    edges = string_graph.edges_within(ids, min_score = 0.7)
+
+    paths = string_graph.top_paths(query_ids, 3064, min_score = 0.7, k = 3)
+
+    the full STRING edge file as a symmetric CSR adjacency over gene IDs: the neighbours of row i are
+    indices[indptr[i]:indptr[i+1]] (rows into ids, sorted by descending score), so neighbourhood and path queries
+    are array slices and scipy csgraph calls instead of scans over the dask edge frame
+    '''
+
+    def __init__(self, ids, indptr, indices, scores):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=float)
+        self.index = pd.Index(self.ids)
+        self.shortest_trees = OrderedDict() # (target row, min_score) -> (dist, predecessors)
+
+    @classmethod
+    def from_edges(cls, edges, source_col = 'GENE_ID_A', target_col = 'GENE_ID_B', edge_score_col = 'combined_score'):
+        edges = edges[[source_col, target_col, edge_score_col]]
+        if hasattr(edges, 'compute'): # dask
+            edges = edges.compute()
+
+        a = edges[source_col].values.astype(np.int64)
+        b = edges[target_col].values.astype(np.int64)
+        s = edges[edge_score_col].values.astype(float)
+        keep = a!=b
+
+        ids = np.unique(np.concatenate([a[keep], b[keep]]))
+        rows = np.concatenate([np.searchsorted(ids, a[keep]), np.searchsorted(ids, b[keep])])
+        cols = np.concatenate([np.searchsorted(ids, b[keep]), np.searchsorted(ids, a[keep])])
+        s = np.concatenate([s[keep], s[keep]])
+
+        # drop duplicate pairs (the edge file may list both directions), keeping the highest score
+        order = np.lexsort((-s, cols, rows))
+        rows, cols, s = rows[order], cols[order], s[order]
+        first = np.ones(rows.shape[0], dtype=bool)
+        first[1:] = (rows[1:]!=rows[:-1])|(cols[1:]!=cols[:-1])
+        rows, cols, s = rows[first], cols[first], s[first]
+
+        order = np.lexsort((-s, rows))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=ids.shape[0]))])
+
+        return cls(ids, indptr, cols[order], s[order])
+
+    def save(self, fn = STRING_GRAPH_FN, fingerprint = None):
+        # fingerprint: file_fingerprint of the edge file the graph was built from
+        np.savez(fn, ids=self.ids, indptr=self.indptr, indices=self.indices, scores=self.scores, fingerprint=np.array(str(fingerprint)))
+
+    @classmethod
+    def load(cls, fn = STRING_GRAPH_FN, fingerprint = None):
+        # None if fingerprint is given and the graph was built from a different edge file
+        with np.load(fn) as f:
+            if fingerprint is not None and ('fingerprint' not in f.files or str(f['fingerprint'])!=fingerprint):
+                return None
+
+            return cls(f['ids'], f['indptr'], f['indices'], f['scores'])
+
+    def rows(self, gene_ids):
+        # rows of gene_ids (genes without STRING edges are dropped)
+        rows = self.index.get_indexer(np.asarray(gene_ids, dtype=np.int64))
+
+        return rows[rows>=0]
+
+    def neighbors(self, rows, min_score = 0):
+        # (row, neighbour row, score) for all edges of rows scoring at least min_score
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.indptr[rows]
+        counts = self.indptr[rows+1]-starts
+        offsets = np.arange(counts.sum())-np.repeat(np.cumsum(counts)-counts, counts)
+        flat = np.repeat(starts, counts)+offsets
+
+        keep = self.scores[flat]>=min_score
+
+        return np.repeat(rows, counts)[keep], self.indices[flat][keep], self.scores[flat][keep]
+
+    def k_hop(self, gene_ids, hops = 1, min_score = 0.4, top_k = 25, exclude = ()):
+        '''
+        gene IDs of up to top_k genes within hops of gene_ids over edges scoring at least min_score, not counting
+        gene_ids and exclude (e.g. the genes already displayed). Each hop expands from the genes added by the
+        previous one and ranks new genes by their best edge score.
+        '''
+        frontier = self.rows(gene_ids)
+        seen = np.zeros(self.ids.shape[0], dtype=bool)
+        seen[frontier] = True
+        seen[self.rows(exclude)] = True
+
+        added = []
+        budget = top_k
+        for hop in range(hops):
+            if budget<=0 or frontier.shape[0]==0:
+                break
+
+            v, w, s = self.neighbors(frontier, min_score)
+            new = ~seen[w]
+            if not new.any():
+                break
+
+            best = pd.Series(s[new]).groupby(w[new]).max().sort_values(ascending=False, kind='mergesort').iloc[:budget]
+            frontier = best.index.values
+            seen[frontier] = True
+            added.append(frontier)
+            budget -= frontier.shape[0]
+
+        if len(added)==0:
+            return np.array([], dtype=np.int64)
+
+        return self.ids[np.concatenate(added)]
+
+    def edges_within(self, gene_ids, min_score = 0, source_col = 'GENE_ID_A', target_col = 'GENE_ID_B', edge_score_col = 'combined_score'):
+        # edges among gene_ids scoring at least min_score, one row per edge
+        rows = self.rows(gene_ids)
+        member = np.zeros(self.ids.shape[0], dtype=bool)
+        member[rows] = True
+
+        v, w, s = self.neighbors(rows, min_score)
+        keep = member[w]&(v<w)
+
+        return pd.DataFrame({source_col: self.ids[v[keep]], target_col: self.ids[w[keep]], edge_score_col: s[keep]})
+
+    def cost_graph(self, min_score = 0):
+        # edges scoring at least min_score with cost -log(score), so the cheapest path is the most confident one
+        keep = self.scores>=min_score
+        rows = np.repeat(np.arange(self.ids.shape[0]), np.diff(self.indptr))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[keep], minlength=self.ids.shape[0]))])
+
+        cost = -np.log(self.scores[keep])+1e-9 # keep score 1 edges strictly positive
+
+        return sp.csr_matrix((cost, self.indices[keep], indptr), shape=(self.ids.shape[0], self.ids.shape[0]))
+
+    def shortest_tree(self, target_row, min_score = 0, max_trees = 8):
+        # Dijkstra from target_row (costs are symmetric, so this covers paths from every gene to the target)
+        key = (target_row, min_score)
+        if key not in self.shortest_trees:
+            self.shortest_trees[key] = dijkstra(self.cost_graph(min_score), indices=target_row, return_predecessors=True)
+            while len(self.shortest_trees)>max_trees:
+                self.shortest_trees.popitem(last=False)
+
+        self.shortest_trees.move_to_end(key)
+
+        return self.shortest_trees[key]
+
+    def top_paths(self, gene_ids, target_id, min_score = 0.4, k = 1):
+        '''
+        up to k highest confidence paths (product of edge scores) from each of gene_ids to target_id over edges
+        scoring at least min_score, as a list of (gene ID array from query gene to target, confidence). The k paths
+        of a query gene leave it through k different neighbours, each followed by that neighbour's best path to
+        the target (paths that would return to the query gene are skipped); k = 1 is the shortest path.
+        '''
+        t = self.index.get_indexer([target_id])[0]
+        if t<0:
+            return []
+
+        dist, pred = self.shortest_tree(t, min_score)
+
+        def walk(u):
+            path = [u]
+            while path[-1]!=t:
+                path.append(pred[path[-1]])
+            return path
+
+        paths = []
+        for q in np.unique(self.rows(gene_ids)):
+            if q==t or not np.isfinite(dist[q]):
+                continue
+
+            v, w, s = self.neighbors([q], min_score)
+            cost = -np.log(s)+1e-9+dist[w]
+            order = np.argsort(cost, kind='mergesort')
+
+            n = 0
+            for i in order[np.isfinite(cost[order])]:
+                path = [q]+walk(w[i])
+                if q in path[1:]:
+                    continue
+
+                paths.append((self.ids[path], np.exp(-cost[i]+1e-9*(len(path)-1))))
+                n += 1
+                if n==k:
+                    break
+
+        return paths
+
+def load_string_graph(edges, fn = STRING_GRAPH_FN, edge_fn = STRING_EDGE_FN, **kwargs):
+    # StringGraph from fn, (re)built from the edge frame (and stored to fn) on first use or when edge_fn has changed since
+    fingerprint = file_fingerprint(edge_fn)
+
+    if os.path.exists(fn):
+        string_graph = StringGraph.load(fn, fingerprint = fingerprint)
+        if string_graph is not None:
+            return string_graph
+
+        print('Rebuilding {} ({} has changed)'.format(fn, edge_fn))
+
+    string_graph = StringGraph.from_edges(edges, **kwargs)
+    string_graph.save(fn, fingerprint = fingerprint)
+
+    return string_graph
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+class LazyTableView(object):
+    '''
+    view = LazyTableView(ids, {'GeneID': lambda ids: ids, 'PPI': lambda ids: ppi.reindex(ids).values})
+    page, page_num, n_pages, n_rows = view.page(1, 25, sort_by='PPI', ascending=False)
+
+    builders map column name -> callable(ids) returning the column values for those ids. A full column
+    is only built (and cached) when it is needed for sorting or searching, otherwise only the rows of
+    the requested page are computed.
+    '''
+
+    def __init__(self, ids, builders):
+        self.ids = np.asarray(ids)
+        self.builders = builders
+        self.columns = list(builders)
+        self.built = {}
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def column(self, col):
+        if not col in self.built:
+            self.built[col] = np.asarray(self.builders[col](self.ids))
+
+        return self.built[col]
+
+    def values(self, col, rows):
+        if col in self.built:
+            return self.built[col][rows]
+
+        return np.asarray(self.builders[col](self.ids[rows]))
+
+    def rows(self, sort_by = None, ascending = True, search = '', search_cols = ()):
+        rows = np.arange(len(self))
+
+        if search!='':
+            match = np.zeros(rows.shape[0], dtype=bool)
+            for col in search_cols:
+                match |= pd.Series(self.column(col)).astype(str).str.contains(search, case=False, regex=False).values
+            rows = rows[match]
+
+        if sort_by is not None:
+            # stable sort with missing values last, regardless of direction
+            key = pd.Series(self.column(sort_by)[rows])
+            rows = rows[key.sort_values(ascending=ascending, kind='mergesort', na_position='last').index.values]
+
+        return rows
+
+    def page(self, page, page_size, columns = None, **kwargs):
+        rows = self.rows(**kwargs)
+
+        n_pages = max(1, int(np.ceil(rows.shape[0]/page_size)))
+        page = min(max(page, 1), n_pages)
+        rows_ = rows[(page-1)*page_size:page*page_size]
+
+        if columns is None:
+            columns = self.columns
+
+        return pd.DataFrame({col: self.values(col, rows_) for col in self.columns if col in columns}), page, n_pages, rows.shape[0]
+
+    def to_frame(self, columns = None):
+        if columns is None:
+            columns = self.columns
+
+        return pd.DataFrame({col: self.column(col) for col in self.columns if col in columns})
+
+    def chunks(self, chunk_size = 5000, columns = None):
+        # row chunks of the full table (columns already built for sorting/searching are reused); an empty table
+        # still yields one empty chunk, as frame_chunks does
+        if columns is None:
+            columns = self.columns
+
+        for start in range(0, max(len(self), 1), chunk_size):
+            rows = np.arange(start, min(start+chunk_size, len(self)))
+            yield pd.DataFrame({col: self.values(col, rows) for col in self.columns if col in columns})
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the app modules are flat files in HTT-OMNI/ (imported from the working directory when served)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from communities import louvain, community_labels, meta_ids, collapse
+
+def cliques(sizes = (6, 4), isolated = 2):
+    # cliques of the given sizes (score 0.9) chained by single weak edges (score 0.15), plus isolated nodes
+    ids, rows = [], []
+    for size in sizes:
+        members = list(range(len(ids)+1, len(ids)+size+1))
+        if len(ids)>0:
+            rows.append((ids[-1], members[0], 0.15))
+        rows += [(a, b, 0.9) for i, a in enumerate(members) for b in members[i+1:]]
+        ids += members
+    ids += list(range(len(ids)+1, len(ids)+isolated+1))
+
+    nodes = pd.DataFrame({'GeneID': ids, 'geneSymbol': ['G{}'.format(i) for i in ids], 'PPI_SUM_TOTAL': np.arange(len(ids))+1})
+    edges = pd.DataFrame(rows, columns=['GENE_ID_A', 'GENE_ID_B', 'combined_score'])
+
+    return nodes, edges
+
+def test_louvain_finds_cliques():
+    nodes, edges = cliques()
+    membership = louvain(nodes['GeneID'], edges['GENE_ID_A'], edges['GENE_ID_B'], edges['combined_score'])
+
+    # largest community first, unconnected nodes in 0
+    assert membership.loc[1:6].tolist() == [1]*6
+    assert membership.loc[7:10].tolist() == [2]*4
+    assert membership.loc[11:12].tolist() == [0]*2
+    assert community_labels(membership.loc[[1, 7, 11]]).tolist() == ['C1', 'C2', 'unconnected']
+
+def test_louvain_without_edges():
+    assert louvain([1, 2, 3], [], [], []).tolist() == [0, 0, 0]
+    assert louvain([1, 2], [1], [1], [0.9]).tolist() == [0, 0] # self loops only
+    assert louvain([], [], [], []).shape[0] == 0
+
+def test_collapse():
+    nodes, edges = cliques(sizes = (6, 4, 3))
+    membership = louvain(nodes['GeneID'], edges['GENE_ID_A'], edges['GENE_ID_B'], edges['combined_score'])
+    show_nodes, show_edges = collapse(nodes, edges, membership, expanded = [2])
+
+    genes = show_nodes[show_nodes['GeneID']>0]
+    meta = show_nodes[show_nodes['GeneID']<0].set_index('GeneID')
+    assert sorted(genes['GeneID']) == [7, 8, 9, 10]
+    assert sorted(meta.index) == sorted(meta_ids([0, 1, 3]))
+    assert meta.loc[meta_ids(1), 'n_members'] == 6
+    assert meta.loc[meta_ids(1), 'PPI_SUM_TOTAL'] == nodes['PPI_SUM_TOTAL'].iloc[:6].sum()
+    assert meta['n_members'].sum()+genes.shape[0] == nodes.shape[0]
+
+    # edges inside collapsed communities are dropped, edges between them aggregated
+    assert show_edges['n_edges'].sum() == edges.shape[0]-(6*5//2+3*2//2)
+    assert set(show_edges['GENE_ID_A'])|set(show_edges['GENE_ID_B']) <= set(show_nodes['GeneID'])
+    assert (show_edges['GENE_ID_A']<show_edges['GENE_ID_B']).all()
+
+def test_collapse_max_expanded():
+    nodes, edges = cliques()
+    membership = louvain(nodes['GeneID'], edges['GENE_ID_A'], edges['GENE_ID_B'], edges['combined_score'])
+    show_nodes, show_edges = collapse(nodes, edges, membership, expanded = [1, 2], max_expanded = 3)
+
+    # the 3 highest PPI genes are expanded, the other members stay in their meta-nodes
+    assert sorted(show_nodes.loc[show_nodes['GeneID']>0, 'GeneID']) == [8, 9, 10]
+    meta = show_nodes[show_nodes['GeneID']<0].set_index('GeneID')
+    assert meta.loc[meta_ids(1), 'n_members'] == 6
+    assert meta.loc[meta_ids(2), 'n_members'] == 1
+
+def test_collapse_empty():
+    nodes, edges = cliques()
+    show_nodes, show_edges = collapse(nodes.iloc[:0], edges.iloc[:0], pd.Series(dtype=int))
+
+    assert show_nodes.shape[0] == 0
+    assert show_edges.shape[0] == 0
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+hv = pytest.importorskip('holoviews')
+hv.extension('bokeh')
+
+from draggable_graph import DraggableGraph
+
+def network(n_nodes = 20):
+    rng = np.random.default_rng(0)
+    ids = np.arange(1, n_nodes+1)*7
+    nodes = pd.DataFrame({
+        'geneID': ids,
+        'geneSymbol': ['G{}'.format(i) for i in ids],
+        'PPI_SUM_TOTAL': rng.integers(1, 20, n_nodes),
+        'connectivity': rng.integers(0, 5, n_nodes).astype(float),
+    })
+    a, b = np.triu_indices(n_nodes, k=1)
+    keep = rng.random(a.shape[0])<0.2
+    edges = pd.DataFrame({'GENE_ID_A': ids[a[keep]], 'GENE_ID_B': ids[b[keep]], 'combined_score': rng.uniform(0.4, 1, keep.sum())})
+    edges['edge_width'] = edges['combined_score']*5
+
+    return nodes, edges
+
+def render(graph, data):
+    # what Network.view does: attribute patch if possible, else a full view
+    if not graph.update_attributes(data):
+        hv.renderer('bokeh').get_plot(graph.view(data))
+
+def styled_graph():
+    graph = DraggableGraph()
+    graph.style_opts = {'Graph': {'edge_line_width': 'edge_width', 'node_color': 'connectivity'}, 'Nodes': {'color': 'connectivity'}, 'Labels': {}}
+
+    return graph
+
+def test_edge_width_change_reaches_rendered_source():
+    nodes, edges = network()
+    graph = styled_graph()
+    render(graph, [nodes, edges, 'circular', False, 'Full'])
+    before = np.array(graph.handles['edges'].data['edge_line_width'], dtype=float)
+
+    wider = edges.assign(edge_width = edges['edge_width']*2)
+    render(graph, [nodes, wider, 'circular', False, 'Full'])
+    after = np.array(graph.handles['edges'].data['edge_line_width'], dtype=float)
+
+    assert np.allclose(np.sort(after), np.sort(before*2))
+
+def test_unstyled_attribute_change_is_patched():
+    nodes, edges = network()
+    graph = styled_graph()
+    render(graph, [nodes, edges, 'circular', False, 'Full'])
+    source = graph.handles['nodes']
+
+    # PPI_SUM_TOTAL is shipped (label priority) but not mapped by any style option
+    changed = nodes.assign(PPI_SUM_TOTAL = nodes['PPI_SUM_TOTAL']+1)
+    assert graph.update_attributes([changed, edges, 'circular', False, 'Full'])
+    assert graph.handles['nodes'] is source
+    assert np.array_equal(np.sort(np.asarray(source.data['PPI_SUM_TOTAL'])), np.sort(changed['PPI_SUM_TOTAL'].values))
+
+def test_straight_edges_ship_paths_for_drag_patches():
+    nodes, edges = network()
+    graph = styled_graph()
+    render(graph, [nodes, edges, 'circular', False, 'Full'])
+
+    assert len(graph.handles['edges'].data['xs'])==edges.shape[0]
+
+def test_lod_labels_follow_viewport_priority_and_focus():
+    graph = DraggableGraph(label_budget = 3)
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'geneID': np.arange(20), 'x': np.arange(20)/20, 'y': rng.random(20), 'PPI_SUM_TOTAL': rng.permutation(20), 'connectivity': 0.0})
+
+    # small networks are labelled in full
+    assert graph.lod_label_rows(data.iloc[:3]).tolist() == [0, 1, 2]
+
+    in_view = data[data['x']<=0.5]
+    assert graph.lod_label_rows(data, (0, 0.5), (None, None)).tolist() == sorted(in_view.nlargest(3, 'PPI_SUM_TOTAL').index)
+
+    # focus nodes (the selected node and its neighbours) come first, if they are in view
+    graph.label_focus = np.array([0, 19])
+    rows = graph.lod_label_rows(data, (0, 0.5), (0, 1))
+    assert 0 in rows and 19 not in rows and rows.shape[0]==3
+
+    assert graph.lod_label_rows(data, (2, 3), (2, 3)).shape[0] == 0
+
+    graph.lod_labels = False
+    assert graph.lod_label_rows(data).shape[0] == 20
@@ -0,0 +1,98 @@
+import gzip
+import io
+import json
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from exports import frame_chunks, write_table, write_parquet, write_cytoscape, write_graphml, export_file, remove_export
+from table_view import LazyTableView
+
+def network(n_nodes = 12):
+    nodes = pd.DataFrame({'GeneID': np.arange(n_nodes)*5, 'Gene Symbol': ['G{}'.format(i) for i in range(n_nodes)], 'PPI': np.arange(n_nodes, dtype=float)})
+    nodes.loc[3, 'PPI'] = np.nan
+    edges = pd.DataFrame({'GENE_ID_A': nodes['GeneID'].values[:-1], 'GENE_ID_B': nodes['GeneID'].values[1:], 'combined_score': np.arange(n_nodes-1)*10})
+
+    return nodes, edges
+
+def nodes_view(nodes):
+    return LazyTableView(nodes['GeneID'].values, {col: (lambda col: lambda ids: nodes.set_index('GeneID')[col].reindex(ids).values if col!='GeneID' else ids)(col) for col in nodes.columns})
+
+def written(write):
+    # bytes written through export_file (the writers close the file they are given)
+    fn = export_file(write, '.export')
+    with open(fn, 'rb') as f:
+        data = f.read()
+    remove_export(fn)
+
+    return data
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_table_round_trip(compress):
+    nodes, _ = network()
+    data = written(lambda f: write_table(frame_chunks(nodes, chunk_size=5), f, compress = compress))
+    if compress:
+        data = gzip.decompress(data)
+
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(data), sep='\t'), nodes)
+
+def test_empty_table_keeps_header():
+    nodes, _ = network()
+
+    for chunks in [frame_chunks(nodes.iloc[:0]), nodes_view(nodes.iloc[:0]).chunks()]:
+        data = written(lambda f: write_table(chunks, f))
+        assert data.decode('utf-8').splitlines() == ['\t'.join(nodes.columns)]
+
+def test_lazy_chunks_match_frame():
+    nodes, _ = network()
+    chunks = list(nodes_view(nodes).chunks(chunk_size=5))
+
+    assert [chunk.shape[0] for chunk in chunks] == [5, 5, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), nodes)
+
+def test_cytoscape():
+    nodes, edges = network()
+    data = json.loads(written(lambda f: write_cytoscape(nodes_view(nodes).chunks(chunk_size=5), frame_chunks(edges, chunk_size=5), f, 'GeneID', 'Gene Symbol', 'GENE_ID_A', 'GENE_ID_B')))
+
+    assert [n['data']['id'] for n in data['elements']['nodes']] == nodes['GeneID'].astype(str).tolist()
+    assert data['elements']['nodes'][3]['data']['PPI'] is None
+    assert [(e['data']['source'], e['data']['target']) for e in data['elements']['edges']] == list(zip(edges['GENE_ID_A'].astype(str), edges['GENE_ID_B'].astype(str)))
+
+    empty = json.loads(written(lambda f: write_cytoscape(frame_chunks(nodes.iloc[:0]), frame_chunks(edges.iloc[:0]), f, 'GeneID', 'Gene Symbol', 'GENE_ID_A', 'GENE_ID_B')))
+    assert empty == {'elements': {'nodes': [], 'edges': []}}
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_graphml(compress):
+    nodes, edges = network()
+    data = written(lambda f: write_graphml(frame_chunks(nodes, chunk_size=5), frame_chunks(edges, chunk_size=5), f, 'GeneID', 'GENE_ID_A', 'GENE_ID_B', compress = compress))
+    if compress:
+        data = gzip.decompress(data)
+
+    G = nx.read_graphml(io.BytesIO(data))
+    assert sorted(G.nodes()) == sorted(nodes['GeneID'].astype(str))
+    assert G.number_of_edges() == edges.shape[0]
+    assert G.nodes['10']['Gene Symbol'] == 'G2'
+    assert 'PPI' not in G.nodes['15']
+    assert G.edges['0', '5']['combined_score'] == 0
+
+    empty = nx.read_graphml(io.BytesIO(written(lambda f: write_graphml(frame_chunks(nodes.iloc[:0]), frame_chunks(edges.iloc[:0]), f, 'GeneID', 'GENE_ID_A', 'GENE_ID_B'))))
+    assert empty.number_of_nodes() == 0
+
+def test_parquet_empty_keeps_schema():
+    pq = pytest.importorskip('pyarrow.parquet')
+    nodes, _ = network()
+    data = written(lambda f: write_parquet(frame_chunks(nodes.iloc[:0]), f))
+
+    assert pq.read_table(io.BytesIO(data)).column_names == nodes.columns.tolist()
+
+def test_export_file_replaces_previous():
+    nodes, _ = network()
+    first = export_file(lambda f: write_table(frame_chunks(nodes), f), '.tab')
+    second = export_file(lambda f: write_table(frame_chunks(nodes), f), '.tab', first)
+
+    assert not os.path.exists(first) and os.path.exists(second)
+    remove_export(second)
+    assert not os.path.exists(second)
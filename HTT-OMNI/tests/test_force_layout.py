@@ -0,0 +1,36 @@
+import time
+import numpy as np
+
+from force_layout import force_directed_layout, grid_repulsion
+
+def random_edges(n, m, seed = 0):
+    s, t = np.random.default_rng(seed).integers(0, n, (2, m))
+
+    return s[s!=t], t[s!=t]
+
+def test_fixed_as_list():
+    pos = np.random.default_rng(0).uniform(-1, 1, (4, 2))
+    fixed = [True, True, False, False]
+    xy = force_directed_layout(4, np.array([0, 1, 2]), np.array([1, 2, 3]), pos = pos, fixed = fixed, iterations = 5)
+
+    assert np.array_equal(xy[:2], pos[:2])
+    assert not np.array_equal(xy[2:], pos[2:])
+
+def test_coincident_warm_start_separates():
+    n = 2000
+    sources, targets = random_edges(n, 6000)
+    pos = np.zeros((n, 2))
+    pos[:20] = np.random.default_rng(0).uniform(-1, 1, (20, 2))
+
+    t0 = time.perf_counter()
+    xy = force_directed_layout(n, sources, targets, pos = pos, iterations = 5)
+
+    assert time.perf_counter()-t0<5
+    assert np.isfinite(xy).all()
+    assert np.unique(xy, axis=0).shape[0]==n
+
+def test_sampled_near_field_matches_exact_on_spread_positions():
+    # cells below max_pairs are computed exactly, so spread positions are unaffected by the cap
+    pos = np.random.default_rng(0).uniform(-1, 1, (1000, 2))
+
+    assert np.allclose(grid_repulsion(pos, 1e-3, 4), grid_repulsion(pos, 1e-3, 4, max_pairs = 10**6))
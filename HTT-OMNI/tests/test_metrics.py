@@ -0,0 +1,44 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS, compute_metrics, metrics_cache, SubgraphCache
+
+def karate():
+    G = nx.karate_club_graph()
+    sources, targets = np.array(G.edges()).T
+
+    return G, np.array(G.nodes()), sources, targets
+
+def test_metrics_match_networkx():
+    G, ids, sources, targets = karate()
+    metrics = compute_metrics(ids, sources, targets)
+
+    # stationary distribution of the google matrix (nx.pagerank itself needs scipy>=1.8 with networkx 2.7)
+    M = nx.google_matrix(G, alpha=0.85, nodelist=ids, weight=None)
+    w, v = np.linalg.eig(np.asarray(M).T)
+    pr = np.real(v[:, np.argmax(np.real(w))])
+    assert np.allclose(metrics['pagerank'].values, pr/pr.sum(), atol=1e-8)
+    assert np.allclose(metrics['betweenness'].values, pd.Series(nx.betweenness_centrality(G)).reindex(ids).values)
+    assert np.allclose(metrics['clustering'].values, pd.Series(nx.clustering(G)).reindex(ids).values)
+    assert np.array_equal(metrics['k_core'].values, pd.Series(nx.core_number(G)).reindex(ids).values)
+
+def test_empty_graph():
+    metrics = metrics_cache.get(np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+    assert metrics.shape==(0, len(METRICS))
+    assert list(metrics.columns)==METRICS
+
+def test_isolated_nodes():
+    metrics = compute_metrics(np.array([3, 5]), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+    assert np.allclose(metrics['pagerank'].values, 0.5)
+    assert (metrics[['betweenness', 'clustering', 'k_core']].values==0).all()
+
+def test_cache_ignores_edge_order():
+    calls = []
+    cache = SubgraphCache(lambda ids, s, t: calls.append(1) or len(calls))
+
+    assert cache.get([1, 2, 3], [1, 2], [2, 3])==1
+    assert cache.get([3, 2, 1], [3, 2], [2, 1])==1
+    assert cache.get([1, 2, 3], [1], [2])==2
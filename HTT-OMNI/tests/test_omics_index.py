@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from omics_index import OmicsIndex
+
+LEVELS = ['type', 'tissue', 'age', 'Q-length']
+
+def omics(conditions = [('RNA', 'striatum', 2, 175), ('RNA', 'cortex', 6, 175), ('protein', 'striatum', 10, 111)], n_genes = 50):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(n_genes, len(conditions)))
+    values[rng.random(values.shape)<0.1] = np.nan
+
+    return pd.DataFrame(values, index=pd.Index(np.arange(n_genes)*3, name='geneID'), columns=pd.MultiIndex.from_tuples(conditions, names=LEVELS))
+
+def test_options_cascade():
+    index = OmicsIndex(omics())
+
+    assert index.options('type') == ['RNA', 'protein']
+    assert index.options('tissue', {'type': 'RNA'}) == ['cortex', 'striatum']
+    assert index.options('age', {'type': 'RNA', 'tissue': 'cortex'}) == [6]
+    assert index.options('tissue', {'type': 'ATAC'}) == []
+    assert index.condition({'type': 'protein', 'tissue': 'striatum', 'age': 10, 'Q-length': 111}) == ('protein', 'striatum', 10, 111)
+
+    with pytest.raises(KeyError):
+        index.condition({'type': 'RNA'})
+
+def test_no_options():
+    index = OmicsIndex(omics().iloc[:, :0])
+
+    assert all(index.options(level) == [] for level in LEVELS)
+
+@pytest.mark.parametrize('comparison', OmicsIndex.comparisons)
+def test_query_matches_scan(comparison):
+    data = omics()
+    index = OmicsIndex(data)
+    ops = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+    for condition in data.columns:
+        for threshold in [-0.5, 0.0, data[condition].dropna().iloc[0]]:
+            expected = data.index[ops[comparison](data[condition].values, threshold)]
+            assert set(index.query(condition, comparison, threshold)) == set(expected)
+
+def test_data_filter_empty_omics_levels():
+    pytest.importorskip('holoviews')
+    dd = pytest.importorskip('dask.dataframe')
+    from data_filter import DataFilter
+
+    nodes = pd.DataFrame({'geneID': [1, 2, 3], 'geneSymbol': ['A', 'B', 'C'], 'studyID': ['s1', 's1', 's2'], 'data_source': ['x', 'x', 'y'], 'tissue': ['t', 't', 'u']})
+    edges = dd.from_pandas(pd.DataFrame({'GENE_ID_A': [1], 'GENE_ID_B': [2], 'combined_score': [900]}), npartitions=1)
+
+    data_filter = DataFilter(nodes, edges, filters=['tissue'], omics_index=OmicsIndex(omics().iloc[:, :0]))
+
+    for p in ['omics_type', 'omics_tissue', 'omics_age', 'omics_Q_length']:
+        assert getattr(data_filter, p) is None
+        assert getattr(data_filter.param, p).objects == []
+
+    data_filter = DataFilter(nodes, edges, filters=['tissue'], omics_index=OmicsIndex(omics()))
+    data_filter.omics_type = 'protein'
+
+    assert (data_filter.omics_tissue, data_filter.omics_age, data_filter.omics_Q_length) == ('striatum', 10, 111)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+hv = pytest.importorskip('holoviews')
+pytest.importorskip('datashader')
+hv.extension('bokeh')
+
+from raster_graph import edge_paths, raster_edges, raster_nodes, neighborhood, interactive_subset
+
+def layout(n_nodes = 50, n_edges = 80):
+    rng = np.random.default_rng(0)
+    positions = pd.DataFrame({'geneID': np.arange(n_nodes)*2, 'x': rng.random(n_nodes), 'y': rng.random(n_nodes), 'PPI_SUM_TOTAL': rng.permutation(n_nodes)})
+    start, end = rng.integers(0, n_nodes, n_edges), rng.integers(0, n_nodes, n_edges)
+
+    return positions, start, end
+
+def test_edge_paths():
+    positions, start, end = layout()
+    xy = positions[['x', 'y']].values
+    paths = edge_paths(xy, start, end)
+
+    assert paths.shape == (3*start.shape[0], 2)
+    assert np.array_equal(paths.values[0::3], xy[start]) and np.array_equal(paths.values[1::3], xy[end])
+    assert paths.iloc[2::3].isnull().all().all()
+
+def test_neighborhood():
+    start_ids, end_ids = np.array([1, 1, 2, 5]), np.array([2, 3, 4, 1])
+
+    assert neighborhood(1, start_ids, end_ids).tolist() == [1, 2, 3, 5]
+    assert neighborhood(4, start_ids, end_ids).tolist() == [2, 4]
+    assert neighborhood(None, start_ids, end_ids).shape[0] == 0
+
+def test_interactive_subset():
+    positions, start, end = layout()
+    subset = interactive_subset(positions, 'geneID', 'PPI_SUM_TOTAL', 5, extra_ids = [0, 2])
+
+    top = positions.nlargest(5, 'PPI_SUM_TOTAL')['geneID']
+    assert set(subset['geneID']) == set(top)|{0, 2}
+
+@pytest.mark.parametrize('n_nodes, n_edges', [(50, 80), (0, 0)])
+def test_raster_renders(n_nodes, n_edges):
+    positions, start, end = layout(n_nodes, n_edges)
+    overlay = raster_edges(positions[['x', 'y']].values, start, end)*raster_nodes(positions)
+
+    hv.renderer('bokeh').get_plot(overlay.opts(hv.opts.RGB(width=200, height=200)))
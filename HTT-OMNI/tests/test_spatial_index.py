@@ -0,0 +1,45 @@
+import numpy as np
+
+from spatial_index import SpatialIndex
+
+def brute_force(xy, x, y, radius = np.inf):
+    d = np.sqrt(((xy-[x, y])**2).sum(axis=1))
+
+    return int(d.argmin()) if d.shape[0]>0 and d.min()<=radius else None
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    xy = rng.random((500, 2))
+    index = SpatialIndex(xy)
+
+    for x, y in rng.random((200, 2))*1.2-0.1:
+        assert index.nearest(x, y) == brute_force(xy, x, y)
+        assert index.nearest(x, y, radius = 0.02) == brute_force(xy, x, y, radius = 0.02)
+
+def test_moved_nodes():
+    rng = np.random.default_rng(1)
+    xy = rng.random((300, 2))
+    index = SpatialIndex(xy, max_dirty = 16)
+
+    # drags below and past max_dirty (the tree is rebuilt once the dirty set is too large)
+    for n_moves in [5, 40]:
+        rows = rng.choice(xy.shape[0], n_moves, replace=False)
+        xy[rows] = rng.random((n_moves, 2))
+        index.move(rows, xy[rows])
+
+        for x, y in np.vstack([xy[rows], rng.random((100, 2))]):
+            assert index.nearest(x, y, radius = 0.05) == brute_force(xy, x, y, radius = 0.05)
+
+    assert index.n_dirty <= index.max_dirty
+
+def test_moved_away_node_is_not_found_at_its_old_position():
+    index = SpatialIndex([[0, 0], [1, 1]])
+    index.move([0], [[5, 5]])
+
+    assert index.nearest(0, 0, radius = 0.5) is None
+    assert index.nearest(5, 5, radius = 0.5) == 0
+
+def test_empty():
+    index = SpatialIndex(np.zeros((0, 2)))
+
+    assert index.nearest(0, 0) is None
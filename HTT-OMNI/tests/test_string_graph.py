@@ -0,0 +1,116 @@
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from string_graph import StringGraph, file_fingerprint, load_string_graph
+
+def string_edges(n_genes = 40, n_edges = 150, seed = 0):
+    # random STRING-like edge file listing some pairs in both directions (with different scores) and some self loops
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_genes+1)*11
+    a, b = rng.choice(ids, n_edges), rng.choice(ids, n_edges)
+    edges = pd.DataFrame({'GENE_ID_A': a, 'GENE_ID_B': b, 'combined_score': rng.integers(150, 1000, n_edges)/1000})
+    flipped = edges.iloc[:20].rename(columns={'GENE_ID_A': 'GENE_ID_B', 'GENE_ID_B': 'GENE_ID_A'})
+    flipped['combined_score'] = flipped['combined_score']/2
+
+    return pd.concat([edges, flipped], ignore_index=True)
+
+def nx_graph(edges):
+    # undirected networkx graph keeping the best score of duplicate pairs
+    G = nx.Graph()
+    for a, b, s in edges[['GENE_ID_A', 'GENE_ID_B', 'combined_score']].itertuples(index=False):
+        if a!=b and (not G.has_edge(a, b) or G.edges[a, b]['score']<s):
+            G.add_edge(a, b, score=s)
+
+    return G
+
+def test_from_edges_deduplicates():
+    edges = string_edges()
+    G = nx_graph(edges)
+    string_graph = StringGraph.from_edges(edges)
+
+    found = string_graph.edges_within(string_graph.ids)
+    assert found.shape[0] == G.number_of_edges()
+    for a, b, s in found.itertuples(index=False):
+        assert G.edges[a, b]['score'] == s
+
+    # neighbours are sorted by descending score
+    for i in range(string_graph.ids.shape[0]):
+        assert (np.diff(string_graph.scores[string_graph.indptr[i]:string_graph.indptr[i+1]])<=0).all()
+
+def test_edges_within_min_score():
+    edges = string_edges()
+    G = nx_graph(edges)
+    string_graph = StringGraph.from_edges(edges)
+    ids = sorted(G.nodes())[:15]+[999999] # a gene without STRING edges is ignored
+
+    found = string_graph.edges_within(ids, min_score = 0.5)
+    expected = {tuple(sorted(e)) for e, s in nx.get_edge_attributes(G.subgraph(ids), 'score').items() if s>=0.5}
+    assert set(zip(found['GENE_ID_A'], found['GENE_ID_B'])) == expected
+
+def test_k_hop():
+    edges = string_edges()
+    G = nx_graph(edges)
+    string_graph = StringGraph.from_edges(edges)
+    H = nx.Graph([e for e, s in nx.get_edge_attributes(G, 'score').items() if s>=0.4])
+    seed = max(H.nodes(), key=H.degree)
+
+    one_hop = string_graph.k_hop([seed], hops = 1, min_score = 0.4, top_k = 100)
+    assert set(one_hop) == set(H[seed])
+
+    two_hop = string_graph.k_hop([seed], hops = 2, min_score = 0.4, top_k = 100)
+    assert set(two_hop) == set(nx.single_source_shortest_path_length(H, seed, cutoff=2))-{seed}
+
+    # top_k keeps the best scoring neighbours and exclude drops genes already shown
+    best = sorted(H[seed], key=lambda w: -G.edges[seed, w]['score'])
+    assert list(string_graph.k_hop([seed], top_k = 3, min_score = 0.4)) == best[:3]
+    assert best[0] not in string_graph.k_hop([seed], top_k = 100, min_score = 0.4, exclude = [best[0]])
+
+    assert string_graph.k_hop([999999]).shape[0] == 0
+
+def test_top_paths_match_dijkstra():
+    edges = string_edges()
+    G = nx_graph(edges)
+    string_graph = StringGraph.from_edges(edges)
+    for a, b in G.edges():
+        G.edges[a, b]['cost'] = -np.log(G.edges[a, b]['score'])
+
+    target = max(G.nodes(), key=G.degree)
+    query = [g for g in G.nodes() if g!=target][:10]
+    paths = string_graph.top_paths(query, target, min_score = 0)
+
+    assert len(paths) == len([q for q in query if nx.has_path(G, q, target)])
+    for path, confidence in paths:
+        assert path[-1] == target
+        assert np.isclose(-np.log(confidence), nx.dijkstra_path_length(G, path[0], target, weight='cost'))
+        assert np.isclose(confidence, np.prod([G.edges[a, b]['score'] for a, b in zip(path[:-1], path[1:])]))
+
+    # the k paths of a query gene leave it through different neighbours, best first
+    paths = string_graph.top_paths(query[:1], target, min_score = 0, k = 3)
+    assert len({path[1] for path, confidence in paths}) == len(paths)
+    assert all(c1>=c2 for (p1, c1), (p2, c2) in zip(paths[:-1], paths[1:]))
+
+    assert string_graph.top_paths(query, 999999) == []
+
+def test_empty_graph():
+    string_graph = StringGraph.from_edges(string_edges().iloc[:0])
+
+    assert string_graph.k_hop([11]).shape[0] == 0
+    assert string_graph.edges_within([11, 22]).shape[0] == 0
+    assert string_graph.top_paths([11], 22) == []
+
+def test_load_rebuilds_when_edge_file_changes(tmp_path):
+    edges = string_edges()
+    edge_fn, fn = str(tmp_path/'edges.csv'), str(tmp_path/'graph.npz')
+    edges.to_csv(edge_fn, index=False)
+
+    first = load_string_graph(edges, fn, edge_fn)
+    assert StringGraph.load(fn, fingerprint = file_fingerprint(edge_fn)) is not None
+    assert (load_string_graph(None, fn, edge_fn).indices == first.indices).all() # loaded, not rebuilt
+
+    edges.iloc[:50].to_csv(edge_fn, index=False)
+    os.utime(edge_fn, ns=(0, 0))
+    assert StringGraph.load(fn, fingerprint = file_fingerprint(edge_fn)) is None
+    assert load_string_graph(edges.iloc[:50], fn, edge_fn).indices.shape[0] < first.indices.shape[0]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from table_view import LazyTableView
+
+def table(n_rows = 23):
+    frame = pd.DataFrame({
+        'GeneID': np.arange(n_rows)*3,
+        'Gene Symbol': ['GENE{}'.format(i) for i in range(n_rows)],
+        'PPI': np.arange(n_rows, dtype=float)%7,
+    })
+    frame.loc[frame.index.isin([2, 5]), 'PPI'] = np.nan
+    indexed = frame.set_index('GeneID')
+
+    calls = []
+    def builder(col):
+        def build(ids):
+            calls.append((col, len(ids)))
+            return ids if col=='GeneID' else indexed[col].reindex(ids).values
+        return build
+
+    return frame, LazyTableView(frame['GeneID'].values, {col: builder(col) for col in frame.columns}), calls
+
+def test_page_builds_only_page_rows():
+    frame, view, calls = table()
+    page, page_num, n_pages, n_rows = view.page(2, 10)
+
+    pd.testing.assert_frame_equal(page, frame.iloc[10:20].reset_index(drop=True))
+    assert (page_num, n_pages, n_rows) == (2, 3, 23)
+    assert all(n==10 for col, n in calls)
+
+def test_sort_keeps_missing_last():
+    frame, view, calls = table()
+
+    for ascending in [True, False]:
+        page = view.page(1, 30, sort_by='PPI', ascending=ascending)[0]
+        expected = frame.sort_values('PPI', ascending=ascending, kind='mergesort', na_position='last').reset_index(drop=True)
+        pd.testing.assert_frame_equal(page, expected)
+
+    # the sort column is built once and reused
+    assert len([n for col, n in calls if col=='PPI' and n==frame.shape[0]]) == 1
+
+def test_search():
+    frame, view, calls = table()
+    page, page_num, n_pages, n_rows = view.page(1, 5, search='gene1', search_cols=['Gene Symbol'])
+
+    assert n_rows == 11 # GENE1, GENE10-19
+    assert page['Gene Symbol'].tolist() == ['GENE1', 'GENE10', 'GENE11', 'GENE12', 'GENE13']
+    assert view.page(1, 5, search='nothing', search_cols=['Gene Symbol'])[1:] == (1, 1, 0)
+
+def test_page_is_clamped():
+    frame, view, calls = table()
+
+    assert view.page(99, 10)[1] == 3
+    assert view.page(0, 10)[1] == 1
+
+def test_empty():
+    frame, view, calls = table(0)
+    page, page_num, n_pages, n_rows = view.page(1, 10, sort_by='PPI')
+
+    assert page.columns.tolist() == frame.columns.tolist()
+    assert (page.shape[0], page_num, n_pages, n_rows) == (0, 1, 1, 0)
+    assert [chunk.shape[0] for chunk in view.chunks()] == [0]
+    assert view.to_frame(columns=['GeneID']).shape == (0, 1)
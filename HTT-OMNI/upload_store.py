@@ -0,0 +1,86 @@
+import hashlib
+import pickle
+import sqlite3
+import time
+from contextlib import closing
+
+class UploadStore(object):
+    '''
+    store = UploadStore(r'./assets/data/user_uploads.sqlite', max_bytes = 500*1024**2)
+    key = store.key(file_bytes)
+    store.put(key, 'Smith 2021 Cell (120 rows)', payload, owner = 'jdoe')
+    payload = store.get(key, owner = 'jdoe')
+    store.list('jdoe')
+
+    SQLite-backed store of validated user uploads (and their derived overlay structures), keyed by
+    the content hash of the uploaded file. Uploads are only listed to their owners (everyone who
+    uploaded or attached them); anyone with the file itself can still attach it by uploading it again.
+    The total payload size is kept under max_bytes by evicting the least recently used uploads.
+    '''
+
+    def __init__(self, fn, max_bytes = 500*1024**2):
+        self.fn = fn
+        self.max_bytes = max_bytes
+
+        self.execute('CREATE TABLE IF NOT EXISTS uploads (key TEXT PRIMARY KEY, label TEXT, size INTEGER, created REAL, last_access REAL, payload BLOB)')
+        self.execute('CREATE TABLE IF NOT EXISTS owners (key TEXT, owner TEXT, PRIMARY KEY (key, owner))')
+
+    def execute(self, query, args = ()):
+        with closing(sqlite3.connect(self.fn, timeout=30)) as con:
+            with con: # commits on success
+                return con.execute(query, args).fetchall()
+
+    @staticmethod
+    def key(raw):
+        return hashlib.sha256(raw).hexdigest()
+
+    def __contains__(self, key):
+        return len(self.execute('SELECT 1 FROM uploads WHERE key=?', (key,)))>0
+
+    def list(self, owner = None):
+        # [(key, label, size, created, last_access)] of owner's uploads (all uploads if owner is None), most recently used first
+        if owner is None:
+            return self.execute('SELECT key, label, size, created, last_access FROM uploads ORDER BY last_access DESC')
+
+        return self.execute('SELECT u.key, u.label, u.size, u.created, u.last_access FROM uploads u JOIN owners o ON u.key=o.key WHERE o.owner=? ORDER BY u.last_access DESC', (owner,))
+
+    def add_owner(self, key, owner):
+        if owner is not None:
+            self.execute('INSERT OR IGNORE INTO owners VALUES (?, ?)', (key, owner))
+
+    def get(self, key, owner = None):
+        # owner (if given) is recorded, so the upload is listed to them from now on
+        rows = self.execute('SELECT payload FROM uploads WHERE key=?', (key,))
+
+        if len(rows)==0:
+            return None
+
+        self.execute('UPDATE uploads SET last_access=? WHERE key=?', (time.time(), key))
+        self.add_owner(key, owner)
+
+        return pickle.loads(rows[0][0])
+
+    def put(self, key, label, payload, owner = None):
+        blob = pickle.dumps(payload, protocol=4)
+
+        if len(blob)>self.max_bytes:
+            return False
+
+        now = time.time()
+        self.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?)', (key, label, len(blob), now, now, sqlite3.Binary(blob)))
+        self.add_owner(key, owner)
+        self.evict()
+
+        return True
+
+    def remove(self, key):
+        self.execute('DELETE FROM uploads WHERE key=?', (key,))
+        self.execute('DELETE FROM owners WHERE key=?', (key,))
+
+    def evict(self):
+        # drop least recently used uploads until the quota is met
+        total = 0
+        for key, label, size, created, last_access in self.list():
+            total += size
+            if total>self.max_bytes:
+                self.remove(key)
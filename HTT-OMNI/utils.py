@@ -1,6 +1,13 @@
 import numpy as np
 import pandas as pd
 
+# errors from the selenium/webdriver session behind export_svg (missing or failing driver, timeouts); selenium is optional
+try:
+    from selenium.common.exceptions import WebDriverException
+    SVG_EXPORT_ERRORS = (WebDriverException, RuntimeError)
+except ImportError:
+    SVG_EXPORT_ERRORS = (RuntimeError,)
+
 def scale(arr, mn, mx, arr_min = None, arr_max = None):
     if len(arr)>1:
         arr = np.array(arr)
@@ -21,8 +28,36 @@ def scale(arr, mn, mx, arr_min = None, arr_max = None):
     else:
         return arr
 
-def save_hook(plot, element):
-    plot.state.output_backend = 'svg'
+def edge_keys(sources, targets):
+    # order-independent int64 key per undirected edge; IDs must fit in 32 bits (negative community meta-node IDs included)
+    a = np.asarray(sources, dtype=np.int64)
+    b = np.asarray(targets, dtype=np.int64)
+
+    return (np.minimum(a, b) << 32) | (np.maximum(a, b) & 0xFFFFFFFF)
+
+def webgl_hook(plot, element):
+    # interactive plots render with webgl (glyphs webgl does not support fall back to canvas), SVG is only used by export_svg
+    plot.state.output_backend = 'webgl'
+
+def export_svg(obj, xlim = None, ylim = None):
+    '''
+    svg = export_svg(network.network_pane.object, xlim = (-1, 1), ylim = (-1, 1))
+
+    renders an SVG copy of a HoloViews object (optionally restricted to the given ranges) with bokeh's SVG backend;
+    needs selenium and a webdriver (geckodriver)
+    '''
+    import holoviews as hv
+    from bokeh.io.export import get_svgs
+    from bokeh.models import Plot
+
+    if xlim is not None and ylim is not None:
+        obj = obj.opts(xlim = xlim, ylim = ylim, clone = True)
+
+    model = hv.render(obj, backend = 'bokeh')
+    for plot in model.select({'type': Plot}):
+        plot.output_backend = 'svg'
+
+    return get_svgs(model)[0]
 
 def update_STRINGdb_edgefile(aliases_fn, links_fn):
     '''